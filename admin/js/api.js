@@ -93,6 +93,19 @@ class API {
         return this.request(`/bookings/${date}`);
     }
 
+    // Sahifalangan bronlar ro'yxati: { items, next_cursor, has_more, total_estimate, total_exact }
+    static async listBookings(params = {}) {
+        const query = new URLSearchParams(
+            Object.entries(params).filter(([, value]) => value !== null && value !== undefined && value !== '')
+        ).toString();
+        return this.request(`/api/bookings${query ? '?' + query : ''}`);
+    }
+
+    // Statistika: bronlar (bugun/7/30 kun), daromad, eng band soatlar
+    static async getStats(barberId = null) {
+        return this.request(`/api/stats${barberId ? '?barber_id=' + barberId : ''}`);
+    }
+
     static async createBooking(data) {
         return this.request('/bookings', {
             method: 'POST',
@@ -2,8 +2,23 @@
 
 let bookings = [];
 let selectedDate = new Date().toISOString().split('T')[0];
+let nextCursor = null;
+let totalBookings = 0;
+let totalExact = true;
 
-// Load bookings for selected date
+const PAGE_SIZE = 50;
+
+function currentFilters() {
+    return {
+        date_from: selectedDate,
+        date_to: selectedDate,
+        barber_id: document.getElementById('barberFilter').value,
+        phone: document.getElementById('phoneFilter').value.trim(),
+        limit: PAGE_SIZE,
+    };
+}
+
+// Load first page of bookings for selected date and filters
 async function loadBookings() {
     try {
         const loadingEl = document.getElementById('bookingsTable');
@@ -14,7 +29,26 @@ async function loadBookings() {
             </div>
         `;
 
-        bookings = await API.getBookings(selectedDate);
+        const page = await API.listBookings(currentFilters());
+        bookings = page.items;
+        nextCursor = page.next_cursor;
+        totalBookings = page.total_estimate;
+        totalExact = page.total_exact;
+        renderBookings();
+        updateStats();
+    } catch (error) {
+        console.error('Error loading bookings:', error);
+        showNotification('Bronlarni yuklashda xatolik', 'error');
+    }
+}
+
+// Load next page (keyset cursor)
+async function loadMoreBookings() {
+    if (!nextCursor) return;
+    try {
+        const page = await API.listBookings({ ...currentFilters(), cursor: nextCursor });
+        bookings = bookings.concat(page.items);
+        nextCursor = page.next_cursor;
         renderBookings();
         updateStats();
     } catch (error) {
@@ -23,9 +57,29 @@ async function loadBookings() {
     }
 }
 
+function applyFilters() {
+    loadBookings();
+}
+
+async function loadBarberFilter() {
+    try {
+        const barbers = await API.getBarbers();
+        const select = document.getElementById('barberFilter');
+        barbers.forEach(barber => {
+            const option = document.createElement('option');
+            option.value = barber.id;
+            option.textContent = barber.name;
+            select.appendChild(option);
+        });
+    } catch (error) {
+        console.error('Error loading barbers:', error);
+    }
+}
+
 // Render bookings table
 function renderBookings() {
     const tableContainer = document.getElementById('bookingsTable');
+    document.getElementById('loadMoreBtn').style.display = nextCursor ? 'inline-block' : 'none';
 
     if (bookings.length === 0) {
         tableContainer.innerHTML = `
@@ -78,10 +132,10 @@ function renderBookings() {
 
 // Update statistics
 function updateStats() {
-    const totalBookings = bookings.length;
+    // Daromad - yuklangan bronlar bo'yicha
     const totalRevenue = bookings.reduce((sum, b) => sum + b.total_price, 0);
 
-    document.getElementById('totalBookings').textContent = totalBookings;
+    document.getElementById('totalBookings').textContent = totalExact ? totalBookings : `${totalBookings}+`;
     document.getElementById('totalRevenue').textContent = formatPrice(totalRevenue);
 }
 
@@ -121,5 +175,6 @@ function formatDate(dateString) {
 // Initialize
 document.addEventListener('DOMContentLoaded', () => {
     document.getElementById('dateSelector').value = selectedDate;
+    loadBarberFilter();
     loadBookings();
 });
@@ -0,0 +1,390 @@
+"""
+Bo'sh vaqtlarni hisoblash (availability engine)
+Har bir sartarosh-kun bitmap ko'rinishida saqlanadi: i-bit = kun boshidan
+i-chi vaqt birligi (SLOT_MINUTES daqiqa) band yoki bo'sh.
+"N ta ketma-ket bo'sh birlik" qidiruvi shift/AND amallari bilan bajariladi.
+"""
+
+import logging
+import os
+import threading
+import time as _time
+from collections import OrderedDict
+from datetime import date as date_type, datetime, timedelta
+from typing import Iterable, List, Optional, Tuple
+
+import pytz
+from sqlalchemy.orm import Session
+
+import barber_registry
+import log_setup
+from database import Booking, parse_booking_day
+
+logger = logging.getLogger(__name__)
+
+# Vaqt birligi (daqiqada). Hozircha soatbay bron qilinadi.
+SLOT_MINUTES = int(os.getenv("SLOT_MINUTES", "60"))
+if SLOT_MINUTES <= 0 or 60 % SLOT_MINUTES:
+    # Soat butun birliklarga bo'linmasa bitmap (UNITS_PER_HOUR) noto'g'ri chiqadi
+    raise ValueError(f"SLOT_MINUTES 60 ning musbat bo'luvchisi bo'lishi kerak (5, 10, 15, 30, 60...), berilgan: {SLOT_MINUTES}")
+UNITS_PER_HOUR = 60 // SLOT_MINUTES
+UNITS_PER_DAY = 24 * UNITS_PER_HOUR
+
+DEFAULT_WORK_START = 9
+DEFAULT_WORK_END = 22
+
+TASHKENT_TZ = pytz.timezone('Asia/Tashkent')
+
+# Kesh sozlamalari
+CACHE_TTL_SECONDS = float(os.getenv("AVAILABILITY_CACHE_TTL", "60"))
+CACHE_MAX_ENTRIES = int(os.getenv("AVAILABILITY_CACHE_SIZE", "1024"))
+
+# Kalendar so'rovi uchun maksimal kunlar soni
+MAX_RANGE_DAYS = 62
+
+
+def time_to_unit(value: str) -> int:
+    """'HH:MM' ni kun boshidan birliklar soniga aylantirish"""
+    hour, _, minute = value.partition(':')
+    return (int(hour) * 60 + int(minute or 0)) // SLOT_MINUTES
+
+
+def unit_to_time(unit: int) -> str:
+    """Birlik raqamini 'HH:MM' formatiga aylantirish"""
+    minutes = unit * SLOT_MINUTES
+    return f"{minutes // 60:02d}:{minutes % 60:02d}"
+
+
+def range_mask(start: int, end: int) -> int:
+    """[start, end) oraliqdagi bitlar yoqilgan maska"""
+    if end <= start:
+        return 0
+    return ((1 << (end - start)) - 1) << start
+
+
+def parse_work_hours(work_start: Optional[str], work_end: Optional[str]) -> Tuple[int, int]:
+    """Sartarosh ish soatlarini (boshlanish, tugash) soat ko'rinishida qaytarish"""
+    try:
+        return int(work_start.split(':')[0]), int(work_end.split(':')[0])
+    except (ValueError, AttributeError):
+        return DEFAULT_WORK_START, DEFAULT_WORK_END
+
+
+def booked_mask(bookings: Iterable[Tuple[int, int]]) -> int:
+    """
+    (start_minute, total_duration) juftliklaridan band bitmap yasash.
+    Bron tugagandan keyingi bir soat ham band hisoblanadi:
+    10:00 (600) da 2 soatlik bron -> 10:00, 11:00, 12:00 band.
+    """
+    mask = 0
+    for start_minute, total_duration in bookings:
+        if start_minute is None:
+            continue
+        start = start_minute // SLOT_MINUTES
+        end = start + ((total_duration or 1) + 1) * UNITS_PER_HOUR
+        mask |= range_mask(start, min(end, UNITS_PER_DAY))
+    return mask
+
+
+def free_starts(free: int, length: int) -> int:
+    """
+    Keyingi `length` ta birligi ham bo'sh bo'lgan boshlanish bitlarini topish.
+    Ikkilik ko'paytirish: har qadamda qamrab olingan uzunlik ikki barobar oshadi.
+    """
+    if length <= 0:
+        return free
+    result = free
+    covered = 1
+    while covered < length:
+        step = min(covered, length - covered)
+        result &= result >> step
+        covered += step
+    return result
+
+
+def mask_to_times(mask: int) -> List[str]:
+    """Yoqilgan bitlarni 'HH:MM' ro'yxatiga aylantirish"""
+    times = []
+    while mask:
+        low = mask & -mask
+        times.append(unit_to_time(low.bit_length() - 1))
+        mask ^= low
+    return times
+
+
+def compute_available_times(
+    work_start_hour: int,
+    work_end_hour: int,
+    bookings: Iterable[Tuple[int, int]],
+    duration: int,
+    min_start_hour: Optional[int] = None,
+) -> List[str]:
+    """
+    Bir kunlik bo'sh boshlanish vaqtlari.
+    min_start_hour berilsa, faqat undan keyingi soatlar qaytariladi (bugungi kun uchun).
+    """
+    return compute_from_mask(work_start_hour, work_end_hour, booked_mask(bookings), duration, min_start_hour)
+
+
+def compute_from_mask(
+    work_start_hour: int,
+    work_end_hour: int,
+    booked: int,
+    duration: int,
+    min_start_hour: Optional[int] = None,
+) -> List[str]:
+    """compute_available_times ning tayyor band bitmap bilan ishlaydigan varianti"""
+    work = range_mask(work_start_hour * UNITS_PER_HOUR, work_end_hour * UNITS_PER_HOUR)
+    free = work & ~booked
+
+    # Faqat soat boshidagi vaqtlar boshlanish nuqtasi bo'la oladi
+    starts = free_starts(free, max(duration, 1) * UNITS_PER_HOUR)
+    if UNITS_PER_HOUR > 1:
+        hour_marks = 0
+        for hour in range(work_start_hour, work_end_hour):
+            hour_marks |= 1 << (hour * UNITS_PER_HOUR)
+        starts &= hour_marks
+
+    if min_start_hour is not None:
+        starts &= ~range_mask(0, (min_start_hour + 1) * UNITS_PER_HOUR)
+
+    return mask_to_times(starts)
+
+
+def current_tashkent_time():
+    """Hozirgi vaqt (Tashkent timezone)"""
+    return datetime.now(TASHKENT_TZ)
+
+
+def get_work_hours(db: Session, barber_id: Optional[int]) -> Tuple[int, int]:
+    """Sartarosh ish soatlari (barber registry dan, DB ga murojaatsiz)"""
+    barber = barber_registry.get(barber_id, db)
+    if barber:
+        return parse_work_hours(barber.work_start, barber.work_end)
+    return DEFAULT_WORK_START, DEFAULT_WORK_END
+
+
+def load_day_bookings(db: Session, date: str, barber_id: Optional[int] = None) -> List[Tuple[int, int]]:
+    """Bir kunlik aktiv bronlarning (start_minute, davomiylik) ro'yxati"""
+    query = db.query(Booking.start_minute, Booking.total_duration).filter(
+        Booking.booking_day == parse_booking_day(date),
+        Booking.is_active == True
+    )
+    if barber_id:
+        query = query.filter(Booking.barber_id == barber_id)
+    return [(row.start_minute, row.total_duration) for row in query.all()]
+
+
+def load_range_bookings(db: Session, start: date_type, end: date_type, barber_id: Optional[int] = None) -> dict:
+    """
+    [start, end] oraliqdagi aktiv bronlarni bitta so'rov bilan olish.
+    Natija: {date: [(start_minute, davomiylik), ...]}
+    """
+    query = db.query(Booking.booking_day, Booking.start_minute, Booking.total_duration).filter(
+        Booking.booking_day >= start,
+        Booking.booking_day <= end,
+        Booking.is_active == True
+    )
+    if barber_id:
+        query = query.filter(Booking.barber_id == barber_id)
+
+    by_date = {}
+    for row in query.all():
+        by_date.setdefault(row.booking_day, []).append((row.start_minute, row.total_duration))
+    return by_date
+
+
+class AvailabilityCache:
+    """
+    (barber_id, date) -> (work_start_hour, work_end_hour, booked_mask) keshi.
+    LRU bo'yicha chiqarib tashlanadi, TTL o'tgandan keyin eskirgan hisoblanadi.
+    Bron yaratilganda yoki ish soatlari o'zgarganda aniq invalidatsiya qilinadi.
+
+    Poyga: o'qish bron commit qilinishidan oldin boshlanib, invalidate() dan keyin set()
+    qilsa eski holat keshga qaytadi. Shuning uchun o'qishdan oldin begin() versiyasi olinadi;
+    shu kalit (yoki sartarosh) undan keyin invalidatsiya qilingan bo'lsa set() yozmaydi.
+
+    Kesh bitta process ichida: bot.py alohida servis sifatida ishlasa, u yozgan bronlar
+    API keshida faqat TTL o'tgach ko'rinadi (docker-compose da TTL qisqa qilingan).
+    Bron qilishdan oldingi tekshiruv (is_slot_available) keshni ishlatmaydi.
+    """
+
+    def __init__(self, max_entries: int = CACHE_MAX_ENTRIES, ttl: float = CACHE_TTL_SECONDS):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self._version = 0
+        # kalit / sartarosh -> oxirgi invalidatsiya versiyasi; _floor dan eski o'qishlar yozilmaydi
+        self._invalidated = {}
+        self._barber_invalidated = {}
+        self._floor = 0
+        self.hits = 0
+        self.misses = 0
+        self.invalidations = 0
+        self.stale_writes = 0
+
+    def begin(self) -> int:
+        """Bazadan o'qishdan oldin chaqiriladi - natija set(..., version=) ga beriladi"""
+        with self._lock:
+            return self._version
+
+    def get(self, barber_id: Optional[int], date: str):
+        key = (barber_id, date)
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None or entry[0] < _time.monotonic():
+                if entry is not None:
+                    del self._entries[key]
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return entry[1]
+
+    def set(self, barber_id: Optional[int], date: str, value, version: Optional[int] = None) -> None:
+        key = (barber_id, date)
+        with self._lock:
+            if version is not None and (
+                version < self._floor
+                or self._invalidated.get(key, -1) > version
+                or self._barber_invalidated.get(barber_id, -1) > version
+            ):
+                # O'qish davomida invalidatsiya bo'lgan - natija eskirgan bo'lishi mumkin
+                self.stale_writes += 1
+                return
+            self._entries[key] = (_time.monotonic() + self.ttl, value)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def invalidate(self, barber_id: Optional[int], date: str) -> None:
+        """Bitta sartarosh-kunni o'chirish (barber_id siz umumiy kalit ham)"""
+        with self._lock:
+            self._version += 1
+            for key in ((barber_id, date), (None, date)):
+                self._entries.pop(key, None)
+                self._invalidated[key] = self._version
+            self.invalidations += 1
+            self._prune_versions()
+
+    def invalidate_barber(self, barber_id: int) -> None:
+        """Sartaroshning barcha kunlarini o'chirish (ish soatlari o'zgarganda)"""
+        with self._lock:
+            self._version += 1
+            for key in [key for key in self._entries if key[0] == barber_id]:
+                del self._entries[key]
+            self._barber_invalidated[barber_id] = self._version
+            self.invalidations += 1
+            self._prune_versions()
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+            self._version += 1
+            self._forget_versions()
+
+    def _prune_versions(self) -> None:
+        # Versiyalar lug'ati cheksiz o'smasin: tozalansa, undan oldin boshlangan o'qishlar yozilmaydi
+        if len(self._invalidated) + len(self._barber_invalidated) > self.max_entries * 4:
+            self._forget_versions()
+
+    def _forget_versions(self) -> None:
+        self._invalidated.clear()
+        self._barber_invalidated.clear()
+        self._floor = self._version
+
+    def stats(self) -> dict:
+        with self._lock:
+            total = self.hits + self.misses
+            return {
+                "entries": len(self._entries),
+                "max_entries": self.max_entries,
+                "ttl_seconds": self.ttl,
+                "hits": self.hits,
+                "misses": self.misses,
+                "invalidations": self.invalidations,
+                "stale_writes": self.stale_writes,
+                "hit_ratio": round(self.hits / total, 4) if total else 0.0,
+            }
+
+
+# Global kesh (API va bot_manager botlari bitta processda ishlaydi)
+cache = AvailabilityCache()
+
+
+def get_day_state(db: Session, date: str, barber_id: Optional[int] = None, use_cache: bool = True) -> Tuple[int, int, int]:
+    """Sartarosh-kun holatini keshdan yoki bazadan olish"""
+    state = cache.get(barber_id, date) if use_cache else None
+    if state is None:
+        version = cache.begin()
+        work_start_hour, work_end_hour = get_work_hours(db, barber_id)
+        state = (work_start_hour, work_end_hour, booked_mask(load_day_bookings(db, date, barber_id)))
+        cache.set(barber_id, date, state, version=version)
+        log_setup.sample(
+            logger, "Bo'sh vaqtlar bazadan hisoblandi: %s (band birliklar: %d)",
+            date, bin(state[2]).count("1"), barber_id=barber_id
+        )
+    return state
+
+
+def available_from_state(state: Tuple[int, int, int], date: str, duration: int) -> List[str]:
+    """Kesh holatidan bo'sh vaqtlarni hisoblash"""
+    work_start_hour, work_end_hour, booked = state
+
+    now = current_tashkent_time()
+    min_start_hour = now.hour if date == now.strftime("%Y-%m-%d") else None
+
+    return compute_from_mask(work_start_hour, work_end_hour, booked, duration, min_start_hour)
+
+
+def get_available_times(db: Session, date: str, duration: int, barber_id: Optional[int] = None) -> List[str]:
+    """Berilgan sana va davomiylik uchun bo'sh vaqtlar"""
+    return available_from_state(get_day_state(db, date, barber_id), date, duration)
+
+
+def is_slot_available(db: Session, date: str, time: str, duration: int, barber_id: Optional[int] = None) -> bool:
+    """
+    Bron qilishdan oldin tekshirish: shu vaqt hali bo'shmi.
+    Kesh chetlab o'tiladi - bu yerda eng so'nggi holat kerak.
+    """
+    state = get_day_state(db, date, barber_id, use_cache=False)
+    return time in available_from_state(state, date, duration)
+
+
+def invalidate(barber_id: Optional[int], date: str) -> None:
+    """Bron yaratilgandan/bekor qilingandan keyin chaqiriladi"""
+    cache.invalidate(barber_id, date)
+
+
+def invalidate_barber(barber_id: int) -> None:
+    """Sartarosh ish soatlari o'zgargandan keyin chaqiriladi"""
+    cache.invalidate_barber(barber_id)
+
+
+def get_available_range(
+    db: Session,
+    start: date_type,
+    end: date_type,
+    duration: int,
+    barber_id: Optional[int] = None,
+) -> List[dict]:
+    """
+    Bir necha kunlik bo'sh vaqtlar (kalendar uchun).
+    Barcha bronlar bitta so'rov bilan olinadi, har bir kun keshga ham yoziladi.
+    """
+    version = cache.begin()
+    work_start_hour, work_end_hour = get_work_hours(db, barber_id)
+    bookings_by_date = load_range_bookings(db, start, end, barber_id)
+
+    days = []
+    day = start
+    while day <= end:
+        day_str = day.strftime("%Y-%m-%d")
+        state = (work_start_hour, work_end_hour, booked_mask(bookings_by_date.get(day, [])))
+        cache.set(barber_id, day_str, state, version=version)
+
+        times = available_from_state(state, day_str, duration)
+        days.append({"date": day_str, "available_times": times, "fully_booked": not times})
+        day += timedelta(days=1)
+    return days
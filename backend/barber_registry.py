@@ -0,0 +1,160 @@
+"""
+Sartaroshlar ma'lumotlari uchun xotiradagi registry
+
+Barber qatori deyarli o'zgarmaydi, lekin har bir bo'sh vaqt so'rovi, har bir bron
+xabarnomasi va Web App ochilishi uni qayta o'qirdi. Registry startupda bitta
+SELECT bilan to'ldiriladi va faqat create/update/delete_barber dan yangilanadi.
+
+Har bir o'zgarishda `version` oshadi - keshlar (masalan HTTP ETag) shunga tayanishi mumkin.
+Registry process ichida. API processida (warm() chaqirilgan) u to'liq va aniq - o'zgarishlar
+shu processdagi endpointlardan o'tadi. bot.py alohida servis bo'lib ishlasa, registry
+yuklanmagan bo'ladi: qatorlar talab bo'yicha o'qiladi va BARBER_REGISTRY_TTL soniyadan keyin
+bazadan qayta o'qiladi (API da o'zgartirilgan admin_telegram_id, ish soatlari shunda ko'rinadi).
+"""
+
+import logging
+import os
+import threading
+import time
+from collections import namedtuple
+from typing import Dict, Optional
+
+from database import Barber, SessionLocal
+
+logger = logging.getLogger(__name__)
+
+BARBER_REGISTRY_TTL = float(os.getenv("BARBER_REGISTRY_TTL", "60"))
+
+BarberInfo = namedtuple("BarberInfo", [
+    "id", "name", "bot_token", "admin_telegram_id", "phone", "image_url",
+    "work_start", "work_end",
+    "gender_category", "is_active", "created_at",
+])
+
+
+def to_info(barber: Barber) -> BarberInfo:
+    return BarberInfo(
+        id=barber.id,
+        name=barber.name,
+        bot_token=barber.bot_token,
+        admin_telegram_id=barber.admin_telegram_id,
+        phone=barber.phone,
+        image_url=barber.image_url,
+        work_start=barber.work_start,
+        work_end=barber.work_end,
+        gender_category=barber.gender_category,
+        is_active=barber.is_active,
+        created_at=barber.created_at,
+    )
+
+
+class BarberRegistry:
+    """barber_id -> BarberInfo. O'qish lock'siz (dict almashtiriladi), yozish lock bilan"""
+
+    def __init__(self):
+        self._barbers: Dict[int, BarberInfo] = {}
+        self._fetched_at: Dict[int, float] = {}  # yuklanmagan rejimda TTL uchun
+        self._lock = threading.Lock()
+        self.loaded = False
+        self.version = 0
+        self.hits = 0
+        self.misses = 0
+
+    def load(self, db) -> int:
+        """Barcha sartaroshlarni bitta so'rov bilan yuklash"""
+        barbers = {barber.id: to_info(barber) for barber in db.query(Barber).all()}
+        with self._lock:
+            self._barbers = barbers
+            self.loaded = True
+            self.version += 1
+        return len(barbers)
+
+    def get(self, barber_id: Optional[int], db=None) -> Optional[BarberInfo]:
+        """
+        Sartarosh ma'lumotlari. Registry yuklangan bo'lsa DB ga umuman murojaat qilinmaydi;
+        yuklanmagan bo'lsa (masalan bot.py alohida ishga tushganda) bitta qator o'qiladi va
+        BARBER_REGISTRY_TTL soniya saqlanadi - boshqa process qilgan o'zgarish shundan keyin ko'rinadi.
+        """
+        if not barber_id:
+            return None
+        info = self._barbers.get(barber_id)
+        if self.loaded or (
+            info is not None and time.monotonic() - self._fetched_at.get(barber_id, 0) < BARBER_REGISTRY_TTL
+        ):
+            self.hits += 1
+            return info
+        self.misses += 1
+        return self.refresh(barber_id, db)
+
+    def refresh(self, barber_id: int, db=None) -> Optional[BarberInfo]:
+        """Bitta sartaroshni bazadan qayta o'qish (create/update dan keyin)"""
+        if db is None:
+            with SessionLocal() as session:
+                return self.refresh(barber_id, session)
+
+        barber = db.query(Barber).filter(Barber.id == barber_id).first()
+        if barber is None:
+            self.remove(barber_id)
+            return None
+        info = to_info(barber)
+        with self._lock:
+            barbers = dict(self._barbers)
+            barbers[barber_id] = info
+            self._barbers = barbers
+            self._fetched_at[barber_id] = time.monotonic()
+            self.version += 1
+        return info
+
+    def remove(self, barber_id: int) -> None:
+        with self._lock:
+            if barber_id in self._barbers:
+                barbers = dict(self._barbers)
+                del barbers[barber_id]
+                self._barbers = barbers
+            self._fetched_at.pop(barber_id, None)
+            self.version += 1
+
+    def active(self):
+        return [info for info in self._barbers.values() if info.is_active]
+
+    def stats(self) -> dict:
+        return {
+            "loaded": self.loaded,
+            "barbers": len(self._barbers),
+            "version": self.version,
+            "hits": self.hits,
+            "misses": self.misses,
+        }
+
+
+# Global registry (har bir processda alohida)
+registry = BarberRegistry()
+
+
+def warm(db) -> int:
+    """Startupda chaqiriladi"""
+    count = registry.load(db)
+    logger.info(f"✅ Barber registry yuklandi: {count} ta sartarosh (v{registry.version})")
+    return count
+
+
+def reload() -> int:
+    """Registry ni bazadan to'liq qayta yuklash (masalan jadvallar qayta yaratilganda)"""
+    with SessionLocal() as db:
+        return registry.load(db)
+
+
+def get(barber_id: Optional[int], db=None) -> Optional[BarberInfo]:
+    return registry.get(barber_id, db)
+
+
+def refresh(barber_id: int, db=None) -> Optional[BarberInfo]:
+    return registry.refresh(barber_id, db)
+
+
+def remove(barber_id: int) -> None:
+    registry.remove(barber_id)
+
+
+def version() -> int:
+    return registry.version
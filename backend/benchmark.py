@@ -0,0 +1,558 @@
+"""
+Benchmark va yuklama sinovi: asosiy API yo'llarining kechikishi (p50/p95/p99) va throughput
+
+    python benchmark.py run                                   # vaqtinchalik SQLite, default hajm
+    python benchmark.py run --bookings 50000 --concurrency 50 --output baseline.json
+    python benchmark.py run --baseline baseline.json          # regressiya bo'lsa exit code 1
+    python benchmark.py compare current.json baseline.json
+
+    DATABASE_URL=postgresql://... python benchmark.py seed --reset   # bazani to'ldirish
+    python benchmark.py run --url http://127.0.0.1:8000              # ishlab turgan serverga
+
+`run` bazani to'ldiradi (--url bo'lmasa), fake_telegram.py va `uvicorn main:app` ni alohida
+processlarda ko'taradi (botlar webhook rejimida, Telegram API - soxta server) va yo'llarni
+httpx.AsyncClient bilan berilgan parallellikda chaqiradi. Natija - JSON (stdout yoki --output),
+progress loglari stderr ga.
+
+Ma'lumotlar --seed bo'yicha deterministik: bir xil parametrlar - bir xil baza va so'rovlar ketma-ketligi.
+"""
+
+import argparse
+import asyncio
+import json
+import logging
+import math
+import os
+import platform
+import random
+import socket
+import subprocess
+import sys
+import tempfile
+import time
+from datetime import date, datetime, timedelta
+
+import httpx
+
+logger = logging.getLogger(__name__)
+
+BACKEND_DIR = os.path.dirname(os.path.abspath(__file__))
+
+WORK_HOURS = range(9, 21)
+SERVICE_NAMES = ["Soch", "Soqol", "Soch + soqol", "Bolalar sochi", "Ukladka", "Bo'yash", "Yuz parvarishi", "Massaj"]
+SEED_CHUNK = 1000
+
+# Nom -> og'irlik (so'rovlar aralashmasidagi ulushi)
+SCENARIOS = {
+    "GET /available-times/{date}": 30,
+    "GET /available-times/range": 10,
+    "GET /bookings/{date}": 10,
+    "POST /bookings": 10,
+    "GET /api/services": 20,
+    "GET /api/barbers/{barber_id}": 20,
+}
+
+PERCENTILES = (50, 95, 99)
+# Regressiya shu percentillar bo'yicha aniqlanadi - p99 kam namunada shovqinli, faqat hisobotda
+GATED_PERCENTILES = (50, 95)
+
+
+# ==================== SEED ====================
+
+def seed_database(barbers, services, users, bookings, history_days, future_days, seed, reset=False):
+    """
+    Bazani benchmark ma'lumotlari bilan to'ldirish (DATABASE_URL bo'yicha).
+    Bronlar (sartarosh, kun, soat) slotlariga takrorlanmasdan tarqatiladi: o'tgan history_days
+    kun va keyingi future_days kun; ~10% bekor qilingan.
+    """
+    from database import Base, SessionLocal, engine, create_tables, Barber, Booking, BookingService, Service, User
+    import migrations
+
+    if reset:
+        Base.metadata.drop_all(bind=engine)
+    create_tables()
+    migrations.run_migrations()
+
+    rng = random.Random(seed)
+    today = date.today()
+
+    with SessionLocal() as db:
+        if db.query(Barber.id).first() is not None:
+            raise SystemExit("❌ Baza bo'sh emas - --reset bilan qayta yaratish mumkin (barcha ma'lumotlar o'chadi)")
+
+        barber_rows = [
+            Barber(
+                name=f"Bench Barber {i}",
+                bot_token=f"{100000 + i}:bench",
+                admin_telegram_id=str(500000 + i),
+                work_start="09:00",
+                work_end="21:00",
+            )
+            for i in range(1, barbers + 1)
+        ]
+        db.add_all(barber_rows)
+        db.flush()
+        barber_ids = [barber.id for barber in barber_rows]
+
+        catalogue = {}
+        for barber_id in barber_ids:
+            catalogue[barber_id] = [
+                Service(
+                    barber_id=barber_id,
+                    name=SERVICE_NAMES[j % len(SERVICE_NAMES)],
+                    price=rng.choice([30000, 40000, 50000, 70000, 100000]),
+                    duration=1,
+                )
+                for j in range(services)
+            ]
+            db.add_all(catalogue[barber_id])
+
+        user_rows = [
+            User(
+                telegram_id=str(1000000 + i),
+                name=f"Mijoz {i}",
+                phone=f"+99890{i:07d}",
+                barber_id=rng.choice(barber_ids),
+            )
+            for i in range(users)
+        ]
+        db.add_all(user_rows)
+        db.flush()
+        # Commitdan keyin obyektlar expire bo'ladi - bronlar uchun kerakli qiymatlar oldindan
+        customers = [(user.telegram_id, user.name, user.phone) for user in user_rows]
+        menu = {
+            barber_id: [(str(service.id), service.name, service.price, service.duration) for service in rows]
+            for barber_id, rows in catalogue.items()
+        }
+        db.commit()
+
+        first_day = today - timedelta(days=history_days)
+        slots = [
+            (barber_id, first_day + timedelta(days=day), hour)
+            for barber_id in barber_ids
+            for day in range(history_days + future_days)
+            for hour in WORK_HOURS
+        ]
+        if bookings > len(slots):
+            logger.warning(f"⚠️ {bookings} ta bron sig'maydi - {len(slots)} ta slot bor, shuncha yoziladi")
+            bookings = len(slots)
+        rng.shuffle(slots)
+
+        for start in range(0, bookings, SEED_CHUNK):
+            chunk = []
+            for barber_id, day, hour in slots[start:start + SEED_CHUNK]:
+                telegram_id, name, phone = rng.choice(customers) if customers else ("1000000", "Mijoz", "+998900000000")
+                picked = rng.sample(menu[barber_id], k=min(len(menu[barber_id]), rng.choice([1, 1, 2])))
+                chunk.append(Booking(
+                    barber_id=barber_id,
+                    user_telegram_id=telegram_id,
+                    user_name=name,
+                    user_phone=phone,
+                    booking_date=day.isoformat(),
+                    booking_time=f"{hour:02d}:00",
+                    total_duration=1,
+                    total_price=sum(price for _, _, price, _ in picked),
+                    is_active=rng.random() >= 0.1,
+                    services=[
+                        BookingService(service_name=name, service_code=code, price=price, duration=duration)
+                        for code, name, price, duration in picked
+                    ],
+                ))
+            db.add_all(chunk)
+            db.commit()
+            db.expunge_all()
+
+    logger.info(f"✅ Seed: {barbers} sartarosh, {barbers * services} xizmat, {users} mijoz, {bookings} bron")
+    return {
+        "barbers": barbers,
+        "services_per_barber": services,
+        "users": users,
+        "bookings": bookings,
+        "history_days": history_days,
+        "future_days": future_days,
+        "seed": seed,
+    }
+
+
+# ==================== SERVERLAR ====================
+
+def free_port():
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+def wait_until_ready(url, process, timeout=60):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        if process.poll() is not None:
+            raise SystemExit(f"❌ Server ishga tushmadi (exit code {process.returncode}): {url}")
+        try:
+            if httpx.get(url, timeout=1).status_code == 200:
+                return
+        except httpx.HTTPError:
+            pass
+        time.sleep(0.2)
+    raise SystemExit(f"❌ Server {timeout} soniyada javob bermadi: {url}")
+
+
+def start_servers(database_url, work_dir):
+    """fake_telegram.py va uvicorn main:app - (api_url, [processlar])"""
+    telegram_port = free_port()
+    api_port = free_port()
+    env = {
+        **os.environ,
+        "DATABASE_URL": database_url,
+        "TELEGRAM_API_URL": f"http://127.0.0.1:{telegram_port}",
+        "BOT_MODE": "webhook",
+        "WEBHOOK_BASE_URL": f"http://127.0.0.1:{api_port}",
+        "STATIC_BUILD_DIR": os.path.join(work_dir, "static_build"),
+        "LOG_LEVEL": os.getenv("LOG_LEVEL", "WARNING"),
+    }
+    processes = []
+    try:
+        telegram = subprocess.Popen(
+            [sys.executable, "fake_telegram.py", str(telegram_port)],
+            cwd=BACKEND_DIR, env=env, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL
+        )
+        processes.append(telegram)
+        wait_until_ready(f"http://127.0.0.1:{telegram_port}/_fake/messages", telegram)
+
+        api = subprocess.Popen(
+            [sys.executable, "-m", "uvicorn", "main:app", "--host", "127.0.0.1", "--port", str(api_port),
+             "--log-level", "warning", "--no-access-log"],
+            cwd=BACKEND_DIR, env=env, stdout=subprocess.DEVNULL, stderr=sys.stderr
+        )
+        processes.append(api)
+        api_url = f"http://127.0.0.1:{api_port}"
+        wait_until_ready(f"{api_url}/api", api)
+    except BaseException:
+        stop_servers(processes)
+        raise
+    return api_url, processes
+
+
+def stop_servers(processes):
+    for process in reversed(processes):
+        process.terminate()
+    for process in processes:
+        try:
+            process.wait(timeout=15)
+        except subprocess.TimeoutExpired:
+            process.kill()
+
+
+# ==================== YUKLAMA ====================
+
+class Workload:
+    """Deterministik so'rovlar generatori: (scenario, method, url, json)"""
+
+    def __init__(self, barber_ids, future_days, seed, scenarios):
+        self.barber_ids = barber_ids
+        self.future_days = max(future_days, 1)
+        self.rng = random.Random(seed)
+        self.names = list(scenarios)
+        self.weights = [SCENARIOS[name] for name in self.names]
+        self.today = date.today()
+        self.counter = 0
+
+    def day(self):
+        return (self.today + timedelta(days=self.rng.randrange(self.future_days))).isoformat()
+
+    def next(self):
+        self.counter += 1
+        name = self.rng.choices(self.names, self.weights)[0]
+        barber_id = self.rng.choice(self.barber_ids)
+        if name == "GET /available-times/{date}":
+            return name, "GET", f"/available-times/{self.day()}?barber_id={barber_id}&duration={self.rng.choice([1, 1, 2])}", None
+        if name == "GET /available-times/range":
+            start = self.today + timedelta(days=self.rng.randrange(self.future_days))
+            end = start + timedelta(days=6)
+            return name, "GET", f"/available-times/range?start={start}&end={end}&barber_id={barber_id}", None
+        if name == "GET /bookings/{date}":
+            return name, "GET", f"/bookings/{self.day()}", None
+        if name == "POST /bookings":
+            # Band slotga tushsa 400 - bu ham kutilgan javob (konflikt tekshiruvi yo'li)
+            payload = {
+                "date": self.day(),
+                "time": f"{self.rng.choice(WORK_HOURS):02d}:00",
+                "user_telegram_id": f"bench-{self.counter}",
+                "user_name": f"Bench {self.counter}",
+                "user_phone": f"+99891{self.counter:07d}",
+                "services": [{"name": "Soch", "service": "1", "price": 50000, "duration": 1}],
+                "total_price": 50000,
+                "total_duration": 1,
+            }
+            return name, "POST", "/bookings", payload
+        if name == "GET /api/services":
+            return name, "GET", f"/api/services?barber_id={barber_id}&is_active=true", None
+        return name, "GET", f"/api/barbers/{barber_id}", None
+
+
+async def drive(api_url, workload, total, concurrency, warmup=0, timeout=30):
+    """
+    `concurrency` ta worker yopiq siklda (javobni kutib, keyingisini yuboradi) `total` ta so'rov.
+    Qaytaradi: ({scenario: [(soniya, status), ...]}, umumiy vaqt)
+    """
+    limits = httpx.Limits(max_connections=concurrency, max_keepalive_connections=concurrency)
+    async with httpx.AsyncClient(base_url=api_url, limits=limits, timeout=timeout) as client:
+        async def send(request):
+            _, method, url, payload = request
+            started = time.perf_counter()
+            try:
+                response = await client.request(method, url, json=payload)
+                status = response.status_code
+            except httpx.HTTPError as e:
+                status = f"error:{type(e).__name__}"
+            return time.perf_counter() - started, status
+
+        for _ in range(warmup):
+            await send(workload.next())
+
+        # So'rovlar oldindan yasaladi - ketma-ketlik worker tartibiga bog'liq emas
+        requests = [workload.next() for _ in range(total)]
+        samples = {}
+        position = 0
+
+        async def worker():
+            nonlocal position
+            while position < len(requests):
+                request = requests[position]
+                position += 1
+                samples.setdefault(request[0], []).append(await send(request))
+
+        started = time.perf_counter()
+        await asyncio.gather(*(worker() for _ in range(concurrency)))
+        return samples, time.perf_counter() - started
+
+
+def percentile(sorted_values, pct):
+    """Nearest-rank percentile (sorted_values bo'sh emas)"""
+    index = max(0, min(len(sorted_values) - 1, math.ceil(pct / 100 * len(sorted_values)) - 1))
+    return sorted_values[index]
+
+
+def summarize(samples, elapsed):
+    """Namuna (soniya, status) lar -> p50/p95/p99 (ms), throughput va statuslar"""
+    durations = sorted(duration for duration, _ in samples)
+    statuses = {}
+    for _, status in samples:
+        statuses[str(status)] = statuses.get(str(status), 0) + 1
+    errors = sum(count for status, count in statuses.items() if not status.isdigit() or int(status) >= 500)
+    summary = {
+        "requests": len(samples),
+        "errors": errors,
+        "statuses": dict(sorted(statuses.items())),
+        "throughput_rps": round(len(samples) / elapsed, 2) if elapsed else 0.0,
+        "mean_ms": round(sum(durations) / len(durations) * 1000, 2) if durations else 0.0,
+        "max_ms": round(durations[-1] * 1000, 2) if durations else 0.0,
+    }
+    for pct in PERCENTILES:
+        summary[f"p{pct}_ms"] = round(percentile(durations, pct) * 1000, 2) if durations else 0.0
+    return summary
+
+
+def git_revision():
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"], cwd=BACKEND_DIR, capture_output=True, text=True, timeout=5
+        ).stdout.strip() or None
+    except (OSError, subprocess.SubprocessError):
+        return None
+
+
+# ==================== TAQQOSLASH ====================
+
+def compare(current, baseline, tolerance, min_delta_ms):
+    """
+    Har bir yo'l bo'yicha natijani baseline bilan solishtirish.
+    Regressiya: p50/p95 (1 + tolerance) martadan va min_delta_ms dan ko'proq oshgan,
+    throughput (1 - tolerance) dan pastga tushgan yoki 5xx/xatoliklar paydo bo'lgan.
+    """
+    rows = {}
+    for name, now in current["scenarios"].items():
+        before = baseline.get("scenarios", {}).get(name)
+        if before is None:
+            continue
+        problems = []
+        for pct in GATED_PERCENTILES:
+            key = f"p{pct}_ms"
+            if now[key] > before[key] * (1 + tolerance) and now[key] - before[key] > min_delta_ms:
+                problems.append(f"{key} {before[key]} -> {now[key]}")
+        if now["throughput_rps"] < before["throughput_rps"] * (1 - tolerance):
+            problems.append(f"throughput {before['throughput_rps']} -> {now['throughput_rps']} rps")
+        if now["errors"] > before["errors"]:
+            problems.append(f"xatoliklar {before['errors']} -> {now['errors']}")
+        rows[name] = {
+            "regressed": bool(problems),
+            "problems": problems,
+            "delta": {
+                key: round(now[key] - before[key], 2)
+                for key in [f"p{pct}_ms" for pct in PERCENTILES] + ["throughput_rps"]
+            },
+        }
+    return {
+        "baseline_revision": baseline.get("revision"),
+        "tolerance": tolerance,
+        "min_delta_ms": min_delta_ms,
+        "config_mismatch": sorted(
+            key for key in ("seed_data", "concurrency", "requests", "database")
+            if current.get(key) != baseline.get(key)
+        ),
+        "regressed": any(row["regressed"] for row in rows.values()),
+        "scenarios": rows,
+    }
+
+
+def log_comparison(comparison):
+    if comparison["config_mismatch"]:
+        logger.warning(f"⚠️ Baseline boshqa sozlamalar bilan olingan: {', '.join(comparison['config_mismatch'])}")
+    for name, row in comparison["scenarios"].items():
+        if row["regressed"]:
+            logger.error(f"❌ {name}: {'; '.join(row['problems'])}")
+        else:
+            logger.info(f"✅ {name}: p95 {row['delta']['p95_ms']:+} ms, throughput {row['delta']['throughput_rps']:+} rps")
+
+
+# ==================== CLI ====================
+
+def write_result(result, output):
+    text = json.dumps(result, ensure_ascii=False, indent=2)
+    if output:
+        with open(output, "w", encoding="utf-8") as f:
+            f.write(text + "\n")
+        logger.info(f"💾 Natija: {output}")
+    else:
+        print(text)
+
+
+def load_json(path):
+    with open(path, encoding="utf-8") as f:
+        return json.load(f)
+
+
+def add_seed_arguments(parser):
+    parser.add_argument("--barbers", type=int, default=10)
+    parser.add_argument("--services", type=int, default=8, help="Har bir sartarosh uchun")
+    parser.add_argument("--users", type=int, default=2000)
+    parser.add_argument("--bookings", type=int, default=20000)
+    parser.add_argument("--history-days", type=int, default=180)
+    parser.add_argument("--future-days", type=int, default=14)
+    parser.add_argument("--seed", type=int, default=42)
+
+
+def seed_options(args):
+    return dict(
+        barbers=args.barbers, services=args.services, users=args.users, bookings=args.bookings,
+        history_days=args.history_days, future_days=args.future_days, seed=args.seed
+    )
+
+
+def cmd_seed(args):
+    os.environ.setdefault("DATABASE_URL", "sqlite:///./benchmark.db")
+    seed_database(**seed_options(args), reset=args.reset)
+
+
+def cmd_run(args):
+    work_dir = tempfile.mkdtemp(prefix="benchmark-")
+    processes = []
+    seed_data = None
+    database_url = os.getenv("DATABASE_URL") if args.url else None
+
+    if not args.url:
+        # DATABASE_URL berilmasa - vaqtinchalik SQLite (har doim yangi)
+        database_url = os.getenv("DATABASE_URL") or f"sqlite:///{work_dir}/benchmark.db"
+        os.environ["DATABASE_URL"] = database_url
+        seed_data = seed_database(**seed_options(args), reset=args.reset)
+        api_url, processes = start_servers(database_url, work_dir)
+    else:
+        api_url = args.url.rstrip("/")
+
+    try:
+        barbers = httpx.get(f"{api_url}/api/barbers", timeout=30).json()
+        barber_ids = [barber["id"] for barber in barbers if barber.get("is_active", True)]
+        if not barber_ids:
+            raise SystemExit("❌ Faol sartaroshlar yo'q - avval `python benchmark.py seed`")
+
+        scenarios = args.scenario or list(SCENARIOS)
+        workload = Workload(barber_ids, args.future_days, args.seed, scenarios)
+        logger.info(f"🚀 {args.requests} ta so'rov, parallellik {args.concurrency}, {len(barber_ids)} sartarosh: {api_url}")
+        samples, elapsed = asyncio.run(drive(api_url, workload, args.requests, args.concurrency, args.warmup))
+    finally:
+        stop_servers(processes)
+
+    result = {
+        "created_at": datetime.utcnow().isoformat(timespec="seconds"),
+        "revision": git_revision(),
+        "python": platform.python_version(),
+        "database": database_url.split(":", 1)[0] if database_url else None,
+        "seed_data": seed_data,
+        "concurrency": args.concurrency,
+        "requests": args.requests,
+        "overall": summarize([sample for items in samples.values() for sample in items], elapsed),
+        "scenarios": {name: summarize(samples[name], elapsed) for name in scenarios if name in samples},
+    }
+    overall = result["overall"]
+    logger.info(f"📊 {overall['throughput_rps']} rps, p50 {overall['p50_ms']} ms, p95 {overall['p95_ms']} ms, "
+                f"p99 {overall['p99_ms']} ms, xatoliklar {overall['errors']}")
+
+    if args.baseline:
+        result["comparison"] = compare(result, load_json(args.baseline), args.tolerance, args.min_delta_ms)
+        log_comparison(result["comparison"])
+    write_result(result, args.output)
+    if result.get("comparison", {}).get("regressed"):
+        sys.exit(1)
+
+
+def cmd_compare(args):
+    comparison = compare(load_json(args.current), load_json(args.baseline), args.tolerance, args.min_delta_ms)
+    log_comparison(comparison)
+    write_result(comparison, args.output)
+    if comparison["regressed"]:
+        sys.exit(1)
+
+
+def build_parser():
+    parser = argparse.ArgumentParser(description="API benchmark va yuklama sinovi")
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    seed = commands.add_parser("seed", help="DATABASE_URL bazasini to'ldirish (default sqlite:///./benchmark.db)")
+    add_seed_arguments(seed)
+    seed.add_argument("--reset", action="store_true", help="Jadvallarni o'chirib qayta yaratish")
+    seed.set_defaults(handler=cmd_seed)
+
+    def add_compare_arguments(command):
+        command.add_argument("--tolerance", type=float, default=0.15, help="Ruxsat etilgan nisbiy yomonlashish")
+        command.add_argument("--min-delta-ms", type=float, default=2.0, help="Bundan kichik farq shovqin hisoblanadi")
+        command.add_argument("--output", help="JSON natija fayli (bo'lmasa stdout)")
+
+    run = commands.add_parser("run", help="Seed + serverlarni ko'tarish + yuklama")
+    add_seed_arguments(run)
+    run.add_argument("--reset", action="store_true", help="DATABASE_URL bazasini qayta yaratish")
+    run.add_argument("--url", help="Ishlab turgan server (seed va serverlar ko'tarilmaydi)")
+    run.add_argument("--concurrency", type=int, default=20)
+    run.add_argument("--requests", type=int, default=2000)
+    run.add_argument("--warmup", type=int, default=100)
+    run.add_argument("--scenario", action="append", choices=list(SCENARIOS),
+                     help="Faqat shu yo'llar (bir necha marta berish mumkin)")
+    run.add_argument("--baseline", help="Saqlangan natija bilan solishtirish")
+    add_compare_arguments(run)
+    run.set_defaults(handler=cmd_run)
+
+    comparison = commands.add_parser("compare", help="Ikki natija faylini solishtirish")
+    comparison.add_argument("current")
+    comparison.add_argument("baseline")
+    add_compare_arguments(comparison)
+    comparison.set_defaults(handler=cmd_compare)
+    return parser
+
+
+def main():
+    import log_setup
+    log_setup.configure(fmt="text", text_format=log_setup.CLI_FORMAT, stream=sys.stderr)
+    args = build_parser().parse_args()
+    args.handler(args)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,129 @@
+"""
+Bron yaratish va o'qish - API (main.py) va bot (bot.py) uchun umumiy
+
+Bron, uning xizmatlari, kerak bo'lsa yangi mijoz va xabarnomalar bitta unit of work:
+bitta flush (Booking INSERT ... RETURNING id), xizmatlar bitta bulk INSERT
+va bitta commit. Commitdan keyin qo'shimcha SELECT/refresh qilinmaydi.
+
+O'qish: xizmatlari kerak bo'lgan ro'yxatlar bookings_with_services() orqali olinadi -
+bronlar soniga qaramay doimiy so'rovlar soni (bronlar + bitta selectin so'rov).
+"""
+
+import logging
+
+from sqlalchemy import insert
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.orm import selectinload
+from sqlalchemy.orm.attributes import set_committed_value
+
+import availability
+import stats
+from database import Booking, BookingService, User
+
+logger = logging.getLogger(__name__)
+
+
+def bookings_with_services(db):
+    """Booking so'rovi, xizmatlar selectinload bilan (N+1 lazy load o'rniga bitta IN so'rov)"""
+    return db.query(Booking).options(selectinload(Booking.services))
+
+
+def service_to_dict(service):
+    return {
+        "service_name": service.service_name,
+        "service_code": service.service_code,
+        "price": service.price,
+        "duration": service.duration,
+    }
+
+
+def booking_to_dict(booking):
+    """API javobi uchun bron (services oldindan yuklangan bo'lishi kerak)"""
+    return {
+        "id": booking.id,
+        "date": booking.booking_date,
+        "time": booking.booking_time,
+        "user_name": booking.user_name,
+        "user_phone": booking.user_phone,
+        "total_price": booking.total_price,
+        "total_duration": booking.total_duration,
+        "services": [service_to_dict(service) for service in booking.services],
+    }
+
+
+class SlotTakenError(Exception):
+    """Tanlangan vaqt allaqachon band (unique_active_booking_per_barber_slot)"""
+
+
+def service_rows(services):
+    """Frontend formatidagi xizmatlar ({name, service, price, duration}) -> booking_services qatorlari"""
+    return [
+        {
+            "service_name": service.get("name"),
+            "service_code": service.get("service"),
+            "price": service.get("price"),
+            "duration": service.get("duration"),
+        }
+        for service in services or []
+    ]
+
+
+def create_booking(db, *, barber_id, user_telegram_id, user_name, user_phone, booking_date, booking_time,
+                   total_duration, total_price, services=None, register_user=False, before_commit=None):
+    """
+    Bronni bitta tranzaksiyada yaratish.
+
+    register_user=True - mijoz bazada bo'lmasa shu tranzaksiyada yaratiladi.
+    before_commit(db, booking) - flushdan keyin (booking.id ma'lum), commitdan oldin chaqiriladi
+    (masalan, outboxga xabarnoma yozish uchun).
+
+    Slot band bo'lsa SlotTakenError. Qaytarilgan bron session yopilgandan keyin ham o'qiladi.
+    """
+    new_booking = Booking(
+        barber_id=barber_id,
+        user_telegram_id=user_telegram_id,
+        user_name=user_name,
+        user_phone=user_phone,
+        booking_date=booking_date,
+        booking_time=booking_time,
+        total_duration=total_duration,
+        total_price=total_price
+    )
+    rows = service_rows(services)
+
+    if register_user and not db.query(User.id).filter(User.telegram_id == user_telegram_id).first():
+        db.add(User(telegram_id=user_telegram_id, name=user_name, phone=user_phone))
+
+    # Commitdan keyin atributlar expire qilinmasin - aks holda har bir o'qishda qayta SELECT
+    expire_on_commit = db.expire_on_commit
+    db.expire_on_commit = False
+    try:
+        db.add(new_booking)
+        db.flush()  # INSERT ... RETURNING id
+
+        # Xizmatlar - bitta bulk INSERT (har bir qator uchun alohida ORM obyekt va RETURNING yo'q)
+        for row in rows:
+            row["booking_id"] = new_booking.id
+        if rows:
+            db.execute(insert(BookingService), rows)
+        # booking.services ni qayta SELECT qilmasdan to'ldirish
+        set_committed_value(new_booking, "services", [BookingService(**row) for row in rows])
+
+        if before_commit:
+            before_commit(db, new_booking)
+        db.commit()
+    except IntegrityError:
+        db.rollback()
+        raise SlotTakenError(f"{booking_date} {booking_time} band")
+    finally:
+        db.expire_on_commit = expire_on_commit
+
+    logger.info(
+        "Bron #%s yaratildi: %s %s", new_booking.id, booking_date, booking_time,
+        extra={"booking_id": new_booking.id, "barber_id": barber_id}
+    )
+
+    # Bo'sh vaqtlar va statistika keshlarini yangilash
+    availability.invalidate(barber_id, booking_date)
+    stats.invalidate(barber_id)
+    return new_booking
@@ -1,16 +1,25 @@
 import os
 import logging
+import time
 from telegram import Update, ReplyKeyboardMarkup, KeyboardButton, WebAppInfo
 from telegram.ext import Application, CommandHandler, MessageHandler, filters, ContextTypes
+from telegram.request import HTTPXRequest
 from sqlalchemy.orm import sessionmaker
-from sqlalchemy.exc import IntegrityError
-from database import engine, User, Booking, BookingService, Barber, Service, create_tables
+from database import engine, run_db, run_in_session, check_sqlite_profile, User, Booking, Service, create_tables, parse_booking_day, parse_start_minute
 from datetime import datetime, timedelta
 from google_sheets import export_booking_to_sheets, export_all_bookings_to_sheets, get_sheets_url
 import json
 from functools import wraps
+import availability
+import barber_registry
+import booking_service
+import log_setup
+import metrics
+import notifications
+import profiling
+import stats
+from migrations import run_migrations
 
-logging.basicConfig(format='%(asctime)s - %(name)s - %(levelname)s - %(message)s', level=logging.INFO)
 logger = logging.getLogger(__name__)
 
 SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
@@ -78,81 +87,222 @@ def build_webapp_url(context):
     return WEBAPP_URL
 
 
+# ==================== DB yordamchi funksiyalar ====================
+# Bu funksiyalar run_in_session orqali DB thread pool'da bajariladi,
+# handlerlar esa event loop'ni bloklamaydi.
+
+def find_user(db, telegram_id, barber_id):
+    return db.query(User).filter(
+        User.telegram_id == telegram_id,
+        User.barber_id == barber_id
+    ).first()
+
+
+def save_user_registration(db, telegram_id, barber_id, name, phone):
+    """Foydalanuvchini yaratish yoki yangilash. Yangi yaratilgan bo'lsa True"""
+    existing_user = find_user(db, telegram_id, barber_id)
+    if not existing_user:
+        db.add(User(telegram_id=telegram_id, name=name, phone=phone, barber_id=barber_id))
+        db.commit()
+        stats.invalidate(barber_id)
+        return True
+    existing_user.name = name
+    existing_user.phone = phone
+    existing_user.is_blocked = False
+    db.commit()
+    return False
+
+
+def unblock_user(db, user_id):
+    """Botni qayta ishga tushirgan mijozni broadcast ro'yxatiga qaytarish"""
+    db.query(User).filter(User.id == user_id).update({User.is_blocked: False})
+    db.commit()
+
+
+@profiling.traced("template")
+def build_barber_notification(booking):
+    """Sartarosh uchun yangi bron xabari"""
+    # Xizmatlar ro'yxatini yaratish
+    services_text = ""
+    if booking.services:
+        services_text = "\n\n💼 **Xizmatlar:**\n"
+        for service in booking.services:
+            services_text += f"   • {service.service_name} - {service.price:,.0f} so'm ({service.duration} soat)\n"
+
+    return (
+        f"🎉 **YANGI BRON!**\n\n"
+        f"👤 **Mijoz:** {booking.user_name}\n"
+        f"📱 **Telefon:** {booking.user_phone}\n"
+        f"📅 **Sana:** {booking.booking_date}\n"
+        f"⏰ **Vaqt:** {booking.booking_time}\n"
+        f"⏱ **Davomiyligi:** {booking.total_duration} soat"
+        f"{services_text}\n"
+        f"💰 **Jami summa:** {booking.total_price:,.0f} so'm\n"
+        f"🆔 **Bron ID:** #{booking.id}"
+    )
+
+
+@profiling.traced("template")
+def build_booking_confirmation(booking, user):
+    """Web App orqali bron qilgan mijozga tasdiq xabari"""
+    # Xizmatlar ro'yxatini yaratish (foydalanuvchi uchun)
+    user_services_text = ""
+    if booking.services:
+        user_services_text = "\n💼 **Xizmatlar:**\n"
+        for service in booking.services:
+            user_services_text += f"   • {service.service_name} - {service.price:,.0f} so'm\n"
+
+    return (
+        f"✅ **BRON MUVAFFAQIYATLI TASDIQLANDI!** 🎉\n\n"
+        f"📋 **Bron ma'lumotlari:**\n"
+        f"🆔 Bron raqami: #{booking.id}\n"
+        f"📅 Sana: {booking.booking_date}\n"
+        f"⏰ Vaqt: {booking.booking_time}\n"
+        f"⏱ Davomiyligi: {booking.total_duration} soat\n"
+        f"👤 Ism: {user.name}"
+        f"{user_services_text}\n"
+        f"💰 **Jami summa:** {booking.total_price:,.0f} so'm\n\n"
+        f"📝 **Eslatma:**\n"
+        f"• Belgilangan vaqtda sartaroshxonaga tashrif buyuring\n"
+        f"• Telefon raqamingiz: {user.phone}\n"
+        f"• Bron raqamini eslab qoling: #{booking.id}\n\n"
+        f"❓ Savollar bo'lsa admin bilan bog'laning."
+    )
+
+
+def queue_barber_notification(db, booking):
+    """Sartaroshga xabar (barber'ning o'z admin_telegram_id'siga, o'z boti orqali) - bron tranzaksiyasida"""
+    barber_admin_id = get_barber_admin_id(booking.barber_id)
+    if barber_admin_id:
+        notifications.queue_notification(
+            db, barber_admin_id, build_barber_notification(booking), barber_id=booking.barber_id
+        )
+
+
+def save_web_app_booking(db, barber_id, user, booking_date, booking_time, services, total_price, total_duration):
+    """Web App bronini saqlash. Slot band bo'lsa None qaytaradi"""
+    try:
+        return booking_service.create_booking(
+            db,
+            barber_id=barber_id,
+            user_telegram_id=user.telegram_id,
+            user_name=user.name,
+            user_phone=user.phone,
+            booking_date=booking_date,
+            booking_time=booking_time,
+            total_duration=total_duration,
+            total_price=total_price,
+            services=services,
+            before_commit=queue_barber_notification
+        )
+    except booking_service.SlotTakenError:
+        # Database constraint violation - bu slot allaqachon band
+        return None
+
+
+def get_barber_admin_id(barber_id):
+    barber = barber_registry.get(barber_id)
+    if barber and barber.admin_telegram_id:
+        return barber.admin_telegram_id.strip()
+    return None
+
+
+def get_bookings_for_date(db, barber_id, day):
+    return booking_service.bookings_with_services(db).filter(
+        Booking.barber_id == barber_id,
+        Booking.booking_day == day,
+        Booking.is_active == True
+    ).order_by(Booking.start_minute).all()
+
+
+def get_bookings_between(db, barber_id, start_day, end_day):
+    return booking_service.bookings_with_services(db).filter(
+        Booking.barber_id == barber_id,
+        Booking.booking_day >= start_day,
+        Booking.booking_day <= end_day,
+        Booking.is_active == True
+    ).order_by(Booking.booking_day, Booking.start_minute).all()
+
+
+def get_super_admin_overview(db, barber_id):
+    # Sonlar statistika keshidan (bitta aggregatsiya so'rovi), so'nggi bronlar alohida
+    summary = stats.get_stats(db, barber_id, availability.current_tashkent_time().date())
+    total_users = summary["total_users"]
+    total_bookings = summary["total_bookings"]
+    recent_bookings = db.query(Booking).filter(Booking.barber_id == barber_id).order_by(Booking.created_at.desc()).limit(10).all()
+    return total_users, total_bookings, recent_bookings
+
+
 async def start(update: Update, context: ContextTypes.DEFAULT_TYPE) -> None:
     user_id = str(update.effective_user.id)
     username = update.effective_user.username or "yo'q"
     barber_id = get_barber_id(context)
     barber_name = get_barber_name(context)
-    logger.info(f"[{barber_name}] Start command from user: ID={user_id}, Username=@{username}")
-    db = SessionLocal()
+    logger.info("Start command: @%s", username, extra={"user_id": user_id})
 
-    try:
-        # Bu sartaroshda ro'yxatdan o'tgan usermi?
-        existing_user = db.query(User).filter(
-            User.telegram_id == user_id,
-            User.barber_id == barber_id
-        ).first()
+    # Bu sartaroshda ro'yxatdan o'tgan usermi?
+    existing_user = await run_in_session(find_user, user_id, barber_id)
+    if existing_user and existing_user.is_blocked:
+        await run_in_session(unblock_user, existing_user.id)
 
-        if not existing_user:
-            await update.message.reply_text(
-                f"Salom! {barber_name} sartaroshxonasiga xush kelibsiz! 👋\n\n"
-                "Bron qilish uchun iltimos ismingizni yuboring:"
-            )
-            context.user_data['registration_step'] = 'name'
-        else:
-            # Admin uchun maxsus tugmalar
-            if ALL_ADMIN_IDS and int(user_id) in ALL_ADMIN_IDS:
-                # Super Admin uchun qo'shimcha tugmalar
-                if SUPER_ADMIN_CHAT_IDS and int(user_id) in SUPER_ADMIN_CHAT_IDS:
-                    keyboard = [
-                        [KeyboardButton("📅 Bugungi Bronlar")],
-                        [KeyboardButton("📋 Barcha Bronlar")],
-                        [KeyboardButton("📊 Google Sheets")],
-                        [KeyboardButton("👑 Super Admin Panel")]
-                    ]
-                    reply_markup = ReplyKeyboardMarkup(keyboard, resize_keyboard=True)
-
-                    await update.message.reply_text(
-                        f"👑 Super Admin paneli - Xush kelibsiz, {existing_user.name}! \n\n"
-                        "Quyidagi tugmalardan birini tanlang:\n\n"
-                        "🔹 /mijozlar - Bugungi mijozlar\n"
-                        "🔹 /mijozlar_sana - Belgilangan sanadagi mijozlar\n"
-                        "🔹 /statistika - Umumiy statistika\n"
-                        "🔹 /help - Barcha buyruqlar",
-                        reply_markup=reply_markup
-                    )
-                else:
-                    # Oddiy Admin
-                    keyboard = [
-                        [KeyboardButton("📅 Bugungi Bronlar")],
-                        [KeyboardButton("📋 Barcha Bronlar")],
-                        [KeyboardButton("📊 Google Sheets")]
-                    ]
-                    reply_markup = ReplyKeyboardMarkup(keyboard, resize_keyboard=True)
-
-                    await update.message.reply_text(
-                        f"Admin paneli - Xush kelibsiz, {existing_user.name}! 👨‍💼\n\n"
-                        "Quyidagi tugmalardan birini tanlang:\n\n"
-                        "🔹 /mijozlar - Bugungi mijozlar\n"
-                        "🔹 /mijozlar_sana - Belgilangan sanadagi mijozlar\n"
-                        "🔹 /statistika - Umumiy statistika\n"
-                        "🔹 /help - Barcha buyruqlar",
-                        reply_markup=reply_markup
-                    )
+    if not existing_user:
+        await update.message.reply_text(
+            f"Salom! {barber_name} sartaroshxonasiga xush kelibsiz! 👋\n\n"
+            "Bron qilish uchun iltimos ismingizni yuboring:"
+        )
+        context.user_data['registration_step'] = 'name'
+    else:
+        # Admin uchun maxsus tugmalar
+        if ALL_ADMIN_IDS and int(user_id) in ALL_ADMIN_IDS:
+            # Super Admin uchun qo'shimcha tugmalar
+            if SUPER_ADMIN_CHAT_IDS and int(user_id) in SUPER_ADMIN_CHAT_IDS:
+                keyboard = [
+                    [KeyboardButton("📅 Bugungi Bronlar")],
+                    [KeyboardButton("📋 Barcha Bronlar")],
+                    [KeyboardButton("📊 Google Sheets")],
+                    [KeyboardButton("👑 Super Admin Panel")]
+                ]
+                reply_markup = ReplyKeyboardMarkup(keyboard, resize_keyboard=True)
+
+                await update.message.reply_text(
+                    f"👑 Super Admin paneli - Xush kelibsiz, {existing_user.name}! \n\n"
+                    "Quyidagi tugmalardan birini tanlang:\n\n"
+                    "🔹 /mijozlar - Bugungi mijozlar\n"
+                    "🔹 /mijozlar_sana - Belgilangan sanadagi mijozlar\n"
+                    "🔹 /statistika - Umumiy statistika\n"
+                    "🔹 /help - Barcha buyruqlar",
+                    reply_markup=reply_markup
+                )
             else:
-                # Oddiy foydalanuvchilar uchun
+                # Oddiy Admin
                 keyboard = [
-                    [KeyboardButton("✂️ BRON QILISH", web_app=WebAppInfo(url=build_webapp_url(context)))]
+                    [KeyboardButton("📅 Bugungi Bronlar")],
+                    [KeyboardButton("📋 Barcha Bronlar")],
+                    [KeyboardButton("📊 Google Sheets")]
                 ]
                 reply_markup = ReplyKeyboardMarkup(keyboard, resize_keyboard=True)
 
                 await update.message.reply_text(
-                    f"Xush kelibsiz, {existing_user.name}! 🎉\n\n"
-                    f"{barber_name} sartaroshxonasiga bron qilish uchun quyidagi tugmani bosing:",
+                    f"Admin paneli - Xush kelibsiz, {existing_user.name}! 👨‍💼\n\n"
+                    "Quyidagi tugmalardan birini tanlang:\n\n"
+                    "🔹 /mijozlar - Bugungi mijozlar\n"
+                    "🔹 /mijozlar_sana - Belgilangan sanadagi mijozlar\n"
+                    "🔹 /statistika - Umumiy statistika\n"
+                    "🔹 /help - Barcha buyruqlar",
                     reply_markup=reply_markup
                 )
-    finally:
-        db.close()
+        else:
+            # Oddiy foydalanuvchilar uchun
+            keyboard = [
+                [KeyboardButton("✂️ BRON QILISH", web_app=WebAppInfo(url=build_webapp_url(context)))]
+            ]
+            reply_markup = ReplyKeyboardMarkup(keyboard, resize_keyboard=True)
+
+            await update.message.reply_text(
+                f"Xush kelibsiz, {existing_user.name}! 🎉\n\n"
+                f"{barber_name} sartaroshxonasiga bron qilish uchun quyidagi tugmani bosing:",
+                reply_markup=reply_markup
+            )
 
 async def help_command(update: Update, context: ContextTypes.DEFAULT_TYPE) -> None:
     user_id = update.effective_user.id
@@ -200,102 +350,75 @@ async def handle_message(update: Update, context: ContextTypes.DEFAULT_TYPE) ->
     user_id = str(update.effective_user.id)
     text = update.message.text
     barber_id = get_barber_id(context)
-    barber_name = get_barber_name(context)
-    db = SessionLocal()
 
-    try:
-        if context.user_data.get('registration_step') == 'name':
-            context.user_data['name'] = text
-            context.user_data['registration_step'] = 'phone'
+    if context.user_data.get('registration_step') == 'name':
+        context.user_data['name'] = text
+        context.user_data['registration_step'] = 'phone'
 
-            keyboard = [[KeyboardButton("📱 Telefon raqamni yuborish", request_contact=True)]]
-            reply_markup = ReplyKeyboardMarkup(keyboard, resize_keyboard=True, one_time_keyboard=True)
+        keyboard = [[KeyboardButton("📱 Telefon raqamni yuborish", request_contact=True)]]
+        reply_markup = ReplyKeyboardMarkup(keyboard, resize_keyboard=True, one_time_keyboard=True)
 
-            await update.message.reply_text(
-                f"Rahmat, {text}! 😊\n\n"
-                "Endi telefon raqamingizni yuboring:",
-                reply_markup=reply_markup
-            )
+        await update.message.reply_text(
+            f"Rahmat, {text}! 😊\n\n"
+            "Endi telefon raqamingizni yuboring:",
+            reply_markup=reply_markup
+        )
 
 
-        elif context.user_data.get('registration_step') == 'phone' and update.message.contact:
-            phone = update.message.contact.phone_number
-            name = context.user_data.get('name')
-
-            logger.info(f"[{barber_name}] Processing phone registration: name={name}, phone={phone}, user_id={user_id}")
-
-            try:
-                # Check if user already exists for this barber
-                existing_user = db.query(User).filter(
-                    User.telegram_id == user_id,
-                    User.barber_id == barber_id
-                ).first()
-                if not existing_user:
-                    new_user = User(telegram_id=user_id, name=name, phone=phone, barber_id=barber_id)
-                    db.add(new_user)
-                    db.commit()
-                    logger.info(f"[{barber_name}] New user created: {user_id}")
-                else:
-                    # Update existing user
-                    existing_user.name = name
-                    existing_user.phone = phone
-                    db.commit()
-                    logger.info(f"[{barber_name}] User updated: {user_id}")
-
-                logger.info(f"WEB_APP_URL: {WEBAPP_URL}")
+    elif context.user_data.get('registration_step') == 'phone' and update.message.contact:
+        phone = update.message.contact.phone_number
+        name = context.user_data.get('name')
 
-                keyboard = [
-                    [KeyboardButton("✂️ BRON QILISH", web_app=WebAppInfo(url=build_webapp_url(context)))]
-                ]
-                reply_markup = ReplyKeyboardMarkup(keyboard, resize_keyboard=True)
+        logger.debug("Telefon bilan ro'yxatdan o'tish: %s", name, extra={"user_id": user_id})
 
-                await update.message.reply_text(
-                    f"Ro'yxatdan o'tish muvaffaqiyatli yakunlandi! ✅\n\n"
-                    f"Ism: {name}\n"
-                    f"Telefon: {phone}\n\n"
-                    "Endi sartaroshxonaga bron qilish uchun quyidagi tugmani bosing:",
-                    reply_markup=reply_markup
-                )
+        try:
+            # Foydalanuvchini yaratish yoki yangilash (shu sartarosh uchun)
+            created = await run_in_session(save_user_registration, user_id, barber_id, name, phone)
+            logger.info("Mijoz %s", "yaratildi" if created else "yangilandi", extra={"user_id": user_id})
 
-                logger.info(f"Registration complete message sent to {user_id}")
-                context.user_data.clear()
+            keyboard = [
+                [KeyboardButton("✂️ BRON QILISH", web_app=WebAppInfo(url=build_webapp_url(context)))]
+            ]
+            reply_markup = ReplyKeyboardMarkup(keyboard, resize_keyboard=True)
 
-            except Exception as e:
-                logger.error(f"Error during registration: {e}", exc_info=True)
-                await update.message.reply_text("Xatolik yuz berdi. Iltimos qaytadan urinib ko'ring.")
+            await update.message.reply_text(
+                f"Ro'yxatdan o'tish muvaffaqiyatli yakunlandi! ✅\n\n"
+                f"Ism: {name}\n"
+                f"Telefon: {phone}\n\n"
+                "Endi sartaroshxonaga bron qilish uchun quyidagi tugmani bosing:",
+                reply_markup=reply_markup
+            )
 
-        # Admin tugmalarini handle qilish
-        elif ALL_ADMIN_IDS and int(user_id) in ALL_ADMIN_IDS:
-            if text == "📅 Bugungi Bronlar":
-                await mijozlar_command(update, context)
-                return
-            elif text == "📋 Barcha Bronlar":
-                await all_bookings(update, context)
-                return
-            elif text == "📊 Google Sheets":
-                await sheets_url_command(update, context)
-                return
-            elif text == "👑 Super Admin Panel" and SUPER_ADMIN_CHAT_IDS and int(user_id) in SUPER_ADMIN_CHAT_IDS:
-                await super_admin_panel(update, context)
-                return
+            logger.debug("Ro'yxatdan o'tish xabari yuborildi", extra={"user_id": user_id})
+            context.user_data.clear()
 
-    finally:
-        db.close()
+        except Exception as e:
+            logger.error(f"Error during registration: {e}", exc_info=True)
+            await update.message.reply_text("Xatolik yuz berdi. Iltimos qaytadan urinib ko'ring.")
+
+    # Admin tugmalarini handle qilish
+    elif ALL_ADMIN_IDS and int(user_id) in ALL_ADMIN_IDS:
+        if text == "📅 Bugungi Bronlar":
+            await mijozlar_command(update, context)
+            return
+        elif text == "📋 Barcha Bronlar":
+            await all_bookings(update, context)
+            return
+        elif text == "📊 Google Sheets":
+            await sheets_url_command(update, context)
+            return
+        elif text == "👑 Super Admin Panel" and SUPER_ADMIN_CHAT_IDS and int(user_id) in SUPER_ADMIN_CHAT_IDS:
+            await super_admin_panel(update, context)
+            return
 
 
 async def web_app_data(update: Update, context: ContextTypes.DEFAULT_TYPE) -> None:
-    db = None
     barber_id = get_barber_id(context)
-    barber_name = get_barber_name(context)
     try:
         data = json.loads(update.effective_message.web_app_data.data)
         user_id = str(update.effective_user.id)
-        db = SessionLocal()
 
-        user = db.query(User).filter(
-            User.telegram_id == user_id,
-            User.barber_id == barber_id
-        ).first()
+        user = await run_in_session(find_user, user_id, barber_id)
         if not user:
             await update.message.reply_text("❌ Xatolik: Foydalanuvchi topilmadi.")
             return
@@ -306,126 +429,50 @@ async def web_app_data(update: Update, context: ContextTypes.DEFAULT_TYPE) -> No
         total_price = data.get('total_price', 0)
         total_duration = data.get('total_duration', 1)
 
+        if parse_booking_day(booking_date) is None or parse_start_minute(booking_time) is None:
+            await update.message.reply_text("❌ Noto'g'ri sana yoki vaqt. Iltimos, qaytadan tanlang.")
+            logger.warning("Noto'g'ri sana/vaqt: %s %s", booking_date, booking_time, extra={"user_id": user_id})
+            return
+
+        # Oldindan tekshirish: tanlangan vaqt hali bo'shmi
+        if not await run_in_session(availability.is_slot_available, booking_date, booking_time, total_duration, barber_id):
+            await update.message.reply_text(
+                f"❌ Kechirasiz, {booking_date} kuni soat {booking_time} allaqachon band!\n\n"
+                "Boshqa vaqtni tanlang."
+            )
+            logger.info("Slot band: %s %s", booking_date, booking_time, extra={"user_id": user_id})
+            return
+
         # Yangi bron yaratish (database-level constraint bilan himoyalangan)
-        new_booking = Booking(
-            barber_id=barber_id,
-            user_telegram_id=user_id,
-            user_name=user.name,
-            user_phone=user.phone,
-            booking_date=booking_date,
-            booking_time=booking_time,
-            total_duration=total_duration,
-            total_price=total_price
+        new_booking = await run_in_session(
+            save_web_app_booking, barber_id, user, booking_date, booking_time,
+            services, total_price, total_duration
         )
-
-        try:
-            db.add(new_booking)
-            db.commit()
-            db.refresh(new_booking)
-
-            # Xizmatlarni qo'shish
-            if services:
-                for service in services:
-                    booking_service = BookingService(
-                        booking_id=new_booking.id,
-                        service_name=service.get('name'),
-                        service_code=service.get('service'),
-                        price=service.get('price'),
-                        duration=service.get('duration')
-                    )
-                    db.add(booking_service)
-                db.commit()
-                db.refresh(new_booking)
-
-        except IntegrityError as e:
-            # Database constraint violation - bu slot allaqachon band
-            db.rollback()
+        if new_booking is None:
             await update.message.reply_text(
                 f"❌ Kechirasiz, {booking_date} kuni soat {booking_time} allaqachon band!\n\n"
                 "Boshqa vaqtni tanlang."
             )
-            logger.info(f"Conflict detected for {booking_date} {booking_time} by user {user_id}")
+            logger.info("Slot konflikti: %s %s", booking_date, booking_time, extra={"user_id": user_id})
             return
 
-        # Google Sheets'ga export qilish
+        # Google Sheets'ga export qilish (fon navbati orqali, kutilmaydi)
         try:
-            export_booking_to_sheets(new_booking)
-            logger.info(f"Bron #{new_booking.id} Google Sheets'ga export qilindi")
+            if export_booking_to_sheets(new_booking):
+                logger.debug("Google Sheets export navbatiga qo'shildi", extra={"booking_id": new_booking.id})
         except Exception as e:
             logger.error(f"Google Sheets export xatoligi: {e}")
 
-        # Sartaroshga xabar yuborish (barber'ning o'z admin_telegram_id'siga)
-        barber_admin_id = None
-        db_session = SessionLocal()
-        try:
-            barber_obj = db_session.query(Barber).filter(Barber.id == barber_id).first()
-            if barber_obj and barber_obj.admin_telegram_id:
-                barber_admin_id = barber_obj.admin_telegram_id.strip()
-        finally:
-            db_session.close()
-
-        if barber_admin_id:
-            try:
-                # Xizmatlar ro'yxatini yaratish
-                services_text = ""
-                if new_booking.services:
-                    services_text = "\n\n💼 **Xizmatlar:**\n"
-                    for service in new_booking.services:
-                        services_text += f"   • {service.service_name} - {service.price:,.0f} so'm ({service.duration} soat)\n"
-
-                admin_message = (
-                    f"🎉 **YANGI BRON!**\n\n"
-                    f"👤 **Mijoz:** {user.name}\n"
-                    f"📱 **Telefon:** {user.phone}\n"
-                    f"📅 **Sana:** {booking_date}\n"
-                    f"⏰ **Vaqt:** {booking_time}\n"
-                    f"⏱ **Davomiyligi:** {total_duration} soat"
-                    f"{services_text}\n"
-                    f"💰 **Jami summa:** {total_price:,.0f} so'm\n"
-                    f"🆔 **Bron ID:** #{new_booking.id}"
-                )
-
-                await context.bot.send_message(
-                    chat_id=int(barber_admin_id),
-                    text=admin_message,
-                    parse_mode='Markdown'
-                )
-                logger.info(f"[{barber_name}] Yangi bron haqida sartaroshga xabar yuborildi: #{new_booking.id}")
-            except Exception as e:
-                logger.error(f"[{barber_name}] Sartaroshga xabar yuborishda xatolik: {e}")
+        # Sartaroshga xabarnoma bron bilan birga outboxga yozilgan - dispatcherni uyg'otish
+        notifications.wake()
+        logger.debug("Sartarosh xabarnomasi navbatda", extra={"booking_id": new_booking.id})
 
         # Foydalanuvchiga ham batafsil ma'lumot
-        # Xizmatlar ro'yxatini yaratish (foydalanuvchi uchun)
-        user_services_text = ""
-        if new_booking.services:
-            user_services_text = "\n💼 **Xizmatlar:**\n"
-            for service in new_booking.services:
-                user_services_text += f"   • {service.service_name} - {service.price:,.0f} so'm\n"
-
-        await update.message.reply_text(
-            f"✅ **BRON MUVAFFAQIYATLI TASDIQLANDI!** 🎉\n\n"
-            f"📋 **Bron ma'lumotlari:**\n"
-            f"🆔 Bron raqami: #{new_booking.id}\n"
-            f"📅 Sana: {booking_date}\n"
-            f"⏰ Vaqt: {booking_time}\n"
-            f"⏱ Davomiyligi: {total_duration} soat\n"
-            f"👤 Ism: {user.name}"
-            f"{user_services_text}\n"
-            f"💰 **Jami summa:** {total_price:,.0f} so'm\n\n"
-            f"📝 **Eslatma:**\n"
-            f"• Belgilangan vaqtda sartaroshxonaga tashrif buyuring\n"
-            f"• Telefon raqamingiz: {user.phone}\n"
-            f"• Bron raqamini eslab qoling: #{new_booking.id}\n\n"
-            f"❓ Savollar bo'lsa admin bilan bog'laning.",
-            parse_mode='Markdown'
-        )
+        await update.message.reply_text(build_booking_confirmation(new_booking, user), parse_mode='Markdown')
 
     except Exception as e:
         logger.error(f"Web app data error: {e}")
         await update.message.reply_text("❌ Bron qilishda xatolik yuz berdi.")
-    finally:
-        if db:
-            db.close()
 
 @admin_only
 async def mijozlar_command(update: Update, context: ContextTypes.DEFAULT_TYPE) -> None:
@@ -433,14 +480,9 @@ async def mijozlar_command(update: Update, context: ContextTypes.DEFAULT_TYPE) -
     today = datetime.now().date()
     barber_id = get_barber_id(context)
 
-    db = SessionLocal()
     try:
         # Bugungi bronlarni olish (shu sartarosh uchun)
-        bookings = db.query(Booking).filter(
-            Booking.barber_id == barber_id,
-            Booking.booking_date == today.strftime('%Y-%m-%d'),
-            Booking.is_active == True
-        ).order_by(Booking.booking_time).all()
+        bookings = await run_in_session(get_bookings_for_date, barber_id, today)
 
         if not bookings:
             await update.message.reply_text(
@@ -468,8 +510,6 @@ async def mijozlar_command(update: Update, context: ContextTypes.DEFAULT_TYPE) -
 
     except Exception as e:
         await update.message.reply_text(f"❌ Xatolik: {str(e)}")
-    finally:
-        db.close()
 
 @admin_only
 async def mijozlar_sana_command(update: Update, context: ContextTypes.DEFAULT_TYPE) -> None:
@@ -506,14 +546,9 @@ async def mijozlar_sana_command(update: Update, context: ContextTypes.DEFAULT_TY
         return
 
     barber_id = get_barber_id(context)
-    db = SessionLocal()
     try:
         # Belgilangan sanadagi bronlarni olish (shu sartarosh uchun)
-        bookings = db.query(Booking).filter(
-            Booking.barber_id == barber_id,
-            Booking.booking_date == date_obj.strftime('%Y-%m-%d'),
-            Booking.is_active == True
-        ).order_by(Booking.booking_time).all()
+        bookings = await run_in_session(get_bookings_for_date, barber_id, date_obj)
 
         if not bookings:
             await update.message.reply_text(
@@ -536,43 +571,23 @@ async def mijozlar_sana_command(update: Update, context: ContextTypes.DEFAULT_TY
 
     except Exception as e:
         await update.message.reply_text(f"❌ Xatolik: {str(e)}")
-    finally:
-        db.close()
 
 @admin_only
 async def statistika_command(update: Update, context: ContextTypes.DEFAULT_TYPE) -> None:
     """Umumiy statistikani ko'rsatish"""
     barber_id = get_barber_id(context)
 
-    db = SessionLocal()
     try:
-        # Umumiy statistika (shu sartarosh uchun)
-        total_users = db.query(User).filter(User.barber_id == barber_id).count()
-        total_bookings = db.query(Booking).filter(Booking.barber_id == barber_id, Booking.is_active == True).count()
-
-        # Bugungi statistika
-        today = datetime.now().date()
-        today_bookings = db.query(Booking).filter(
-            Booking.barber_id == barber_id,
-            Booking.booking_date == today.strftime('%Y-%m-%d'),
-            Booking.is_active == True
-        ).count()
-
-        # Haftalik statistika
-        week_ago = today - timedelta(days=7)
-        week_bookings = db.query(Booking).filter(
-            Booking.barber_id == barber_id,
-            Booking.booking_date >= week_ago.strftime('%Y-%m-%d'),
-            Booking.is_active == True
-        ).count()
-
-        # Oylik statistika
-        month_ago = today - timedelta(days=30)
-        month_bookings = db.query(Booking).filter(
-            Booking.barber_id == barber_id,
-            Booking.booking_date >= month_ago.strftime('%Y-%m-%d'),
-            Booking.is_active == True
-        ).count()
+        # Umumiy, bugungi, haftalik va oylik statistika (shu sartarosh uchun)
+        # /api/stats bilan bir xil "bugun" (Toshkent vaqti) - kesh yozuvi va oynalar mos kelsin
+        today = availability.current_tashkent_time().date()
+        summary = await run_in_session(stats.get_stats, barber_id, today)
+        total_users = summary["total_users"]
+        total_bookings = summary["total_bookings"]
+        today_bookings = summary["today_bookings"]
+        week_bookings = summary["week_bookings"]
+        month_bookings = summary["month_bookings"]
+        revenue = summary["revenue"]
 
         message = "📊 *STATISTIKA*\n\n"
         message += f"👥 *Jami foydalanuvchilar:* {total_users}\n"
@@ -580,6 +595,15 @@ async def statistika_command(update: Update, context: ContextTypes.DEFAULT_TYPE)
         message += f"📅 *Bugun:* {today_bookings} ta bron\n"
         message += f"📅 *So'nggi 7 kun:* {week_bookings} ta bron\n"
         message += f"📅 *So'nggi 30 kun:* {month_bookings} ta bron\n\n"
+        message += "💰 *Daromad:*\n"
+        message += f"   Bugun: {revenue['today']:,.0f} so'm\n"
+        message += f"   7 kun: {revenue['week']:,.0f} so'm\n"
+        message += f"   30 kun: {revenue['month']:,.0f} so'm\n\n"
+        busiest = sorted(summary["busiest_hours"], key=lambda item: item["bookings"], reverse=True)[:3]
+        if busiest:
+            message += "⏰ *Eng band soatlar (30 kun):* "
+            message += ", ".join(f"{item['hour']:02d}:00 ({item['bookings']})" for item in busiest)
+            message += "\n\n"
         if month_bookings > 0:
             message += f"📈 *Kunlik o'rtacha:* {month_bookings/30:.1f} ta bron"
 
@@ -587,62 +611,52 @@ async def statistika_command(update: Update, context: ContextTypes.DEFAULT_TYPE)
 
     except Exception as e:
         await update.message.reply_text(f"❌ Xatolik: {str(e)}")
-    finally:
-        db.close()
 
 @admin_only
 async def all_bookings(update: Update, context: ContextTypes.DEFAULT_TYPE) -> None:
     barber_id = get_barber_id(context)
 
-    db = SessionLocal()
-    try:
-        # So'nggi 7 kunlik bronlar (shu sartarosh uchun)
-        start_date = datetime.now().date() - timedelta(days=7)
-        end_date = datetime.now().date() + timedelta(days=30)
+    # So'nggi 7 kunlik bronlar (shu sartarosh uchun)
+    start_date = datetime.now().date() - timedelta(days=7)
+    end_date = datetime.now().date() + timedelta(days=30)
 
-        bookings = db.query(Booking).filter(
-            Booking.barber_id == barber_id,
-            Booking.booking_date >= start_date.strftime('%Y-%m-%d'),
-            Booking.booking_date <= end_date.strftime('%Y-%m-%d'),
-            Booking.is_active == True
-        ).order_by(Booking.booking_date, Booking.booking_time).all()
+    bookings = await run_in_session(
+        get_bookings_between, barber_id, start_date, end_date
+    )
 
-        if not bookings:
-            await update.message.reply_text("📭 Hozircha bronlar yo'q.")
-            return
+    if not bookings:
+        await update.message.reply_text("📭 Hozircha bronlar yo'q.")
+        return
 
-        # Sanalar bo'yicha guruhlash
-        grouped_bookings = {}
-        for booking in bookings:
-            date = booking.booking_date
-            if date not in grouped_bookings:
-                grouped_bookings[date] = []
-            grouped_bookings[date].append(booking)
-
-        message = "📅 **BARCHA AKTIV BRONLAR**:\n\n"
-
-        for date, date_bookings in grouped_bookings.items():
-            try:
-                formatted_date = datetime.strptime(date, '%Y-%m-%d').strftime('%d.%m.%Y')
-            except:
-                formatted_date = date
-
-            message += f"📆 **{formatted_date}**:\n"
-            for booking in date_bookings:
-                message += f"  ⏰ {booking.booking_time} - {booking.user_name} ({booking.user_phone})\n"
-            message += "\n"
-
-        # Telegram message uzunligi chegarasi
-        if len(message) > 4000:
-            # Bo'lib yuborish
-            chunks = [message[i:i+4000] for i in range(0, len(message), 4000)]
-            for chunk in chunks:
-                await update.message.reply_text(chunk, parse_mode='Markdown')
-        else:
-            await update.message.reply_text(message, parse_mode='Markdown')
+    # Sanalar bo'yicha guruhlash
+    grouped_bookings = {}
+    for booking in bookings:
+        date = booking.booking_date
+        if date not in grouped_bookings:
+            grouped_bookings[date] = []
+        grouped_bookings[date].append(booking)
+
+    message = "📅 **BARCHA AKTIV BRONLAR**:\n\n"
 
-    finally:
-        db.close()
+    for date, date_bookings in grouped_bookings.items():
+        try:
+            formatted_date = datetime.strptime(date, '%Y-%m-%d').strftime('%d.%m.%Y')
+        except:
+            formatted_date = date
+
+        message += f"📆 **{formatted_date}**:\n"
+        for booking in date_bookings:
+            message += f"  ⏰ {booking.booking_time} - {booking.user_name} ({booking.user_phone})\n"
+        message += "\n"
+
+    # Telegram message uzunligi chegarasi
+    if len(message) > 4000:
+        # Bo'lib yuborish
+        chunks = [message[i:i+4000] for i in range(0, len(message), 4000)]
+        for chunk in chunks:
+            await update.message.reply_text(chunk, parse_mode='Markdown')
+    else:
+        await update.message.reply_text(message, parse_mode='Markdown')
 
 @admin_only
 async def sheets_url_command(update: Update, context: ContextTypes.DEFAULT_TYPE) -> None:
@@ -672,14 +686,9 @@ async def sheets_url_command(update: Update, context: ContextTypes.DEFAULT_TYPE)
 async def super_admin_panel(update: Update, context: ContextTypes.DEFAULT_TYPE) -> None:
     """Super Admin paneli"""
     barber_id = get_barber_id(context)
-    db = SessionLocal()
     try:
-        # Umumiy ma'lumotlar (shu sartarosh uchun)
-        total_users = db.query(User).filter(User.barber_id == barber_id).count()
-        total_bookings = db.query(Booking).filter(Booking.barber_id == barber_id, Booking.is_active == True).count()
-
-        # Oxirgi 10 ta bron
-        recent_bookings = db.query(Booking).filter(Booking.barber_id == barber_id).order_by(Booking.created_at.desc()).limit(10).all()
+        # Umumiy ma'lumotlar va oxirgi 10 ta bron (shu sartarosh uchun)
+        total_users, total_bookings, recent_bookings = await run_in_session(get_super_admin_overview, barber_id)
 
         message = "👑 **SUPER ADMIN PANEL**\n\n"
         message += f"📊 **Umumiy statistika:**\n"
@@ -702,8 +711,6 @@ async def super_admin_panel(update: Update, context: ContextTypes.DEFAULT_TYPE)
     except Exception as e:
         logger.error(f"Super Admin panel xatoligi: {e}")
         await update.message.reply_text("❌ Xatolik yuz berdi.")
-    finally:
-        db.close()
 
 async def error_handler(update: object, context: ContextTypes.DEFAULT_TYPE) -> None:
     """Log errors and handle conflicts"""
@@ -713,20 +720,74 @@ async def error_handler(update: object, context: ContextTypes.DEFAULT_TYPE) -> N
         logger.error("🚨 CONFLICT DETECTED: Another bot instance is running!")
         logger.error("Please stop all other bot instances and try again.")
 
-def create_bot_application(bot_token, barber_id):
+class InstrumentedApplication(Application):
+    """Har bir update qayta ishlanish vaqtini metrikaga yozadi (barber_id bo'yicha)"""
+
+    async def process_update(self, update: object) -> None:
+        started = time.perf_counter()
+        try:
+            # Handlerlardagi barcha loglar barber_id bilan
+            with log_setup.log_context(barber_id=self.bot_data.get('barber_id')):
+                await super().process_update(update)
+        finally:
+            metrics.bot_update_duration.observe(
+                time.perf_counter() - started, barber_id=self.bot_data.get('barber_id')
+            )
+
+
+class InstrumentedRequest(HTTPXRequest):
+    """Bot API so'rovlari (reply_text, send_message, ...) davomiyligi va xatoliklari"""
+
+    async def do_request(self, url, method, *args, **kwargs):
+        api_method = url.rsplit("/", 1)[-1]
+        started = time.perf_counter()
+        try:
+            with profiling.span("telegram", api_method):
+                code, payload = await super().do_request(url, method, *args, **kwargs)
+        except Exception as e:
+            metrics.observe_telegram("bot", api_method, time.perf_counter() - started, type(e).__name__)
+            raise
+        metrics.observe_telegram(
+            "bot", api_method, time.perf_counter() - started, None if code == 200 else str(code)
+        )
+        return code, payload
+
+
+def add_handlers(application):
+    """Buyruq va xabar handlerlari (PROFILING_ENABLED=1 bo'lsa har biri profillanadi)"""
+    profiled = profiling.profile_handler
+    application.add_handler(CommandHandler("start", profiled(start)))
+    application.add_handler(CommandHandler("help", profiled(help_command)))
+    application.add_handler(CommandHandler("mijozlar", profiled(mijozlar_command)))
+    application.add_handler(CommandHandler("mijozlar_sana", profiled(mijozlar_sana_command)))
+    application.add_handler(CommandHandler("statistika", profiled(statistika_command)))
+    application.add_handler(CommandHandler("super_admin", profiled(super_admin_panel)))
+    application.add_handler(MessageHandler(filters.TEXT & ~filters.COMMAND, profiled(handle_message)))
+    application.add_handler(MessageHandler(filters.CONTACT, profiled(handle_message)))
+    application.add_handler(MessageHandler(filters.StatusUpdate.WEB_APP_DATA, profiled(web_app_data)))
+
+
+def create_bot_application(bot_token, barber_id, use_updater=True):
     """
     Bot application yaratish (bot_manager.py dan chaqiriladi).
     Har bir sartarosh uchun alohida bot instance yaratadi.
+    use_updater=False - webhook rejimi: updatelar FastAPI route orqali keladi, polling yo'q.
     """
-    # Barber ma'lumotlarini olish
-    db = SessionLocal()
-    try:
-        barber = db.query(Barber).filter(Barber.id == barber_id).first()
-        barber_name = barber.name if barber else f"Barber-{barber_id}"
-    finally:
-        db.close()
-
-    application = Application.builder().token(bot_token).build()
+    # Barber ma'lumotlari (registry dan)
+    barber = barber_registry.get(barber_id)
+    barber_name = barber.name if barber else f"Barber-{barber_id}"
+
+    builder = (
+        Application.builder()
+        .application_class(InstrumentedApplication)
+        .token(bot_token)
+        .base_url(f"{notifications.TELEGRAM_API_URL}/bot")
+        # PTB default bilan bir xil pool (256), faqat metrikalar qo'shilgan; getUpdates o'lchanmaydi
+        .request(InstrumentedRequest(connection_pool_size=256))
+    )
+    if not use_updater:
+        builder = builder.updater(None)
+    application = builder.build()
 
     # Bot data ga barber_id va barber_name saqlash
     application.bot_data['barber_id'] = barber_id
@@ -735,16 +796,7 @@ def create_bot_application(bot_token, barber_id):
     # Add error handler
     application.add_error_handler(error_handler)
 
-    # Handlers
-    application.add_handler(CommandHandler("start", start))
-    application.add_handler(CommandHandler("help", help_command))
-    application.add_handler(CommandHandler("mijozlar", mijozlar_command))
-    application.add_handler(CommandHandler("mijozlar_sana", mijozlar_sana_command))
-    application.add_handler(CommandHandler("statistika", statistika_command))
-    application.add_handler(CommandHandler("super_admin", super_admin_panel))
-    application.add_handler(MessageHandler(filters.TEXT & ~filters.COMMAND, handle_message))
-    application.add_handler(MessageHandler(filters.CONTACT, handle_message))
-    application.add_handler(MessageHandler(filters.StatusUpdate.WEB_APP_DATA, web_app_data))
+    add_handlers(application)
 
     logger.info(f"✅ [{barber_name}] Bot application yaratildi (barber_id={barber_id})")
     return application
@@ -752,12 +804,16 @@ def create_bot_application(bot_token, barber_id):
 
 def main() -> None:
     """Yagona bot ishga tushirish (eski usul, backward compatible)"""
+    log_setup.ensure_configured()
+    profiling.instrument_engine(engine)
     if not BOT_TOKEN:
         logger.error("❌ BOT_TOKEN topilmadi! .env faylini tekshiring.")
         return
 
     logger.info("🤖 Bot ishga tushmoqda (single mode)...")
     create_tables()
+    run_migrations()
+    check_sqlite_profile()
 
     application = Application.builder().token(BOT_TOKEN).build()
 
@@ -768,15 +824,7 @@ def main() -> None:
     # Add error handler
     application.add_error_handler(error_handler)
 
-    application.add_handler(CommandHandler("start", start))
-    application.add_handler(CommandHandler("help", help_command))
-    application.add_handler(CommandHandler("mijozlar", mijozlar_command))
-    application.add_handler(CommandHandler("mijozlar_sana", mijozlar_sana_command))
-    application.add_handler(CommandHandler("statistika", statistika_command))
-    application.add_handler(CommandHandler("super_admin", super_admin_panel))
-    application.add_handler(MessageHandler(filters.TEXT & ~filters.COMMAND, handle_message))
-    application.add_handler(MessageHandler(filters.CONTACT, handle_message))
-    application.add_handler(MessageHandler(filters.StatusUpdate.WEB_APP_DATA, web_app_data))
+    add_handlers(application)
 
     try:
         logger.info("✅ Bot muvaffaqiyatli ishga tushdi!")
@@ -1,59 +1,179 @@
 """
 Multi-Bot Manager
 Har bir sartarosh uchun alohida Telegram bot ishga tushiradi.
+
+BOT_MODE=polling (default) - har bir bot o'z long-polling loopi bilan ishlaydi.
+BOT_MODE=webhook - barcha botlar bitta FastAPI route (/tg/{barber_id}/{secret}) orqali update oladi,
+manager har bir bot uchun webhookni Telegramda ro'yxatdan o'tkazadi.
 """
 
 import logging
 import asyncio
-from sqlalchemy.orm import sessionmaker
-from database import engine, Barber, create_tables
+import hashlib
+import hmac
+import os
+import time
+from datetime import datetime
+import broadcast
+import metrics
+from database import run_db, run_in_session, Barber, create_tables
 from bot import create_bot_application
 
-logging.basicConfig(format='%(asctime)s - %(name)s - %(levelname)s - %(message)s', level=logging.INFO)
 logger = logging.getLogger(__name__)
 
-SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
+BOT_MODE = os.getenv("BOT_MODE", "polling").lower()
+WEBHOOK_BASE_URL = os.getenv("WEBHOOK_BASE_URL", "").rstrip("/")  # Masalan: https://api.barberlocal.uz
+WEBHOOK_SECRET = os.getenv("WEBHOOK_SECRET", "")
+WEBHOOK_PATH = "/tg"
+
+ALLOWED_UPDATES = ["message", "callback_query"]
+
+BOT_STARTUP_CONCURRENCY = int(os.getenv("BOT_STARTUP_CONCURRENCY", "5"))
+BOT_STARTUP_TIMEOUT = float(os.getenv("BOT_STARTUP_TIMEOUT", "30"))
 
 # Running bot applications
 running_bots = {}
 
+# barber_id -> ishga tushish holati (starting/running/failed), davomiyligi va xatoligi
+bot_status = {}
+
+# start_all_bots_in_background() vazifasi
+startup_task = None
+
+
+def is_webhook_mode():
+    return BOT_MODE == "webhook"
+
+
+def webhook_config_error():
+    """Webhook rejimi sozlanmagan bo'lsa sababi (aks holda None)"""
+    if not is_webhook_mode():
+        return None
+    if not WEBHOOK_BASE_URL:
+        return "BOT_MODE=webhook, lekin WEBHOOK_BASE_URL berilmagan"
+    if not WEBHOOK_SECRET:
+        # Bo'sh kalit bilan HMAC - URL dagi secret tokendan oson hisoblanadi
+        return "BOT_MODE=webhook, lekin WEBHOOK_SECRET berilmagan"
+    return None
+
+
+def webhook_secret(bot_token):
+    """
+    Bot uchun URL va X-Telegram-Bot-Api-Secret-Token sarlavhasidagi maxfiy kalit.
+    Tokendan HMAC orqali olinadi - token URLda ochiq ko'rinmaydi.
+    """
+    return hmac.new(WEBHOOK_SECRET.encode(), bot_token.encode(), hashlib.sha256).hexdigest()[:48]
 
-async def start_bot(barber_id, bot_token, barber_name):
-    """Bitta botni ishga tushirish"""
-    try:
-        logger.info(f"🤖 [{barber_name}] Bot ishga tushmoqda... (ID: {barber_id})")
 
-        application = create_bot_application(bot_token, barber_id)
-        running_bots[barber_id] = application
+def webhook_url(barber_id, bot_token):
+    return f"{WEBHOOK_BASE_URL}{WEBHOOK_PATH}/{barber_id}/{webhook_secret(bot_token)}"
 
-        # Initialize and start
-        await application.initialize()
-        await application.start()
+
+def get_webhook_application(barber_id, secret):
+    """Webhook so'rovi uchun application. Bot ishlamasa yoki kalit noto'g'ri bo'lsa None"""
+    application = running_bots.get(barber_id)
+    if application is None:
+        return None
+    if not hmac.compare_digest(secret, webhook_secret(application.bot.token)):
+        return None
+    return application
+
+
+async def launch_bot(barber_id, bot_token):
+    """Application yaratish, initialize/start va polling yoki webhookni yoqish"""
+    config_error = webhook_config_error()
+    if config_error:
+        raise RuntimeError(config_error)
+    application = await run_db(create_bot_application, bot_token, barber_id, not is_webhook_mode())
+    running_bots[barber_id] = application
+
+    # Initialize and start
+    await application.initialize()
+    await application.start()
+    if is_webhook_mode():
+        await application.bot.set_webhook(
+            url=webhook_url(barber_id, bot_token),
+            allowed_updates=ALLOWED_UPDATES,
+            secret_token=webhook_secret(bot_token)
+        )
+    else:
         await application.updater.start_polling(
-            allowed_updates=["message", "callback_query"],
+            allowed_updates=ALLOWED_UPDATES,
             timeout=30,
             poll_interval=1.0
         )
 
-        logger.info(f"✅ [{barber_name}] Bot muvaffaqiyatli ishga tushdi!")
-        return True
 
+async def shutdown_quietly(application):
+    """Yarim ishga tushgan applicationni xatolarga e'tibor bermay yopish"""
+    try:
+        if application.updater and application.updater.running:
+            await application.updater.stop()
+        if application.running:
+            await application.stop()
+        await application.shutdown()
     except Exception as e:
-        logger.error(f"❌ [{barber_name}] Bot ishga tushmadi: {e}")
-        if barber_id in running_bots:
-            del running_bots[barber_id]
+        logger.debug(f"Application yopishda xatolik: {e}")
+
+
+def set_bot_status(barber_id, barber_name, state, duration=None, error=None):
+    bot_status[barber_id] = {
+        "barber_name": barber_name,
+        "state": state,
+        "startup_seconds": round(duration, 2) if duration is not None else None,
+        "error": error,
+        "updated_at": datetime.utcnow().isoformat(),
+    }
+
+
+async def start_bot(barber_id, bot_token, barber_name):
+    """Bitta botni ishga tushirish (BOT_STARTUP_TIMEOUT soniyadan oshsa bekor qilinadi)"""
+    logger.info(f"🤖 [{barber_name}] Bot ishga tushmoqda... (ID: {barber_id})")
+    set_bot_status(barber_id, barber_name, "starting")
+    started = time.monotonic()
+
+    try:
+        await asyncio.wait_for(launch_bot(barber_id, bot_token), timeout=BOT_STARTUP_TIMEOUT)
+    except Exception as e:
+        duration = time.monotonic() - started
+        if isinstance(e, asyncio.TimeoutError):
+            error = f"{BOT_STARTUP_TIMEOUT:g} soniyada ishga tushmadi (timeout)"
+        else:
+            error = str(e) or type(e).__name__
+        logger.error(f"❌ [{barber_name}] Bot ishga tushmadi: {error}")
+        application = running_bots.pop(barber_id, None)
+        if application:
+            await shutdown_quietly(application)
+        set_bot_status(barber_id, barber_name, "failed", duration, error)
         return False
 
+    duration = time.monotonic() - started
+    set_bot_status(barber_id, barber_name, "running", duration)
+    logger.info(f"✅ [{barber_name}] Bot muvaffaqiyatli ishga tushdi! ({duration:.1f}s)")
 
-async def stop_bot(barber_id, barber_name="Unknown"):
-    """Bitta botni to'xtatish"""
+    try:
+        await broadcast.resume_jobs(barber_id, running_bots[barber_id].bot, barber_name)
+    except Exception as e:
+        logger.error(f"❌ [{barber_name}] Broadcastlarni davom ettirishda xatolik: {e}", exc_info=True)
+    return True
+
+
+async def stop_bot(barber_id, barber_name="Unknown", remove_webhook=True):
+    """
+    Bitta botni to'xtatish.
+    remove_webhook=False - webhook Telegramda qoladi, server qayta ishga tushguncha updatelar navbatda kutadi.
+    """
     if barber_id in running_bots:
         try:
             application = running_bots[barber_id]
-            await application.updater.stop()
+            if application.updater:
+                await application.updater.stop()
+            elif remove_webhook:
+                await application.bot.delete_webhook()
             await application.stop()
             await application.shutdown()
             del running_bots[barber_id]
+            bot_status.pop(barber_id, None)
             logger.info(f"🛑 [{barber_name}] Bot to'xtatildi")
             return True
         except Exception as e:
@@ -64,38 +184,82 @@ async def stop_bot(barber_id, barber_name="Unknown"):
     return False
 
 
+@metrics.register_collector
+def collect_bot_metrics():
+    """Har bir ishlayotgan bot update navbati uzunligi (scrape paytida)"""
+    metrics.bot_queue_depth.clear()
+    for barber_id, application in list(running_bots.items()):
+        metrics.bot_queue_depth.set(application.update_queue.qsize(), barber_id=barber_id)
+    metrics.bots_running.set(len(running_bots))
+
+
+def get_active_barbers(db):
+    return db.query(Barber).filter(Barber.is_active == True).all()
+
+
 async def start_all_bots():
     """Barcha faol sartaroshlar uchun botlarni ishga tushirish"""
-    create_tables()
+    await run_db(create_tables)
+
+    barbers = await run_in_session(get_active_barbers)
+
+    if not barbers:
+        logger.warning("⚠️ Faol sartaroshlar topilmadi. Bot ishga tushmadi.")
+        logger.info("Admin paneldan sartarosh qo'shing: /admin/")
+        return
+
+    logger.info(f"📋 {len(barbers)} ta faol sartarosh topildi")
+
+    config_error = webhook_config_error()
+    if config_error:
+        logger.error(f"❌ {config_error}. Botlar ishga tushmadi.")
+        return
+
+    # Botlar parallel, lekin bir vaqtda BOT_STARTUP_CONCURRENCY tadan ko'p emas (Telegram API ga yuklama)
+    semaphore = asyncio.Semaphore(BOT_STARTUP_CONCURRENCY)
+
+    async def start_limited(barber):
+        async with semaphore:
+            return await start_bot(barber.id, barber.bot_token, barber.name)
+
+    started = time.monotonic()
+    results = await asyncio.gather(*(start_limited(barber) for barber in barbers))
+    failed = results.count(False)
+    logger.info(
+        f"✅ Jami {len(running_bots)} ta bot ishga tushdi ({time.monotonic() - started:.1f}s)"
+        + (f", {failed} ta xatolik" if failed else "")
+    )
 
-    db = SessionLocal()
-    try:
-        barbers = db.query(Barber).filter(Barber.is_active == True).all()
 
-        if not barbers:
-            logger.warning("⚠️ Faol sartaroshlar topilmadi. Bot ishga tushmadi.")
-            logger.info("Admin paneldan sartarosh qo'shing: /admin/")
-            return
+def start_all_bots_in_background():
+    """
+    Botlarni fon vazifasida ishga tushirish - HTTP server ularni kutmasdan so'rovlarni qabul qiladi.
+    Holatini /api/bots/status orqali kuzatish mumkin.
+    """
+    global startup_task
+    startup_task = asyncio.create_task(start_all_bots())
+    startup_task.add_done_callback(log_startup_result)
+    return startup_task
 
-        logger.info(f"📋 {len(barbers)} ta faol sartarosh topildi")
 
-        for barber in barbers:
-            await start_bot(barber.id, barber.bot_token, barber.name)
-            # Botlar orasida biroz kutish (conflict oldini olish)
-            await asyncio.sleep(1)
+def log_startup_result(task):
+    if not task.cancelled() and task.exception():
+        logger.error(f"❌ Botlarni ishga tushirishda xatolik: {task.exception()}", exc_info=task.exception())
 
-        logger.info(f"✅ Jami {len(running_bots)} ta bot ishga tushdi")
 
-    finally:
-        db.close()
+def is_starting():
+    return startup_task is not None and not startup_task.done()
 
 
 async def stop_all_bots():
     """Barcha botlarni to'xtatish"""
     logger.info("🛑 Barcha botlar to'xtatilmoqda...")
+    if is_starting():
+        startup_task.cancel()
+        await asyncio.gather(startup_task, return_exceptions=True)
     barber_ids = list(running_bots.keys())
     for barber_id in barber_ids:
-        await stop_bot(barber_id)
+        await stop_bot(barber_id, remove_webhook=False)
     logger.info("✅ Barcha botlar to'xtatildi")
 
 
@@ -0,0 +1,357 @@
+"""
+Ommaviy xabar yuborish (broadcast) vazifalari
+
+POST /api/broadcast faqat job yaratadi va darhol qaytadi. Yuborish fonda bajariladi:
+- mijozlar bazadan sahifalab (keyset, id > kursor) o'qiladi
+- bir vaqtda yuboriladigan xabarlar soni cheklangan (semaphore)
+- token bucket Telegram limitlarini saqlaydi: bot bo'yicha ~30 xabar/s, bitta chatga 1 xabar/s
+- RetryAfter kelsa butun bot kutadi va xabar qayta yuboriladi
+- botni bloklagan mijozlar User.is_blocked bilan belgilanadi va keyingi broadcastlarga kirmaydi
+- process qayta ishga tushsa yarim qolgan joblar sartarosh boti ko'tarilgach last_user_id
+  kursoridan davom ettiriladi (oxirgi saqlanmagan sahifa qayta yuborilishi mumkin)
+- admin matni plain text sifatida yuboriladi - Markdown belgilari (*, _) xatolik bermaydi
+"""
+
+import asyncio
+import logging
+import os
+import time
+from datetime import datetime, timedelta
+
+from telegram.error import BadRequest, Forbidden, NetworkError, RetryAfter, TimedOut
+
+from database import run_in_session, BroadcastFailure, BroadcastJob, User
+
+logger = logging.getLogger(__name__)
+
+GLOBAL_RATE = float(os.getenv("BROADCAST_RATE", "30"))  # Bitta bot uchun xabar/s
+PER_CHAT_INTERVAL = 1.0  # Bitta chatga xabarlar orasidagi minimal vaqt (s)
+CONCURRENCY = int(os.getenv("BROADCAST_CONCURRENCY", "10"))
+PAGE_SIZE = int(os.getenv("BROADCAST_PAGE_SIZE", "100"))
+MAX_ATTEMPTS = int(os.getenv("BROADCAST_MAX_ATTEMPTS", "3"))
+# Shundan eski yarim qolgan joblar davom ettirilmaydi (soat)
+RESUME_MAX_AGE_HOURS = float(os.getenv("BROADCAST_RESUME_MAX_AGE_HOURS", "24"))
+
+ACTIVE_STATUSES = ("pending", "running")
+
+
+class TokenBucket:
+    """
+    Asyncio token bucket: sekundiga `rate` ta token, `capacity` tagacha yig'iladi.
+    capacity=1 - xabarlar burstsiz, bir tekis taqsimlanadi (istalgan 1 s oynada <= rate + 1).
+    """
+
+    def __init__(self, rate, capacity=1):
+        self.rate = rate
+        self.capacity = capacity
+        self.tokens = self.capacity
+        self.updated = time.monotonic()
+        self.paused_until = 0.0
+        self._lock = asyncio.Lock()
+
+    def _refill(self, now):
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+
+    async def acquire(self):
+        async with self._lock:
+            while True:
+                now = time.monotonic()
+                if now < self.paused_until:
+                    await asyncio.sleep(self.paused_until - now)
+                    continue
+                self._refill(now)
+                if self.tokens >= 1:
+                    self.tokens -= 1
+                    return
+                await asyncio.sleep((1 - self.tokens) / self.rate)
+
+    def pause(self, seconds):
+        """Telegram RetryAfter qaytarganda hamma yuborishlarni to'xtatib turish"""
+        self.paused_until = max(self.paused_until, time.monotonic() + seconds)
+        self.tokens = 0
+
+
+class ChatThrottle:
+    """Bitta chatga PER_CHAT_INTERVAL dan tez-tez yubormaslik (qayta urinishlar uchun)"""
+
+    def __init__(self, interval=PER_CHAT_INTERVAL):
+        self.interval = interval
+        self.last_sent = {}
+
+    async def wait(self, chat_id):
+        last = self.last_sent.get(chat_id)
+        if last is not None:
+            delay = last + self.interval - time.monotonic()
+            if delay > 0:
+                await asyncio.sleep(delay)
+        self.last_sent[chat_id] = time.monotonic()
+
+
+# Har bir bot (sartarosh) uchun bitta umumiy bucket - bir nechta job bo'lsa ham limit bitta
+_buckets = {}
+
+# job_id -> asyncio.Task
+_tasks = {}
+
+# Startupda topilgan, bot ko'tarilgach davom ettiriladigan joblar: job_id -> barber_id
+_resumable = {}
+
+
+def get_bucket(barber_id):
+    bucket = _buckets.get(barber_id)
+    if bucket is None:
+        bucket = _buckets[barber_id] = TokenBucket(GLOBAL_RATE)
+    return bucket
+
+
+def retry_after_seconds(error):
+    retry_after = error.retry_after
+    if isinstance(retry_after, timedelta):
+        return retry_after.total_seconds()
+    return float(retry_after)
+
+
+# ==================== DB YORDAMCHI FUNKSIYALAR ====================
+
+def recipients_query(db, barber_id):
+    return db.query(User).filter(User.barber_id == barber_id, User.is_blocked == False)
+
+
+def get_active_job(db, barber_id):
+    return db.query(BroadcastJob).filter(
+        BroadcastJob.barber_id == barber_id,
+        BroadcastJob.status.in_(ACTIVE_STATUSES)
+    ).first()
+
+
+def create_job(db, barber_id, message):
+    job = BroadcastJob(
+        barber_id=barber_id,
+        message=message,
+        status="pending",
+        total=recipients_query(db, barber_id).count()
+    )
+    db.add(job)
+    db.commit()
+    db.refresh(job)
+    return job
+
+
+def get_job(db, job_id):
+    return db.query(BroadcastJob).filter(BroadcastJob.id == job_id).first()
+
+
+def load_recipients_page(db, barber_id, last_user_id, limit=PAGE_SIZE):
+    """Keyingi sahifa: [(user_id, telegram_id), ...] id bo'yicha tartiblangan"""
+    rows = db.query(User.id, User.telegram_id).filter(
+        User.barber_id == barber_id,
+        User.is_blocked == False,
+        User.id > last_user_id
+    ).order_by(User.id).limit(limit).all()
+    return [(row.id, row.telegram_id) for row in rows]
+
+
+def set_job_status(db, job_id, status, error=None):
+    job = get_job(db, job_id)
+    job.status = status
+    if status == "running" and job.started_at is None:
+        job.started_at = datetime.utcnow()
+    if status not in ACTIVE_STATUSES:
+        job.finished_at = datetime.utcnow()
+    if error:
+        job.error = error[:500]
+    db.commit()
+
+
+def save_page_progress(db, job_id, last_user_id, sent, failures):
+    """Sahifa natijasini bitta tranzaksiyada yozish. failures: [(user_id, telegram_id, error, blocked)]"""
+    job = get_job(db, job_id)
+    job.last_user_id = last_user_id
+    job.sent += sent
+    job.failed += len(failures)
+
+    blocked_ids = [user_id for user_id, _, _, blocked in failures if blocked]
+    job.blocked += len(blocked_ids)
+    if blocked_ids:
+        db.query(User).filter(User.id.in_(blocked_ids)).update(
+            {User.is_blocked: True}, synchronize_session=False
+        )
+
+    db.add_all([
+        BroadcastFailure(job_id=job_id, user_id=user_id, telegram_id=telegram_id, error=error[:500])
+        for user_id, telegram_id, error, _ in failures
+    ])
+    db.commit()
+
+
+def mark_interrupted_jobs(db):
+    """
+    Process qayta ishga tushganda yarim qolgan joblarni 'interrupted' deb belgilash va
+    RESUME_MAX_AGE_HOURS dan yangilarini davom ettirish ro'yxatiga olish (resume_jobs).
+    """
+    count = db.query(BroadcastJob).filter(BroadcastJob.status.in_(ACTIVE_STATUSES)).update(
+        {BroadcastJob.status: "interrupted", BroadcastJob.finished_at: datetime.utcnow()},
+        synchronize_session=False
+    )
+    db.commit()
+
+    cutoff = datetime.utcnow() - timedelta(hours=RESUME_MAX_AGE_HOURS)
+    rows = db.query(BroadcastJob.id, BroadcastJob.barber_id).filter(
+        BroadcastJob.status == "interrupted",
+        BroadcastJob.created_at >= cutoff
+    ).all()
+    _resumable.update({row.id: row.barber_id for row in rows})
+    return count
+
+
+def claim_job(db, job_id):
+    """
+    Yarim qolgan jobni davom ettirish uchun egallash: interrupted -> pending.
+    Bir nechta worker bo'lsa faqat bittasi yutadi (boshqalarga None).
+    """
+    claimed = db.query(BroadcastJob).filter(
+        BroadcastJob.id == job_id,
+        BroadcastJob.status == "interrupted"
+    ).update({BroadcastJob.status: "pending", BroadcastJob.finished_at: None}, synchronize_session=False)
+    db.commit()
+    return get_job(db, job_id) if claimed else None
+
+
+def job_to_dict(job, recent_failures=None):
+    processed = job.sent + job.failed
+    return {
+        "job_id": job.id,
+        "barber_id": job.barber_id,
+        "status": job.status,
+        "total": job.total,
+        "sent": job.sent,
+        "failed": job.failed,
+        "blocked": job.blocked,
+        "progress": round(processed * 100 / job.total, 1) if job.total else 100.0,
+        "error": job.error,
+        "created_at": job.created_at.isoformat() if job.created_at else None,
+        "started_at": job.started_at.isoformat() if job.started_at else None,
+        "finished_at": job.finished_at.isoformat() if job.finished_at else None,
+        "recent_failures": recent_failures or [],
+    }
+
+
+def get_job_status(db, job_id, failures_limit=20):
+    job = get_job(db, job_id)
+    if not job:
+        return None
+    failures = db.query(BroadcastFailure).filter(
+        BroadcastFailure.job_id == job_id
+    ).order_by(BroadcastFailure.id.desc()).limit(failures_limit).all()
+    return job_to_dict(job, [
+        {"telegram_id": f.telegram_id, "error": f.error} for f in failures
+    ])
+
+
+# ==================== YUBORISH ====================
+
+async def send_one(bot, chat_id, text, bucket, throttle):
+    """
+    Bitta xabarni yuborish. (ok, error, blocked) qaytaradi.
+    RetryAfter va tarmoq xatolarida MAX_ATTEMPTS martagacha qayta uriniladi.
+    """
+    error = None
+    for attempt in range(1, MAX_ATTEMPTS + 1):
+        await throttle.wait(chat_id)
+        await bucket.acquire()
+        try:
+            # parse_mode yo'q: admin matnidagi yopilmagan * yoki _ har bir mijozda BadRequest berardi
+            await bot.send_message(chat_id=int(chat_id), text=text)
+            return True, None, False
+        except RetryAfter as e:
+            seconds = retry_after_seconds(e)
+            logger.warning(f"Broadcast: RetryAfter {seconds}s (chat {chat_id}, urinish {attempt})")
+            bucket.pause(seconds)
+            error = str(e)
+        except Forbidden as e:
+            # "bot was blocked by the user", "user is deactivated" - qayta urinish foydasiz
+            return False, str(e), True
+        except BadRequest as e:
+            # NetworkError ning bolasi, lekin qayta urinish foydasiz (chat not found, Markdown xatosi)
+            return False, str(e), False
+        except (TimedOut, NetworkError) as e:
+            error = str(e)
+            await asyncio.sleep(min(2 ** attempt, 10))
+        except Exception as e:
+            return False, str(e), False
+    return False, error or "Yuborib bo'lmadi", False
+
+
+async def run_job(job_id, barber_id, bot, text, last_user_id=0):
+    """Job ni sahifa-sahifa bajarish va har sahifadan keyin progressni saqlash"""
+    bucket = get_bucket(barber_id)
+    throttle = ChatThrottle()
+    semaphore = asyncio.Semaphore(CONCURRENCY)
+
+    async def send_limited(chat_id):
+        async with semaphore:
+            return await send_one(bot, chat_id, text, bucket, throttle)
+
+    await run_in_session(set_job_status, job_id, "running")
+    try:
+        while True:
+            page = await run_in_session(load_recipients_page, barber_id, last_user_id)
+            if not page:
+                break
+
+            results = await asyncio.gather(*(send_limited(telegram_id) for _, telegram_id in page))
+
+            sent = 0
+            failures = []
+            for (user_id, telegram_id), (ok, error, blocked) in zip(page, results):
+                if ok:
+                    sent += 1
+                else:
+                    failures.append((user_id, telegram_id, error, blocked))
+
+            last_user_id = page[-1][0]
+            await run_in_session(save_page_progress, job_id, last_user_id, sent, failures)
+            throttle.last_sent.clear()  # Sahifadagi chatlar qayta uchramaydi
+
+        await run_in_session(set_job_status, job_id, "completed")
+        logger.info(f"✅ Broadcast #{job_id} tugadi")
+    except asyncio.CancelledError:
+        await run_in_session(set_job_status, job_id, "interrupted")
+        raise
+    except Exception as e:
+        logger.error(f"❌ Broadcast #{job_id} xatolik: {e}", exc_info=True)
+        await run_in_session(set_job_status, job_id, "failed", str(e))
+    finally:
+        _tasks.pop(job_id, None)
+
+
+def start_job(job, bot, barber_name):
+    """Job ni fon vazifasi sifatida ishga tushirish"""
+    text = f"📢 {barber_name} sartaroshxonasidan xabar:\n\n{job.message}"
+    task = asyncio.create_task(run_job(job.id, job.barber_id, bot, text, job.last_user_id or 0))
+    _tasks[job.id] = task
+    return task
+
+
+async def resume_jobs(barber_id, bot, barber_name):
+    """Sartarosh boti ishga tushgach uning yarim qolgan joblarini last_user_id dan davom ettirish"""
+    resumed = 0
+    for job_id in [job_id for job_id, owner in _resumable.items() if owner == barber_id]:
+        _resumable.pop(job_id, None)
+        job = await run_in_session(claim_job, job_id)
+        if job is None:
+            continue
+        start_job(job, bot, barber_name)
+        resumed += 1
+        logger.info(f"🔁 Broadcast #{job_id} davom ettirildi (mijoz id > {job.last_user_id or 0})")
+    return resumed
+
+
+async def cancel_all_jobs():
+    """Shutdown paytida ishlayotgan joblarni to'xtatish (ular 'interrupted' bo'lib qoladi)"""
+    tasks = list(_tasks.values())
+    for task in tasks:
+        task.cancel()
+    if tasks:
+        await asyncio.gather(*tasks, return_exceptions=True)
@@ -0,0 +1,80 @@
+"""
+Sartaroshlar va xizmatlar katalogi uchun HTTP kesh (ETag / Cache-Control)
+
+Katalog juda kam o'zgaradi, Web App esa har ochilganda /api/barbers/{id} va /api/services ni so'raydi.
+Har bir barber/service o'zgarishida `bump()` versiyani oshiradi; ETag shu versiyadan yasaladi.
+Mijoz If-None-Match bilan kelsa va versiya o'zgarmagan bo'lsa - 304, DB ga murojaat qilinmaydi.
+
+ETag ga process ishga tushgan vaqt ham qo'shiladi: restartdan keyin versiya 0 dan boshlanadi,
+eski ETag tasodifan mos kelib qolmasligi kerak.
+"""
+
+import os
+import threading
+import time
+
+from fastapi import Request, Response
+
+# 0 - brauzer har safar ETag bilan tekshiradi (no-cache); >0 - shuncha soniya tekshirmasdan ishlatadi
+CATALOGUE_MAX_AGE = int(os.getenv("CATALOGUE_MAX_AGE", "0"))
+
+_BOOT_ID = format(int(time.time()), "x")
+_lock = threading.Lock()
+_version = 0
+
+# (barber_id) -> (versiya, bootstrap payload)
+_bootstrap_cache = {}
+
+
+def version() -> int:
+    return _version
+
+
+def bump() -> None:
+    """Barber yoki service o'zgarganda chaqiriladi"""
+    global _version
+    with _lock:
+        _version += 1
+        _bootstrap_cache.clear()
+
+
+def etag() -> str:
+    return f'W/"cat-{_BOOT_ID}-{_version}"'
+
+
+def cache_control() -> str:
+    if CATALOGUE_MAX_AGE > 0:
+        return f"public, max-age={CATALOGUE_MAX_AGE}"
+    return "no-cache"
+
+
+def set_headers(response: Response) -> None:
+    response.headers["ETag"] = etag()
+    response.headers["Cache-Control"] = cache_control()
+
+
+def not_modified(request: Request):
+    """If-None-Match joriy ETag ga mos kelsa tayyor 304 javob, aks holda None"""
+    if_none_match = request.headers.get("if-none-match")
+    if not if_none_match:
+        return None
+    current = etag()
+    candidates = [tag.strip() for tag in if_none_match.split(",")]
+    # Weak taqqoslash: W/ prefiksi hisobga olinmaydi
+    if "*" in candidates or current.removeprefix("W/") in [tag.removeprefix("W/") for tag in candidates]:
+        return Response(status_code=304, headers={"ETag": current, "Cache-Control": cache_control()})
+    return None
+
+
+def get_bootstrap(barber_id: int):
+    entry = _bootstrap_cache.get(barber_id)
+    if entry and entry[0] == _version:
+        return entry[1]
+    return None
+
+
+def set_bootstrap(barber_id: int, cached_version: int, payload) -> None:
+    """Payload hisoblanayotganda versiya o'zgargan bo'lsa saqlanmaydi"""
+    with _lock:
+        if cached_version == _version:
+            _bootstrap_cache[barber_id] = (cached_version, payload)
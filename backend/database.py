@@ -1,16 +1,70 @@
-from sqlalchemy import create_engine, Column, Integer, String, DateTime, Boolean, UniqueConstraint, ForeignKey, Float
+from sqlalchemy import create_engine, event, Column, Integer, String, DateTime, Boolean, UniqueConstraint, ForeignKey, Float, Index, Date, false
 from sqlalchemy.ext.declarative import declarative_base
 from sqlalchemy.orm import sessionmaker, relationship
 from datetime import datetime
+from concurrent.futures import ThreadPoolExecutor
+import asyncio
+import contextvars
+import functools
+import logging
 import os
 
+logger = logging.getLogger(__name__)
+
 DATABASE_URL = os.getenv("DATABASE_URL", "sqlite:///./bookings.db")
+IS_SQLITE = DATABASE_URL.startswith("sqlite")
+
+# Connection pool: DB thread pool + FastAPI threadpool + fon workerlar uchun yetarli bo'lsin
+DB_POOL_SIZE = int(os.getenv("DB_POOL_SIZE", "10"))
+DB_MAX_OVERFLOW = int(os.getenv("DB_MAX_OVERFLOW", "20"))
+DB_POOL_TIMEOUT = float(os.getenv("DB_POOL_TIMEOUT", "30"))
+DB_POOL_RECYCLE = int(os.getenv("DB_POOL_RECYCLE", "1800"))
+
+# SQLite production profili - har bir yangi ulanishda qo'llanadi.
+# WAL: yozuvchi o'quvchilarni bloklamaydi; NORMAL: WAL bilan xavfsiz, har commitda fsync yo'q;
+# busy_timeout: "database is locked" o'rniga lock bo'shashini kutish.
+SQLITE_BUSY_TIMEOUT_MS = int(os.getenv("SQLITE_BUSY_TIMEOUT_MS", "5000"))
+SQLITE_PRAGMAS = {
+    "journal_mode": os.getenv("SQLITE_JOURNAL_MODE", "WAL"),
+    "synchronous": os.getenv("SQLITE_SYNCHRONOUS", "NORMAL"),
+    "busy_timeout": SQLITE_BUSY_TIMEOUT_MS,
+    "mmap_size": int(os.getenv("SQLITE_MMAP_SIZE", str(256 * 1024 * 1024))),
+    "cache_size": int(os.getenv("SQLITE_CACHE_SIZE", "-65536")),  # manfiy - KiB (64 MB)
+    "temp_store": "MEMORY",
+}
 
 # SQLite uchun check_same_thread, PostgreSQL uchun yo'q
-if DATABASE_URL.startswith("sqlite"):
-    engine = create_engine(DATABASE_URL, connect_args={"check_same_thread": False})
+if IS_SQLITE:
+    # :memory: baza SingletonThreadPool ishlatadi - pool sozlamalari faqat fayl bazasi uchun
+    pool_args = {} if ":memory:" in DATABASE_URL else {
+        "pool_size": DB_POOL_SIZE,
+        "max_overflow": DB_MAX_OVERFLOW,
+        "pool_timeout": DB_POOL_TIMEOUT,
+    }
+    engine = create_engine(
+        DATABASE_URL,
+        connect_args={"check_same_thread": False, "timeout": SQLITE_BUSY_TIMEOUT_MS / 1000},
+        **pool_args
+    )
+    # sqlite:///./data/bookings.db - papka bo'lmasa SQLite "unable to open database file" beradi
+    if engine.url.database and engine.url.database != ":memory:":
+        os.makedirs(os.path.dirname(os.path.abspath(engine.url.database)), exist_ok=True)
+
+    @event.listens_for(engine, "connect")
+    def apply_sqlite_pragmas(dbapi_connection, connection_record):
+        cursor = dbapi_connection.cursor()
+        for name, value in SQLITE_PRAGMAS.items():
+            cursor.execute(f"PRAGMA {name}={value}")
+        cursor.close()
 else:
-    engine = create_engine(DATABASE_URL)
+    engine = create_engine(
+        DATABASE_URL,
+        pool_size=DB_POOL_SIZE,
+        max_overflow=DB_MAX_OVERFLOW,
+        pool_timeout=DB_POOL_TIMEOUT,
+        pool_recycle=DB_POOL_RECYCLE,
+        pool_pre_ping=True,
+    )
 SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
 Base = declarative_base()
 
@@ -51,6 +105,10 @@ class Service(Base):
     # Relationship
     barber = relationship("Barber", back_populates="services")
 
+    __table_args__ = (
+        Index('ix_services_barber_active', 'barber_id', 'is_active'),
+    )
+
 class User(Base):
     __tablename__ = "users"
 
@@ -59,6 +117,7 @@ class User(Base):
     name = Column(String)
     phone = Column(String)
     barber_id = Column(Integer, ForeignKey('barbers.id'), nullable=True)  # Qaysi sartarosh mijozi
+    is_blocked = Column(Boolean, default=False, server_default=false())  # Botni bloklagan - broadcast yuborilmaydi
     created_at = Column(DateTime, default=datetime.utcnow)
 
     # Relationship
@@ -66,6 +125,8 @@ class User(Base):
 
     __table_args__ = (
         UniqueConstraint('telegram_id', 'barber_id', name='unique_user_per_barber'),
+        # Broadcast va mijozlar soni: barber_id bo'yicha (telegram_id bilan covering)
+        Index('ix_users_barber_telegram', 'barber_id', 'telegram_id'),
     )
 
 class Booking(Base):
@@ -78,6 +139,9 @@ class Booking(Base):
     user_phone = Column(String)
     booking_date = Column(String)  # YYYY-MM-DD format
     booking_time = Column(String)  # HH:00 format
+    # Native ko'rinishlar (so'rovlar shularni ishlatadi); satr ustunlardan avtomatik to'ldiriladi
+    booking_day = Column(Date, nullable=True)
+    start_minute = Column(Integer, nullable=True)  # Kun boshidan daqiqalar: "10:30" -> 630
     total_duration = Column(Integer, default=1)  # Jami soat
     total_price = Column(Float, default=0)  # Jami summa
     created_at = Column(DateTime, default=datetime.utcnow)
@@ -89,13 +153,44 @@ class Booking(Base):
 
     __table_args__ = (
         UniqueConstraint('barber_id', 'booking_date', 'booking_time', 'is_active', name='unique_active_booking_per_barber_slot'),
+        # Bo'sh vaqtlar va statistika: barber + aktiv + sana oralig'i (vaqt/davomiylik bilan covering)
+        Index('ix_bookings_barber_active_date', 'barber_id', 'is_active', 'booking_date', 'booking_time', 'total_duration'),
+        # Sartaroshsiz so'rovlar (/bookings/{date})
+        Index('ix_bookings_date_active', 'booking_date', 'is_active'),
+        # Native ustunlar: bo'sh vaqtlar, statistika, sana oralig'i
+        Index('ix_bookings_barber_active_day', 'barber_id', 'is_active', 'booking_day', 'start_minute', 'total_duration'),
+        Index('ix_bookings_day_active', 'booking_day', 'is_active'),
+        # So'nggi bronlar (super admin panel)
+        Index('ix_bookings_barber_created', 'barber_id', 'created_at'),
     )
 
+def parse_booking_day(value):
+    """'YYYY-MM-DD' -> date (noto'g'ri bo'lsa None)"""
+    try:
+        return datetime.strptime(value, "%Y-%m-%d").date()
+    except (TypeError, ValueError):
+        return None
+
+def parse_start_minute(value):
+    """'HH:MM' -> kun boshidan daqiqalar (noto'g'ri bo'lsa None)"""
+    try:
+        parsed = datetime.strptime(value, "%H:%M")
+    except (TypeError, ValueError):
+        return None
+    return parsed.hour * 60 + parsed.minute
+
+@event.listens_for(Booking, "before_insert")
+@event.listens_for(Booking, "before_update")
+def sync_booking_native_columns(mapper, connection, target):
+    """booking_date/booking_time satrlaridan booking_day/start_minute ni to'ldirish"""
+    target.booking_day = parse_booking_day(target.booking_date)
+    target.start_minute = parse_start_minute(target.booking_time)
+
 class BookingService(Base):
     __tablename__ = "booking_services"
 
     id = Column(Integer, primary_key=True, index=True)
-    booking_id = Column(Integer, ForeignKey('bookings.id'))
+    booking_id = Column(Integer, ForeignKey('bookings.id'), index=True)
     service_name = Column(String)
     service_code = Column(String)
     price = Column(Float)
@@ -105,12 +200,139 @@ class BookingService(Base):
     # Relationship
     booking = relationship("Booking", back_populates="services")
 
+class SheetsExportState(Base):
+    """Google Sheets eksporti: har bir varaq uchun oxirgi eksport qilingan bron ID"""
+    __tablename__ = "sheets_export_state"
+
+    worksheet_key = Column(String, primary_key=True)  # "main" yoki "barber:<id>"
+    last_booking_id = Column(Integer, default=0)
+    updated_at = Column(DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+
+class BroadcastJob(Base):
+    """Ommaviy xabar yuborish vazifasi va uning holati"""
+    __tablename__ = "broadcast_jobs"
+
+    id = Column(Integer, primary_key=True, index=True)
+    barber_id = Column(Integer, ForeignKey('barbers.id'), nullable=False)
+    message = Column(String, nullable=False)
+    status = Column(String, default="pending")  # pending, running, completed, failed, interrupted
+    total = Column(Integer, default=0)
+    sent = Column(Integer, default=0)
+    failed = Column(Integer, default=0)
+    blocked = Column(Integer, default=0)  # Shulardan botni bloklaganlar
+    last_user_id = Column(Integer, default=0)  # Keyset kursor: oxirgi ishlangan User.id
+    error = Column(String, nullable=True)
+    created_at = Column(DateTime, default=datetime.utcnow)
+    started_at = Column(DateTime, nullable=True)
+    finished_at = Column(DateTime, nullable=True)
+
+    failures = relationship("BroadcastFailure", back_populates="job", cascade="all, delete-orphan")
+
+    __table_args__ = (
+        Index('ix_broadcast_jobs_barber_status', 'barber_id', 'status'),
+    )
+
+class BroadcastFailure(Base):
+    """Broadcast paytida xabar yetkazilmagan mijozlar"""
+    __tablename__ = "broadcast_failures"
+
+    id = Column(Integer, primary_key=True, index=True)
+    job_id = Column(Integer, ForeignKey('broadcast_jobs.id'), index=True, nullable=False)
+    user_id = Column(Integer)
+    telegram_id = Column(String)
+    error = Column(String)
+    created_at = Column(DateTime, default=datetime.utcnow)
+
+    job = relationship("BroadcastJob", back_populates="failures")
+
+class NotificationOutbox(Base):
+    """
+    Telegram xabarnomalari navbati. Bron bilan bitta tranzaksiyada yoziladi,
+    dispatcher (notifications.py) fonda yuboradi.
+    """
+    __tablename__ = "notifications_outbox"
+
+    id = Column(Integer, primary_key=True, index=True)
+    barber_id = Column(Integer, ForeignKey('barbers.id'), nullable=True)  # Qaysi bot yuboradi (None - asosiy BOT_TOKEN)
+    chat_id = Column(String, nullable=False)
+    text = Column(String, nullable=False)
+    parse_mode = Column(String, nullable=True, default="Markdown")
+    status = Column(String, default="pending")  # pending, sending, sent, dead
+    attempts = Column(Integer, default=0)
+    next_attempt_at = Column(DateTime, default=datetime.utcnow)
+    lease_until = Column(DateTime, nullable=True)  # status=sending: shu vaqtgacha worker egallagan
+    last_error = Column(String, nullable=True)
+    created_at = Column(DateTime, default=datetime.utcnow)
+    sent_at = Column(DateTime, nullable=True)
+
+    __table_args__ = (
+        # Dispatcher: navbatdagi xabarlar id tartibida
+        Index('ix_notifications_outbox_status_id', 'status', 'id'),
+    )
+
 def create_tables():
     Base.metadata.create_all(bind=engine)
 
+def check_sqlite_profile(bind=None):
+    """
+    Startup self-check: ulanishdagi haqiqiy PRAGMA qiymatlarini o'qib logga yozish.
+    Kutilgandan farq qilsa (masalan, tarmoq diskida WAL yoqilmasa) ogohlantiradi.
+    {pragma: qiymat} qaytaradi, SQLite bo'lmasa None.
+    """
+    bind = bind or engine
+    if bind.dialect.name != "sqlite":
+        return None
+
+    with bind.connect() as conn:
+        effective = {
+            name: conn.exec_driver_sql(f"PRAGMA {name}").scalar()
+            for name in SQLITE_PRAGMAS
+        }
+
+    expected = {
+        "journal_mode": str(SQLITE_PRAGMAS["journal_mode"]).lower(),
+        # synchronous raqam qaytaradi: 0=OFF, 1=NORMAL, 2=FULL, 3=EXTRA
+        "synchronous": {"OFF": 0, "NORMAL": 1, "FULL": 2, "EXTRA": 3}.get(str(SQLITE_PRAGMAS["synchronous"]).upper()),
+        "busy_timeout": SQLITE_PRAGMAS["busy_timeout"],
+    }
+    mismatched = {name: effective[name] for name, value in expected.items() if effective[name] != value}
+
+    logger.info(f"SQLite profil: {effective}, pool: {bind.pool.status()}")
+    if mismatched:
+        logger.warning(f"⚠️ SQLite PRAGMA kutilgandek emas: {mismatched}")
+    return effective
+
 def get_db():
     db = SessionLocal()
     try:
         yield db
     finally:
         db.close()
+
+
+# Sinxron SQLAlchemy ishlari event loop'ni bloklamasligi uchun alohida thread pool
+DB_EXECUTOR_WORKERS = int(os.getenv("DB_EXECUTOR_WORKERS", "8"))
+db_executor = ThreadPoolExecutor(max_workers=DB_EXECUTOR_WORKERS, thread_name_prefix="db")
+
+async def run_db(func, *args, **kwargs):
+    """
+    Sinxron funksiyani DB thread pool'da bajarish va natijasini kutish.
+    contextvars (log konteksti: barber_id va h.k.) thread ichiga ko'chiriladi.
+    """
+    loop = asyncio.get_running_loop()
+    context = contextvars.copy_context()
+    return await loop.run_in_executor(db_executor, functools.partial(context.run, func, *args, **kwargs))
+
+def _call_with_session(func, *args, **kwargs):
+    db = SessionLocal()
+    try:
+        return func(db, *args, **kwargs)
+    finally:
+        db.close()
+
+async def run_in_session(func, *args, **kwargs):
+    """
+    func(db, *args, **kwargs) ni yangi session bilan DB thread pool'da bajarish.
+    Session shu thread ichida ochiladi va yopiladi.
+    """
+    return await run_db(_call_with_session, func, *args, **kwargs)
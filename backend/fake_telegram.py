@@ -0,0 +1,135 @@
+"""
+Lokal soxta Telegram Bot API server (test va yuklama sinovlari uchun)
+
+    python fake_telegram.py [port]          # default 8081
+    TELEGRAM_API_URL=http://127.0.0.1:8081 uvicorn main:app
+
+Yuborilgan xabarlar xotirada saqlanadi. parse_mode=Markdown da yopilmagan "*", "_" yoki "`"
+bo'lsa, haqiqiy API kabi 400 "can't parse entities" qaytadi. Xatoliklarni oldindan belgilash mumkin:
+
+    POST   /_fake/fail      {"chat_id": "123", "status": 429, "retry_after": 1, "times": 2}
+    GET    /_fake/messages  - qabul qilingan xabarlar
+    DELETE /_fake/messages  - xabarlar va belgilangan xatoliklarni tozalash
+"""
+
+import sys
+import time
+from collections import defaultdict, deque
+
+from fastapi import FastAPI, Request
+from fastapi.responses import JSONResponse
+
+app = FastAPI(title="Fake Telegram Bot API")
+
+ERROR_DESCRIPTIONS = {
+    400: "Bad Request: chat not found",
+    403: "Forbidden: bot was blocked by the user",
+    429: "Too Many Requests: retry after {retry_after}",
+    500: "Internal Server Error",
+    502: "Bad Gateway",
+}
+
+messages = []
+# chat_id ("*" - istalgan chat) -> navbatdagi xatoliklar [(status, retry_after), ...]
+failures = defaultdict(deque)
+
+
+def telegram_error(status, retry_after=None):
+    body = {
+        "ok": False,
+        "error_code": status,
+        "description": ERROR_DESCRIPTIONS.get(status, "Error").format(retry_after=retry_after),
+    }
+    if status == 429:
+        body["parameters"] = {"retry_after": retry_after or 1}
+    return JSONResponse(body, status_code=status)
+
+
+def markdown_error(text):
+    """Legacy Markdown: yopilmagan belgi bo'lsa Telegram xatolik matni, aks holda None"""
+    for char in "*_`":
+        if (text or "").count(char) % 2:
+            offset = text.rindex(char)
+            return f"Bad Request: can't parse entities: Can't find end of the entity starting at byte offset {offset}"
+    return None
+
+
+def next_failure(chat_id):
+    for key in (chat_id, "*"):
+        if failures[key]:
+            return failures[key].popleft()
+    return None
+
+
+async def read_params(request):
+    if request.headers.get("content-type", "").startswith("application/json"):
+        return await request.json()
+    return dict(await request.form())
+
+
+@app.post("/bot{token}/sendMessage")
+async def send_message(token: str, request: Request):
+    params = await read_params(request)
+    chat_id = str(params.get("chat_id"))
+
+    failure = next_failure(chat_id)
+    if failure:
+        return telegram_error(*failure)
+
+    if params.get("parse_mode") in ("Markdown", "MarkdownV1"):
+        description = markdown_error(params.get("text"))
+        if description:
+            return JSONResponse({"ok": False, "error_code": 400, "description": description}, status_code=400)
+
+    message = {
+        "message_id": len(messages) + 1,
+        "date": int(time.time()),
+        "chat": {"id": int(chat_id) if chat_id.lstrip("-").isdigit() else chat_id, "type": "private"},
+        "text": params.get("text"),
+    }
+    messages.append({"token": token, "parse_mode": params.get("parse_mode"), **message})
+    return {"ok": True, "result": message}
+
+
+@app.post("/bot{token}/getMe")
+async def get_me(token: str):
+    bot_id = token.split(":")[0]
+    return {"ok": True, "result": {
+        "id": int(bot_id) if bot_id.isdigit() else 1,
+        "is_bot": True,
+        "first_name": "Fake Bot",
+        "username": f"fake_{bot_id}_bot",
+    }}
+
+
+@app.post("/bot{token}/{method}")
+async def other_method(token: str, method: str):
+    """setWebhook, deleteWebhook va boshqalar - har doim muvaffaqiyatli"""
+    return {"ok": True, "result": True}
+
+
+@app.post("/_fake/fail")
+async def add_failure(request: Request):
+    params = await request.json()
+    chat_id = str(params.get("chat_id", "*"))
+    for _ in range(int(params.get("times", 1))):
+        failures[chat_id].append((int(params.get("status", 500)), params.get("retry_after")))
+    return {"ok": True, "queued": len(failures[chat_id])}
+
+
+@app.get("/_fake/messages")
+async def get_messages():
+    return {"count": len(messages), "messages": messages}
+
+
+@app.delete("/_fake/messages")
+async def clear_messages():
+    messages.clear()
+    failures.clear()
+    return {"ok": True}
+
+
+if __name__ == "__main__":
+    import uvicorn
+    port = int(sys.argv[1]) if len(sys.argv) > 1 else 8081
+    uvicorn.run(app, host="127.0.0.1", port=port)
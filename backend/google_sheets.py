@@ -1,8 +1,14 @@
 import gspread
 from oauth2client.service_account import ServiceAccountCredentials
 import os
+import queue
+import threading
+import time
+from contextlib import contextmanager
 from datetime import datetime
-from database import SessionLocal, Booking
+from database import SessionLocal, Booking, Barber, SheetsExportState
+import metrics
+import profiling
 import logging
 from dotenv import load_dotenv
 
@@ -10,11 +16,92 @@ load_dotenv()
 
 logger = logging.getLogger(__name__)
 
+HEADERS = [
+    'ID', 'Mijoz Ismi', 'Telefon', 'Sana', 'Vaqt',
+    'Yaratilgan Vaqt', 'Status', 'Telegram ID'
+]
+
+# Export navbati sozlamalari
+SHEETS_BATCH_SIZE = int(os.getenv("SHEETS_BATCH_SIZE", "50"))
+SHEETS_FLUSH_INTERVAL = float(os.getenv("SHEETS_FLUSH_INTERVAL", "5"))
+SHEETS_MAX_RETRIES = int(os.getenv("SHEETS_MAX_RETRIES", "5"))
+SHEETS_BACKOFF_BASE = float(os.getenv("SHEETS_BACKOFF_BASE", "2"))
+SHEETS_BACKOFF_MAX = float(os.getenv("SHEETS_BACKOFF_MAX", "60"))
+
+# To'liq/incremental eksportda bitta API chaqiruvidagi qatorlar soni
+SHEETS_EXPORT_CHUNK = int(os.getenv("SHEETS_EXPORT_CHUNK", "5000"))
+
+# Asosiy varaq (sheet1) uchun eksport holati kaliti
+MAIN_SHEET_KEY = "main"
+
+
+def booking_to_row(booking):
+    """Bron ma'lumotlarini jadval qatoriga aylantirish"""
+    return [
+        booking.id,
+        booking.user_name,
+        booking.user_phone,
+        booking.booking_date,
+        booking.booking_time,
+        booking.created_at.strftime('%Y-%m-%d %H:%M:%S') if booking.created_at else '',
+        'Aktiv' if booking.is_active else 'Bekor qilingan',
+        booking.user_telegram_id
+    ]
+
+
+def worksheet_title(barber):
+    """Sartarosh varag'i nomi (Sheets taqiqlagan belgilarsiz)"""
+    name = "".join(ch for ch in barber.name if ch not in "[]:*?/\\")
+    return f"{name} #{barber.id}"[:100]
+
+
+def get_last_exported_id(db, key):
+    state = db.query(SheetsExportState).filter(SheetsExportState.worksheet_key == key).first()
+    return state.last_booking_id if state else 0
+
+
+def set_last_exported_id(db, key, booking_id, force=False):
+    """Oxirgi eksport qilingan ID ni saqlash (force bo'lmasa faqat oshiriladi)"""
+    state = db.query(SheetsExportState).filter(SheetsExportState.worksheet_key == key).first()
+    if not state:
+        db.add(SheetsExportState(worksheet_key=key, last_booking_id=booking_id))
+    elif force or booking_id > (state.last_booking_id or 0):
+        state.last_booking_id = booking_id
+    db.commit()
+
+
+def iter_booking_chunks(db, chunk_size, since_id=0, barber_id=None, without_barber=False):
+    """Bronlarni ID tartibida bo'laklab o'qish (butun jadval xotiraga yuklanmaydi)"""
+    query = db.query(Booking).filter(Booking.id > since_id)
+    if barber_id is not None:
+        query = query.filter(Booking.barber_id == barber_id)
+    elif without_barber:
+        query = query.filter(Booking.barber_id == None)
+
+    chunk = []
+    for booking in query.order_by(Booking.id).yield_per(chunk_size):
+        chunk.append(booking_to_row(booking))
+        if len(chunk) >= chunk_size:
+            yield chunk
+            chunk = []
+    if chunk:
+        yield chunk
+
+
+def is_retryable_error(error):
+    """Kvota (429) va vaqtinchalik server (5xx) xatoliklari qayta urinishga arziydi"""
+    response = getattr(error, 'response', None)
+    status = getattr(response, 'status_code', None) or getattr(error, 'status_code', None)
+    return status == 429 or (status is not None and 500 <= status < 600)
+
+
 class GoogleSheetsManager:
-    def __init__(self):
+    def __init__(self, sheet=None):
         self.gc = None
-        self.sheet = None
-        self.setup_sheets()
+        self.sheet = sheet
+        self._headers_ready = False
+        if sheet is None:
+            self.setup_sheets()
     
     def setup_sheets(self):
         """Google Sheets API ni sozlash"""
@@ -50,23 +137,23 @@ class GoogleSheetsManager:
             return False
     
     def create_headers_if_needed(self):
-        """Agar jadval bo'sh bo'lsa, sarlavhalarni yaratish"""
+        """Agar jadval bo'sh bo'lsa, sarlavhalarni yaratish (natija keshlanadi)"""
         try:
             if not self.sheet:
                 return False
+
+            if self._headers_ready:
+                return True
                 
             # Birinchi qatorni tekshirish
             first_row = self.sheet.row_values(1)
             
             if not first_row or len(first_row) == 0:
                 # Sarlavhalarni qo'shish
-                headers = [
-                    'ID', 'Mijoz Ismi', 'Telefon', 'Sana', 'Vaqt', 
-                    'Yaratilgan Vaqt', 'Status', 'Telegram ID'
-                ]
-                self.sheet.insert_row(headers, 1)
+                self.sheet.insert_row(HEADERS, 1)
                 logger.info("Google Sheets sarlavhalari yaratildi")
             
+            self._headers_ready = True
             return True
             
         except Exception as e:
@@ -81,20 +168,8 @@ class GoogleSheetsManager:
             
             self.create_headers_if_needed()
             
-            # Bron ma'lumotlarini tayyorlash
-            row_data = [
-                booking.id,
-                booking.user_name,
-                booking.user_phone,
-                booking.booking_date,
-                booking.booking_time,
-                booking.created_at.strftime('%Y-%m-%d %H:%M:%S') if booking.created_at else '',
-                'Aktiv' if booking.is_active else 'Bekor qilingan',
-                booking.user_telegram_id
-            ]
-            
             # Qatorni qo'shish
-            self.sheet.append_row(row_data)
+            self.sheet.append_row(booking_to_row(booking))
             logger.info(f"Bron #{booking.id} Google Sheets'ga export qilindi")
             return True
             
@@ -102,50 +177,105 @@ class GoogleSheetsManager:
             logger.error(f"Bronni export qilishda xatolik: {e}")
             return False
     
-    def export_all_bookings(self):
-        """Barcha bronlarni Google Sheets'ga export qilish"""
+    def get_or_create_worksheet(self, title):
+        """Nomi bo'yicha varaqni olish, yo'q bo'lsa yaratish"""
+        spreadsheet = self.sheet.spreadsheet
+        try:
+            return spreadsheet.worksheet(title)
+        except gspread.exceptions.WorksheetNotFound:
+            return spreadsheet.add_worksheet(title=title, rows=1000, cols=len(HEADERS))
+
+    def _export_to_worksheet(self, db, worksheet, key, incremental, chunk_size, **filters):
+        """
+        Bitta varaqqa eksport. To'liq rejimda varaq tozalanib qayta yoziladi,
+        incremental rejimda faqat oxirgi eksport qilingan ID dan keyingilar qo'shiladi.
+        Har bir bo'lak bitta append_rows chaqiruvi.
+        """
+        since_id = get_last_exported_id(db, key) if incremental else 0
+        if not incremental:
+            worksheet.clear()
+            if worksheet is self.sheet:
+                self._headers_ready = False
+
+        count = 0
+        last_id = since_id
+        for index, rows in enumerate(iter_booking_chunks(db, chunk_size, since_id, **filters)):
+            if index == 0 and not incremental:
+                rows = [HEADERS] + rows
+                if worksheet is self.sheet:
+                    self._headers_ready = True
+            worksheet.append_rows(rows)
+            count += len(rows) - (1 if index == 0 and not incremental else 0)
+            last_id = rows[-1][0]
+
+        if not incremental and count == 0:
+            worksheet.append_rows([HEADERS])
+        set_last_exported_id(db, key, last_id, force=not incremental)
+        return count
+
+    def export_all_bookings(self, per_barber=False, incremental=False, chunk_size=SHEETS_EXPORT_CHUNK):
+        """
+        Barcha bronlarni Google Sheets'ga export qilish.
+        per_barber=True - har bir sartarosh uchun alohida varaq ("Ism #id").
+        incremental=True - jadvalni tozalamasdan, faqat yangi bronlarni qo'shish.
+        """
         try:
             if not self.sheet:
                 return False
-            
+
             db = SessionLocal()
-            
+
             try:
-                # Barcha bronlarni olish
-                bookings = db.query(Booking).order_by(Booking.created_at.desc()).all()
-                
-                if not bookings:
-                    logger.info("Export qilish uchun bronlar topilmadi")
-                    return True
-                
-                # Jadvalni tozalash (sarlavhalardan boshqa)
-                self.sheet.clear()
-                self.create_headers_if_needed()
-                
-                # Barcha bronlarni qo'shish
-                for booking in bookings:
-                    row_data = [
-                        booking.id,
-                        booking.user_name,
-                        booking.user_phone,
-                        booking.booking_date,
-                        booking.booking_time,
-                        booking.created_at.strftime('%Y-%m-%d %H:%M:%S') if booking.created_at else '',
-                        'Aktiv' if booking.is_active else 'Bekor qilingan',
-                        booking.user_telegram_id
-                    ]
-                    self.sheet.append_row(row_data)
-                
-                logger.info(f"{len(bookings)} ta bron Google Sheets'ga export qilindi")
+                total = 0
+                if per_barber:
+                    barbers = db.query(Barber).order_by(Barber.id).all()
+                    for barber in barbers:
+                        worksheet = self.get_or_create_worksheet(worksheet_title(barber))
+                        total += self._export_to_worksheet(
+                            db, worksheet, f"barber:{barber.id}", incremental, chunk_size, barber_id=barber.id
+                        )
+
+                    # Sartarosh biriktirilmagan (eski single-bot rejimidagi) bronlar
+                    if db.query(Booking.id).filter(Booking.barber_id == None).first():
+                        worksheet = self.get_or_create_worksheet("Boshqa")
+                        total += self._export_to_worksheet(
+                            db, worksheet, "barber:none", incremental, chunk_size, without_barber=True
+                        )
+                else:
+                    total = self._export_to_worksheet(db, self.sheet, MAIN_SHEET_KEY, incremental, chunk_size)
+
+                logger.info(f"{total} ta bron Google Sheets'ga export qilindi")
                 return True
-                
+
             finally:
                 db.close()
-                
+
         except Exception as e:
             logger.error(f"Barcha bronlarni export qilishda xatolik: {e}")
             return False
-    
+
+    def append_rows(self, rows):
+        """Bir nechta qatorni bitta API chaqiruvi bilan qo'shish (xatolik yuqoriga uzatiladi)"""
+        self.create_headers_if_needed()
+        self.sheet.append_rows(rows)
+
+    def mark_exported(self, booking_id):
+        """Asosiy varaq watermark'i: incremental eksport shu ID gacha bo'lganlarni qayta yozmaydi"""
+        db = SessionLocal()
+        try:
+            set_last_exported_id(db, MAIN_SHEET_KEY, booking_id)
+        except Exception as e:
+            logger.warning(f"Eksport holatini saqlashda xatolik: {e}")
+        finally:
+            db.close()
+
+    def main_watermark(self):
+        db = SessionLocal()
+        try:
+            return get_last_exported_id(db, MAIN_SHEET_KEY)
+        finally:
+            db.close()
+
     def get_sheet_url(self):
         """Google Sheets linkini olish"""
         try:
@@ -155,17 +285,240 @@ class GoogleSheetsManager:
         except:
             return None
 
+class SheetsExportQueue:
+    """
+    Bronlarni fonda Google Sheets'ga yozish navbati.
+    Bron yaratuvchi kod faqat navbatga qo'shadi va kutmaydi; alohida thread
+    qatorlarni yig'ib, hajm (SHEETS_BATCH_SIZE) yoki vaqt (SHEETS_FLUSH_INTERVAL)
+    bo'yicha bitta append_rows chaqiruvi bilan yozadi. Kvota xatoliklarida
+    eksponensial kutish bilan qayta uriniladi.
+
+    Watermark (incremental eksport boshlanadigan ID) faqat bo'shliqsiz yozilgan qatorgacha
+    ko'tariladi: navbatda kutayotgan yoki yozilmay qolgan (failed) eng kichik ID dan oldingisigacha.
+    Yozilmay qolganlar keyingi incremental eksportda qayta yoziladi (undan keyingilar takrorlanishi mumkin).
+    To'liq eksport paytida paused() - yozuvchi to'xtab turadi.
+    """
+
+    def __init__(self, manager, batch_size=SHEETS_BATCH_SIZE, flush_interval=SHEETS_FLUSH_INTERVAL,
+                 max_retries=SHEETS_MAX_RETRIES, backoff_base=SHEETS_BACKOFF_BASE, backoff_max=SHEETS_BACKOFF_MAX,
+                 sleep=time.sleep):
+        self.manager = manager
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.max_retries = max_retries
+        self.backoff_base = backoff_base
+        self.backoff_max = backoff_max
+        self._sleep = sleep
+        self._queue = queue.Queue()
+        self._thread = None
+        self._lock = threading.Lock()
+        self._stopping = threading.Event()
+        # Yozish va to'liq eksport bir vaqtda bir varaqqa yozmasligi uchun
+        self._write_lock = threading.Lock()
+        self._ids_lock = threading.Lock()
+        self._outstanding = set()
+        self._written_max = 0
+        self._lowest_failed = None
+        self._synced_through = 0
+        self.exported = 0
+        self.failed = 0
+        self.batches = 0
+        self.retries = 0
+        self.last_lag_seconds = 0.0
+
+    def enqueue(self, row):
+        """Qatorni navbatga qo'shish (bloklamaydi)"""
+        self._ensure_worker()
+        with self._ids_lock:
+            self._outstanding.add(row[0])
+        self._queue.put((time.monotonic(), row))
+
+    def pending(self):
+        return self._queue.qsize()
+
+    def oldest_pending_seconds(self):
+        """Navbatdagi eng eski qator qancha kutyapti (navbat bo'sh bo'lsa 0)"""
+        with self._queue.mutex:
+            oldest = self._queue.queue[0][0] if self._queue.queue else None
+        return time.monotonic() - oldest if oldest is not None else 0.0
+
+    def _ensure_worker(self):
+        with self._lock:
+            if self._thread is None or not self._thread.is_alive():
+                self._stopping.clear()
+                self._thread = threading.Thread(target=self._run, name="sheets-export", daemon=True)
+                self._thread.start()
+
+    def _collect_batch(self):
+        """Birinchi qatorni kutish, keyin hajm yoki vaqt chegarasigacha yig'ish"""
+        try:
+            first = self._queue.get(timeout=1.0)
+        except queue.Empty:
+            return []
+
+        batch = [first]
+        deadline = time.monotonic() + self.flush_interval
+        while len(batch) < self.batch_size:
+            try:
+                if self._stopping.is_set():
+                    # To'xtash vaqtida kutmasdan, borini olish
+                    batch.append(self._queue.get_nowait())
+                    continue
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    break
+                batch.append(self._queue.get(timeout=remaining))
+            except queue.Empty:
+                break
+        return batch
+
+    def _write_batch(self, batch):
+        with self._write_lock:
+            return self._write_batch_locked(batch)
+
+    def _write_batch_locked(self, batch):
+        with self._ids_lock:
+            # To'liq/incremental eksport allaqachon yozgan qatorlar
+            skipped = [row[0] for _, row in batch if row[0] <= self._synced_through]
+            self._outstanding.difference_update(skipped)
+        rows = [row for _, row in batch if row[0] > self._synced_through]
+        if not rows:
+            return True
+        ids = [row[0] for row in rows]
+        for attempt in range(self.max_retries + 1):
+            try:
+                self.manager.append_rows(rows)
+                self.exported += len(rows)
+                self.batches += 1
+                self.last_lag_seconds = time.monotonic() - batch[0][0]
+                logger.info(f"{len(rows)} ta bron Google Sheets'ga export qilindi")
+                self._finish(ids, ok=True)
+                return True
+            except Exception as e:
+                if not is_retryable_error(e) or attempt == self.max_retries:
+                    self.failed += len(rows)
+                    logger.error(f"Google Sheets export xatoligi (bronlar: {ids}): {e}")
+                    self._finish(ids, ok=False)
+                    return False
+                self.retries += 1
+                delay = min(self.backoff_max, self.backoff_base ** attempt)
+                logger.warning(f"Google Sheets kvota xatoligi, {delay:.0f}s dan keyin qayta urinish: {e}")
+                self._sleep(delay)
+        return False
+
+    def _finish(self, ids, ok):
+        """Yozilgan/yozilmagan ID larni hisobga olib watermark'ni bo'shliqsiz joygacha ko'tarish"""
+        with self._ids_lock:
+            self._outstanding.difference_update(ids)
+            if ok:
+                self._written_max = max(self._written_max, max(ids))
+            else:
+                self._lowest_failed = min(ids) if self._lowest_failed is None else min(self._lowest_failed, min(ids))
+            watermark = self._written_max
+            for limit in (min(self._outstanding, default=None), self._lowest_failed):
+                if limit is not None:
+                    watermark = min(watermark, limit - 1)
+        if ok and watermark > 0:
+            self.manager.mark_exported(watermark)
+
+    @contextmanager
+    def paused(self):
+        """
+        To'liq/incremental eksport uchun: yozuvchi joriy bo'lakni tugatib, blok tugaguncha kutadi.
+        Blokdan keyin resync() - eksport yozgan qatorlar navbatdan qayta yozilmaydi.
+        """
+        with self._write_lock:
+            yield
+
+    def resync(self, exported_through):
+        """Varaq exported_through ID gacha to'liq: navbatdagi shu ID gacha qatorlar tashlanadi, bo'shliq unutiladi"""
+        with self._ids_lock:
+            self._synced_through = max(self._synced_through, exported_through)
+            self._written_max = max(self._written_max, exported_through)
+            if self._lowest_failed is not None and self._lowest_failed <= exported_through:
+                self._lowest_failed = None
+
+    def _run(self):
+        while not (self._stopping.is_set() and self._queue.empty()):
+            batch = self._collect_batch()
+            if batch:
+                self._write_batch(batch)
+
+    def flush(self, timeout=None):
+        """Navbatdagi barcha qatorlar yozilguncha kutish (shutdown uchun)"""
+        if self._thread is None:
+            return
+        self._stopping.set()
+        self._thread.join(timeout)
+
+    def stats(self):
+        return {
+            "pending": self.pending(),
+            "exported": self.exported,
+            "failed": self.failed,
+            "batches": self.batches,
+            "retries": self.retries,
+            "lowest_failed_id": self._lowest_failed,
+            "last_lag_seconds": round(self.last_lag_seconds, 3),
+            "oldest_pending_seconds": round(self.oldest_pending_seconds(), 3),
+        }
+
+
 # Global manager instance
 sheets_manager = GoogleSheetsManager()
+export_queue = SheetsExportQueue(sheets_manager)
+
 
+@metrics.register_collector
+def collect_export_metrics():
+    stats = export_queue.stats()
+    metrics.sheets_lag.set(stats["last_lag_seconds"])
+    metrics.sheets_pending.set(stats["pending"])
+    metrics.sheets_oldest_pending.set(stats["oldest_pending_seconds"])
+    metrics.sheets_rows.set(stats["exported"], status="exported")
+    metrics.sheets_rows.set(stats["failed"], status="failed")
+
+@profiling.traced("sheets")
 def export_booking_to_sheets(booking):
-    """Bronni Google Sheets'ga export qilish (tashqi funksiya)"""
-    return sheets_manager.export_booking(booking)
+    """
+    Bronni Google Sheets export navbatiga qo'shish (tashqi funksiya).
+    Darhol qaytadi - yozish fonda bajariladi.
+    """
+    if not sheets_manager.sheet:
+        return False
+    export_queue.enqueue(booking_to_row(booking))
+    return True
 
-def export_all_bookings_to_sheets():
-    """Barcha bronlarni export qilish (tashqi funksiya)"""
-    return sheets_manager.export_all_bookings()
+@profiling.traced("sheets")
+def export_all_bookings_to_sheets(per_barber=False, incremental=False):
+    """
+    Barcha bronlarni export qilish (tashqi funksiya).
+    Asosiy varaqqa yozilayotganda fon navbati to'xtab turadi - tozalash va append aralashmaydi.
+    """
+    if per_barber:
+        return sheets_manager.export_all_bookings(per_barber=True, incremental=incremental)
+    with export_queue.paused():
+        ok = sheets_manager.export_all_bookings(incremental=incremental)
+        if ok:
+            export_queue.resync(sheets_manager.main_watermark())
+    return ok
 
 def get_sheets_url():
     """Google Sheets linkini olish (tashqi funksiya)"""
-    return sheets_manager.get_sheet_url()
\ No newline at end of file
+    return sheets_manager.get_sheet_url()
+
+def flush_sheets_export(timeout=None):
+    """Navbatdagi eksportlarni yakunlash (tashqi funksiya)"""
+    export_queue.flush(timeout)
+
+
+if __name__ == "__main__":
+    # python google_sheets.py [--per-barber] [--incremental]
+    import sys
+    import log_setup
+    log_setup.configure(fmt="text")
+    ok = export_all_bookings_to_sheets(
+        per_barber="--per-barber" in sys.argv,
+        incremental="--incremental" in sys.argv
+    )
+    sys.exit(0 if ok else 1)
@@ -0,0 +1,251 @@
+"""
+Strukturali, event loop'ni bloklamaydigan logging
+
+- configure() - root loggerga QueueHandler ulaydi; yozish (stdout) alohida QueueListener
+  threadida bajariladi. Navbat to'lsa yozuv tashlab yuboriladi (dropped) - handler hech qachon kutmaydi.
+- LOG_FORMAT=json (default) - har bir qator bitta JSON obyekt; text - odatiy format (lokal ishlash uchun)
+- barber_id / booking_id kabi kontekst maydonlari contextvars orqali: log_context(barber_id=1)
+  bloki ichidagi barcha loglarga qo'shiladi (run_db thread pool'iga ham o'tadi).
+  Bitta yozuv uchun: logger.info("...", extra={"booking_id": 5})
+- LOG_LEVELS="httpx=WARNING,bot=DEBUG" - modul bo'yicha darajalar
+- sample(logger, ...) - tez-tez bo'ladigan DEBUG hodisalarni LOG_SAMPLE_RATE ulushida yozish
+
+Uvicorn loggerlari ham shu navbat orqali o'tadi (configure() ularning handlerlarini olib tashlaydi).
+"""
+
+import atexit
+import contextvars
+import copy
+import json
+import logging
+import logging.handlers
+import os
+import queue
+import random
+import sys
+from contextlib import contextmanager
+from datetime import datetime, timezone
+
+LOG_LEVEL = os.getenv("LOG_LEVEL", "INFO").upper()
+LOG_FORMAT = os.getenv("LOG_FORMAT", "json").lower()
+LOG_LEVELS = os.getenv("LOG_LEVELS", "httpx=WARNING,httpcore=WARNING,apscheduler=WARNING")
+LOG_SAMPLE_RATE = float(os.getenv("LOG_SAMPLE_RATE", "0.01"))
+LOG_QUEUE_SIZE = int(os.getenv("LOG_QUEUE_SIZE", "10000"))
+
+TEXT_FORMAT = "%(asctime)s - %(name)s - %(levelname)s - %(message)s"
+CLI_FORMAT = "%(message)s"
+
+CONTEXT_FIELDS = ("barber_id", "booking_id", "user_id", "request_id")
+UVICORN_LOGGERS = ("uvicorn", "uvicorn.error", "uvicorn.access")
+
+# LogRecord ning standart atributlari - qolganlari `extra` dan kelgan maydonlar
+# (color_message - uvicorn ning rangli nusxasi, JSON da kerak emas)
+RESERVED_ATTRS = set(vars(logging.LogRecord("", 0, "", 0, "", (), None))) | {
+    "message", "asctime", "taskName", "color_message"
+}
+
+_context = contextvars.ContextVar("log_context", default={})
+_listener = None
+_queue_handler = None
+
+
+# ==================== KONTEKST ====================
+
+@contextmanager
+def log_context(**fields):
+    """Blok ichidagi loglarga maydon qo'shish (None qiymatlar e'tiborsiz)"""
+    fields = {key: value for key, value in fields.items() if value is not None}
+    token = _context.set({**_context.get(), **fields})
+    try:
+        yield
+    finally:
+        _context.reset(token)
+
+
+def current_context() -> dict:
+    return _context.get()
+
+
+class ContextFilter(logging.Filter):
+    """Kontekst maydonlarini yozuvga ko'chirish - chaqiruvchi threadda (navbatga qo'yilishidan oldin)"""
+
+    def filter(self, record):
+        for key, value in _context.get().items():
+            if not hasattr(record, key):
+                setattr(record, key, value)
+        return True
+
+
+# ==================== FORMAT ====================
+
+class JsonFormatter(logging.Formatter):
+    def format(self, record):
+        entry = {
+            "ts": datetime.fromtimestamp(record.created, timezone.utc).isoformat(timespec="milliseconds"),
+            "level": record.levelname,
+            "logger": record.name,
+            "msg": record.getMessage(),
+        }
+        for key, value in record.__dict__.items():
+            if key not in RESERVED_ATTRS and not key.startswith("_") and value is not None:
+                entry[key] = value
+        if record.exc_info:
+            entry["exc_info"] = self.formatException(record.exc_info)
+        elif record.exc_text:
+            entry["exc_info"] = record.exc_text
+        return json.dumps(entry, ensure_ascii=False, default=str)
+
+
+class TextFormatter(logging.Formatter):
+    """Odatiy format + kontekst maydonlari oxirida: [barber_id=1 booking_id=5]"""
+
+    def format(self, record):
+        line = super().format(record)
+        fields = " ".join(
+            f"{key}={getattr(record, key)}" for key in CONTEXT_FIELDS if getattr(record, key, None) is not None
+        )
+        return f"{line} [{fields}]" if fields else line
+
+
+# ==================== NAVBAT ====================
+
+class DroppingQueueHandler(logging.handlers.QueueHandler):
+    """Navbat to'lsa kutmaydi - yozuvni tashlaydi va sanaydi"""
+
+    def __init__(self, log_queue):
+        super().__init__(log_queue)
+        self.dropped = 0
+
+    def prepare(self, record):
+        """
+        Xabar argumentlari chaqiruvchi threadda birlashtiriladi (keyin o'zgarishi mumkin),
+        traceback exc_text ga o'tadi - formatlash (JSON/text) listener threadida.
+        """
+        record = copy.copy(record)
+        record.msg = record.getMessage()
+        record.args = None
+        if record.exc_info:
+            record.exc_text = logging.Formatter().formatException(record.exc_info)
+            record.exc_info = None
+        return record
+
+    def enqueue(self, record):
+        try:
+            self.queue.put_nowait(record)
+        except queue.Full:
+            self.dropped += 1
+
+
+def parse_levels(value: str) -> dict:
+    """'httpx=WARNING,bot=DEBUG' -> {'httpx': 'WARNING', 'bot': 'DEBUG'}"""
+    levels = {}
+    for item in value.split(","):
+        name, sep, level = item.partition("=")
+        if sep and name.strip():
+            levels[name.strip()] = level.strip().upper()
+    return levels
+
+
+def configure(level=None, fmt=None, levels=None, stream=None, text_format=TEXT_FORMAT):
+    """
+    Loggingni sozlash (bir marta; qayta chaqirilsa eski listener to'xtatiladi).
+    API (main.py) importida va CLI skriptlarda (fmt="text", text_format=CLI_FORMAT) chaqiriladi.
+    """
+    global _listener, _queue_handler
+    shutdown()
+
+    output = logging.StreamHandler(stream or sys.stdout)
+    output.setFormatter(JsonFormatter() if (fmt or LOG_FORMAT) == "json" else TextFormatter(text_format))
+
+    _queue_handler = DroppingQueueHandler(queue.Queue(maxsize=LOG_QUEUE_SIZE))
+    _queue_handler.addFilter(ContextFilter())
+    _listener = logging.handlers.QueueListener(_queue_handler.queue, output, respect_handler_level=False)
+    _listener.start()
+
+    root = logging.getLogger()
+    for handler in list(root.handlers):
+        root.removeHandler(handler)
+    root.addHandler(_queue_handler)
+    root.setLevel(level or LOG_LEVEL)
+
+    # Uvicorn o'z handlerlari bilan sinxron yozadi - ularni ham navbatga yo'naltirish
+    for name in UVICORN_LOGGERS:
+        uvicorn_logger = logging.getLogger(name)
+        uvicorn_logger.handlers = []
+        uvicorn_logger.propagate = True
+
+    for name, module_level in parse_levels(LOG_LEVELS if levels is None else levels).items():
+        logging.getLogger(name).setLevel(module_level)
+
+
+def ensure_configured():
+    """Hali sozlanmagan bo'lsa default sozlamalar bilan (CLI oldindan o'zinikini qo'ygan bo'lishi mumkin)"""
+    if _listener is None:
+        configure()
+
+
+def shutdown():
+    """Navbatdagi yozuvlarni chiqarib, listenerni to'xtatish"""
+    global _listener
+    if _listener is not None:
+        _listener.stop()
+        _listener = None
+
+
+atexit.register(shutdown)
+
+
+def stats() -> dict:
+    return {
+        "queued": _queue_handler.queue.qsize() if _queue_handler else 0,
+        "dropped": _queue_handler.dropped if _queue_handler else 0,
+        "format": LOG_FORMAT,
+        "sample_rate": LOG_SAMPLE_RATE,
+    }
+
+
+# ==================== HTTP ====================
+
+class ContextMiddleware:
+    """
+    Pure ASGI middleware: so'rovdagi ?barber_id= va X-Request-ID log kontekstiga.
+    Sync endpointlar threadpoolda ishlasa ham kontekst ko'chadi (contextvars).
+    """
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+        fields = {}
+        query_string = scope.get("query_string", b"")
+        if b"barber_id=" in query_string:
+            for part in query_string.decode("latin-1").split("&"):
+                key, _, value = part.partition("=")
+                if key == "barber_id" and value.isdigit():
+                    fields["barber_id"] = int(value)
+        for key, value in scope.get("headers", []):
+            if key == b"x-request-id":
+                fields["request_id"] = value.decode("latin-1")[:64]
+        if not fields:
+            await self.app(scope, receive, send)
+            return
+        with log_context(**fields):
+            await self.app(scope, receive, send)
+
+
+# ==================== SAMPLING ====================
+
+def sample(logger, msg, *args, rate=None, **fields):
+    """
+    Tez-tez bo'ladigan DEBUG hodisa: DEBUG yoqilgan bo'lsa ham faqat `rate` ulushi yoziladi.
+    DEBUG o'chiq bo'lsa xabar umuman formatlanmaydi.
+    """
+    if not logger.isEnabledFor(logging.DEBUG):
+        return
+    rate = LOG_SAMPLE_RATE if rate is None else rate
+    if rate < 1 and random.random() >= rate:
+        return
+    logger.debug(msg, *args, extra={**fields, "sample_rate": rate})
@@ -1,18 +1,35 @@
-from fastapi import FastAPI, Depends, HTTPException, Query
+# Logging boshqa modullardan oldin sozlanadi - import paytidagi loglar ham navbat orqali o'tsin
+import log_setup
+log_setup.ensure_configured()
+
+from fastapi import FastAPI, Depends, HTTPException, Query, Request, Response
 from fastapi.middleware.cors import CORSMiddleware
-from fastapi.staticfiles import StaticFiles
-from fastapi.responses import FileResponse
+from sqlalchemy import func, tuple_
 from sqlalchemy.orm import Session
 from pydantic import BaseModel
-from database import get_db, Booking, User, BookingService, Barber, Service, create_tables
+from database import get_db, run_db, run_in_session, check_sqlite_profile, engine, Booking, User, BookingService, Barber, Service, create_tables, parse_start_minute
 from datetime import datetime, timedelta, timezone
 from typing import List, Optional
 import os
+import hmac
+import base64
+import json
 import logging
-import httpx
+from telegram import Update
 from sqlalchemy.exc import IntegrityError
-import pytz
 import pathlib
+import availability
+import barber_registry
+import booking_service
+import broadcast
+import catalogue
+import metrics
+import migrations
+import notifications
+import profiling
+import static_assets
+import stats
+from static_assets import PrecompressedStaticFiles
 
 app = FastAPI()
 
@@ -20,7 +37,9 @@ app = FastAPI()
 FRONTEND_DIR = pathlib.Path(__file__).parent.parent / "frontend"
 ADMIN_DIR = pathlib.Path(__file__).parent.parent / "admin"
 
-app.mount("/static", StaticFiles(directory=str(FRONTEND_DIR)), name="static")
+# Startupda static_assets.prepare() fingerprint + gzip/brotli build papkasiga o'tkazadi
+webapp_files = PrecompressedStaticFiles(directory=str(FRONTEND_DIR), bundle="frontend")
+app.mount("/static", webapp_files, name="static")
 
 app.add_middleware(
     CORSMiddleware,
@@ -31,6 +50,15 @@ app.add_middleware(
     expose_headers=["*"]
 )
 
+# Profillash log kontekstidan ichkarida - sekin so'rov logiga barber_id/request_id qo'shiladi
+if profiling.PROFILING_ENABLED:
+    app.add_middleware(profiling.ProfilingMiddleware)
+app.add_middleware(log_setup.ContextMiddleware)
+# Eng tashqi middleware - CORS va xatoliklar bilan birga to'liq so'rov vaqtini o'lchaydi
+app.add_middleware(metrics.MetricsMiddleware)
+metrics.instrument_engine(engine)
+profiling.instrument_engine(engine)
+
 class ServiceRequest(BaseModel):
     name: str
     service: str
@@ -63,6 +91,18 @@ class BookingResponse(BaseModel):
     total_duration: int
     services: List[ServiceResponse] = []
 
+class BookingListItem(BookingResponse):
+    barber_id: Optional[int]
+    is_active: bool
+    created_at: Optional[datetime]
+
+class BookingPage(BaseModel):
+    items: List[BookingListItem]
+    next_cursor: Optional[str]
+    has_more: bool
+    total_estimate: Optional[int]  # Faqat birinchi sahifada hisoblanadi
+    total_exact: bool
+
 # Barber Pydantic Models
 class BarberCreate(BaseModel):
     name: str
@@ -102,6 +142,20 @@ class BarberResponse(BaseModel):
     class Config:
         from_attributes = True
 
+class BarberPublic(BaseModel):
+    """Web App uchun (bot_token siz)"""
+    id: int
+    name: str
+    phone: Optional[str]
+    image_url: Optional[str]
+    work_start: str
+    work_end: str
+    gender_category: str
+    is_active: bool
+
+    class Config:
+        from_attributes = True
+
 # Service Pydantic Models
 class ServiceCreate(BaseModel):
     barber_id: int
@@ -145,6 +199,18 @@ if os.getenv("SUPER_ADMIN_CHAT_ID"):
 # Barcha adminlar (Admin + Super Admin)
 ALL_ADMIN_IDS = ADMIN_CHAT_IDS + SUPER_ADMIN_CHAT_IDS
 
+# /metrics va /api/admin/slow-requests kaliti (bo'sh bo'lsa endpointlar yopiq)
+ADMIN_API_TOKEN = os.getenv("ADMIN_API_TOKEN", "")
+
+def require_admin_token(request: Request, secret: Optional[str] = Query(None, description="Admin secret")):
+    """Authorization: Bearer <ADMIN_API_TOKEN> (Prometheus bearer_token) yoki ?secret=<ADMIN_API_TOKEN>"""
+    if not ADMIN_API_TOKEN:
+        raise HTTPException(status_code=403, detail="ADMIN_API_TOKEN sozlanmagan")
+    scheme, _, token = request.headers.get("Authorization", "").partition(" ")
+    provided = token if scheme.lower() == "bearer" else (secret or "")
+    if not hmac.compare_digest(provided.encode(), ADMIN_API_TOKEN.encode()):
+        raise HTTPException(status_code=403, detail="Noto'g'ri secret")
+
 # Bot manager reference (set at startup)
 _bot_manager = None
 
@@ -155,19 +221,32 @@ def set_bot_manager(manager_module):
 
 @app.on_event("startup")
 async def startup():
-    create_tables()
+    await run_db(create_tables)
+    await run_db(migrations.run_migrations)
+    await run_db(check_sqlite_profile)
+    await run_db(static_assets.prepare)
+    await run_in_session(barber_registry.warm)
+    await notifications.start()
+    metrics.start()
+
+    interrupted = await run_in_session(broadcast.mark_interrupted_jobs)
+    if interrupted:
+        logging.getLogger(__name__).warning(
+            f"⚠️ {interrupted} ta yakunlanmagan broadcast 'interrupted' deb belgilandi - bot ko'tarilgach davom ettiriladi"
+        )
 
     # Bot managerni shu processda ishga tushirish
     try:
         import bot_manager
         set_bot_manager(bot_manager)
-        await bot_manager.start_all_bots()
-        logging.getLogger(__name__).info(f"✅ Bot manager ishga tushdi: {len(bot_manager.running_bots)} ta bot")
+        # Botlar fonda ko'tariladi - server so'rovlarni darhol qabul qiladi
+        bot_manager.start_all_bots_in_background()
+        logging.getLogger(__name__).info("✅ Bot manager ishga tushdi, botlar fonda ishga tushirilmoqda")
     except Exception as e:
         logging.getLogger(__name__).error(f"❌ Bot manager ishga tushmadi: {e}", exc_info=True)
 
 @app.post("/api/admin/reset-database")
-async def reset_database(secret: str = Query(..., description="Admin secret")):
+def reset_database(secret: str = Query(..., description="Admin secret")):
     """
     DIQQAT: Barcha jadvallarni o'chirib qayta yaratadi.
     Faqat birinchi migration uchun ishlatiladi.
@@ -179,12 +258,14 @@ async def reset_database(secret: str = Query(..., description="Admin secret")):
     try:
         Base.metadata.drop_all(bind=engine)
         Base.metadata.create_all(bind=engine)
+        barber_registry.reload()
+        catalogue.bump()
         return {"success": True, "message": "Barcha jadvallar qayta yaratildi"}
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Xatolik: {str(e)}")
 
 @app.post("/api/admin/add-admin-telegram-id")
-async def add_admin_telegram_id_column(secret: str = Query(..., description="Admin secret")):
+def add_admin_telegram_id_column(secret: str = Query(..., description="Admin secret")):
     """Barbers jadvaliga admin_telegram_id kolonkasini qo'shish (ma'lumotlarni yo'qotmasdan)"""
     if secret != "migrate-2026":
         raise HTTPException(status_code=403, detail="Noto'g'ri secret")
@@ -212,6 +293,8 @@ async def add_admin_telegram_id_column(secret: str = Query(..., description="Adm
 @app.on_event("shutdown")
 async def shutdown():
     """FastAPI to'xtaganda botlarni ham to'xtatish"""
+    await broadcast.cancel_all_jobs()
+
     try:
         import bot_manager
         await bot_manager.stop_all_bots()
@@ -219,40 +302,75 @@ async def shutdown():
     except Exception as e:
         logging.getLogger(__name__).error(f"❌ Bot to'xtatishda xatolik: {e}")
 
+    # Navbatdagi xabarnomalarni yuborib, Telegram clientni yopish
+    await notifications.stop()
+    await metrics.stop()
+
+    # Navbatda qolgan Google Sheets eksportlarini yozib tugatish
+    from google_sheets import flush_sheets_export
+    await run_db(flush_sheets_export, 30)
+
 @app.get("/")
 async def root():
     """Root endpoint - redirect to webapp"""
     return {"message": "Rustam Barber Booking System", "webapp": "/webapp", "status": "running"}
 
 @app.get("/webapp")
-async def serve_webapp():
-    """Serve the frontend Web App"""
-    return FileResponse(str(FRONTEND_DIR / "index.html"))
+async def serve_webapp(request: Request):
+    """Serve the frontend Web App (hashli asset havolalari bilan, siqilgan holda)"""
+    return await webapp_files.get_response("index.html", request.scope)
 
 @app.get("/api")
 async def api_root():
     return {"message": "Barbershop Booking API"}
 
 @app.get("/available-times/today")
-async def get_today_available_times(
+def get_today_available_times(
     duration: Optional[int] = Query(1, description="Jami kerakli soatlar"),
     barber_id: Optional[int] = Query(None, description="Sartarosh ID"),
     db: Session = Depends(get_db)
 ):
     today = datetime.now().strftime("%Y-%m-%d")
-    return await get_available_times_internal(today, duration, db, barber_id)
+    return get_available_times_internal(today, duration, db, barber_id)
 
 @app.get("/available-times/tomorrow")
-async def get_tomorrow_available_times(
+def get_tomorrow_available_times(
     duration: Optional[int] = Query(1, description="Jami kerakli soatlar"),
     barber_id: Optional[int] = Query(None, description="Sartarosh ID"),
     db: Session = Depends(get_db)
 ):
     tomorrow = (datetime.now() + timedelta(days=1)).strftime("%Y-%m-%d")
-    return await get_available_times_internal(tomorrow, duration, db, barber_id)
+    return get_available_times_internal(tomorrow, duration, db, barber_id)
+
+@app.get("/available-times/range")
+def get_available_times_range(
+    start: str = Query(..., description="Boshlanish sanasi (YYYY-MM-DD)"),
+    end: str = Query(..., description="Tugash sanasi (YYYY-MM-DD)"),
+    duration: Optional[int] = Query(1, description="Jami kerakli soatlar"),
+    barber_id: Optional[int] = Query(None, description="Sartarosh ID"),
+    db: Session = Depends(get_db)
+):
+    """Bir necha kunlik bo'sh vaqtlar bitta so'rovda (kalendar uchun)"""
+    try:
+        start_date = datetime.strptime(start, "%Y-%m-%d").date()
+        end_date = datetime.strptime(end, "%Y-%m-%d").date()
+    except ValueError:
+        raise HTTPException(status_code=400, detail="Invalid date format. Use YYYY-MM-DD")
+
+    if end_date < start_date:
+        raise HTTPException(status_code=400, detail="end sanasi start dan oldin bo'lishi mumkin emas")
+
+    if (end_date - start_date).days + 1 > availability.MAX_RANGE_DAYS:
+        raise HTTPException(
+            status_code=400,
+            detail=f"Oraliq {availability.MAX_RANGE_DAYS} kundan oshmasligi kerak"
+        )
+
+    days = availability.get_available_range(db, start_date, end_date, duration, barber_id)
+    return {"start": start, "end": end, "duration": duration, "barber_id": barber_id, "days": days}
 
 @app.get("/available-times/{date}")
-async def get_available_times(
+def get_available_times(
     date: str,
     duration: Optional[int] = Query(1, description="Jami kerakli soatlar"),
     barber_id: Optional[int] = Query(None, description="Sartarosh ID"),
@@ -263,197 +381,217 @@ async def get_available_times(
     except ValueError:
         raise HTTPException(status_code=400, detail="Invalid date format. Use YYYY-MM-DD")
 
-    return await get_available_times_internal(date, duration, db, barber_id)
-
-async def get_available_times_internal(date: str, duration: int, db: Session, barber_id: Optional[int] = None):
-    # Ish soatlarini sartaroshdan olish (agar barber_id berilgan bo'lsa)
-    work_start_hour = 9
-    work_end_hour = 22
-    if barber_id:
-        barber = db.query(Barber).filter(Barber.id == barber_id).first()
-        if barber:
-            try:
-                work_start_hour = int(barber.work_start.split(':')[0])
-                work_end_hour = int(barber.work_end.split(':')[0])
-            except (ValueError, AttributeError):
-                pass
-
-    all_times = [f"{hour:02d}:00" for hour in range(work_start_hour, work_end_hour)]
-
-    # Hozirgi vaqtni olish (real-time validation) - Tashkent timezone
-    tashkent_tz = pytz.timezone('Asia/Tashkent')
-    now = datetime.now(tashkent_tz)
-    current_date = now.strftime("%Y-%m-%d")
-    current_hour = now.hour
-
-    # Agar bugun tanlangan bo'lsa, faqat kelajakdagi vaqtlarni ko'rsatish
-    if date == current_date:
-        # Hozirgi vaqtdan keyingi vaqtlarni filtrlash
-        all_times = [time for time in all_times if int(time.split(':')[0]) > current_hour]
-
-    # Band qilingan vaqtlarni olish (faqat shu sartaroshniki)
-    bookings_query = db.query(Booking).filter(
-        Booking.booking_date == date,
-        Booking.is_active == True
-    )
-    if barber_id:
-        bookings_query = bookings_query.filter(Booking.barber_id == barber_id)
-    bookings = bookings_query.all()
-
-    # Har bir bron uchun band qilingan barcha soatlarni hisoblash
-    # Agar 10:00 da 2 soatlik bron bo'lsa, 10:00-12:00 band (10:00, 11:00, 12:00)
-    booked_hours = set()
-    for booking in bookings:
-        start_hour = int(booking.booking_time.split(':')[0])
-        end_hour = start_hour + booking.total_duration
-        # Boshlanish vaqtidan tugash vaqtigacha barcha soatlarni band qilish
-        for hour in range(start_hour, end_hour + 1):
-            if hour <= work_end_hour:  # Maksimal ish vaqti
-                booked_hours.add(f"{hour:02d}:00")
-
-    # Mavjud vaqtlarni topish (duration soatlik ketma-ket bo'sh oraliq kerak)
-    available_times = []
-    for time in all_times:
-        start_hour = int(time.split(':')[0])
-        # Kerakli davomiylikdagi barcha soatlar bo'shligini tekshirish
-        is_available = True
-        for i in range(duration):
-            check_time = f"{start_hour + i:02d}:00"
-            if check_time in booked_hours or start_hour + i >= work_end_hour:
-                is_available = False
-                break
-        if is_available:
-            available_times.append(time)
-
-    print(f"Date: {date}, Duration: {duration}")
-    print(f"Booked hours: {booked_hours}")
-    print(f"Available times: {available_times}")
+    return get_available_times_internal(date, duration, db, barber_id)
 
+def get_available_times_internal(date: str, duration: int, db: Session, barber_id: Optional[int] = None):
+    # Bo'sh vaqtlar bitmap engine orqali hisoblanadi (availability.py)
+    available_times = availability.get_available_times(db, date, duration, barber_id)
     return {"available_times": available_times, "date": date, "duration": duration}
 
+@app.get("/metrics", dependencies=[Depends(require_admin_token)])
+def get_metrics():
+    """Prometheus scrape endpointi (HTTP, DB, botlar, Telegram API, Sheets eksport, event loop)"""
+    return Response(content=metrics.render(), media_type=metrics.CONTENT_TYPE)
+
+@app.get("/api/availability/cache-stats")
+async def get_availability_cache_stats():
+    """Bo'sh vaqtlar keshi statistikasi (hit/miss)"""
+    return availability.cache.stats()
+
 @app.get("/bookings/{date}")
-async def get_bookings(date: str, db: Session = Depends(get_db)):
+def get_bookings(date: str, db: Session = Depends(get_db)):
     try:
-        datetime.strptime(date, "%Y-%m-%d")
+        day = datetime.strptime(date, "%Y-%m-%d").date()
     except ValueError:
         raise HTTPException(status_code=400, detail="Invalid date format. Use YYYY-MM-DD")
 
-    bookings = db.query(Booking).filter(
-        Booking.booking_date == date,
+    bookings = booking_service.bookings_with_services(db).filter(
+        Booking.booking_day == day,
         Booking.is_active == True
-    ).all()
-
-    return [
-        BookingResponse(
-            id=booking.id,
-            date=booking.booking_date,
-            time=booking.booking_time,
-            user_name=booking.user_name,
-            user_phone=booking.user_phone,
-            total_price=booking.total_price,
-            total_duration=booking.total_duration,
-            services=[
-                ServiceResponse(
-                    service_name=service.service_name,
-                    service_code=service.service_code,
-                    price=service.price,
-                    duration=service.duration
-                )
-                for service in booking.services
-            ]
+    ).order_by(Booking.start_minute, Booking.id).all()
+
+    return [BookingResponse(**booking_service.booking_to_dict(booking)) for booking in bookings]
+
+# Bronlar ro'yxati: (booking_day, start_minute, id) bo'yicha keyset pagination
+BOOKINGS_PAGE_MAX = 200
+# Jami sonni hisoblash shu chegaradan oshsa to'xtatiladi (total_exact=False)
+BOOKINGS_COUNT_CAP = 10000
+
+def encode_booking_cursor(booking: Booking) -> str:
+    raw = json.dumps([booking.booking_day.isoformat(), booking.start_minute, booking.id])
+    return base64.urlsafe_b64encode(raw.encode()).decode().rstrip("=")
+
+def decode_booking_cursor(cursor: str):
+    try:
+        padded = cursor + "=" * (-len(cursor) % 4)
+        day, minute, booking_id = json.loads(base64.urlsafe_b64decode(padded))
+        return datetime.strptime(day, "%Y-%m-%d").date(), int(minute), int(booking_id)
+    except (ValueError, TypeError):
+        raise HTTPException(status_code=400, detail="Noto'g'ri cursor")
+
+def parse_date_param(value: Optional[str], name: str):
+    if value is None:
+        return None
+    try:
+        return datetime.strptime(value, "%Y-%m-%d").date()
+    except ValueError:
+        raise HTTPException(status_code=400, detail=f"{name} formati noto'g'ri. YYYY-MM-DD ishlating")
+
+def booking_list_item(booking: Booking) -> BookingListItem:
+    return BookingListItem(
+        **booking_service.booking_to_dict(booking),
+        barber_id=booking.barber_id,
+        is_active=booking.is_active,
+        created_at=booking.created_at
+    )
+
+@app.get("/api/bookings", response_model=BookingPage)
+def list_bookings(
+    barber_id: Optional[int] = Query(None, description="Sartarosh bo'yicha filtr"),
+    date_from: Optional[str] = Query(None, description="YYYY-MM-DD (shu kun ham kiradi)"),
+    date_to: Optional[str] = Query(None, description="YYYY-MM-DD (shu kun ham kiradi)"),
+    is_active: Optional[bool] = Query(True, description="Aktiv/bekor qilingan bronlar"),
+    phone: Optional[str] = Query(None, description="Telefon raqam boshlanishi"),
+    cursor: Optional[str] = Query(None, description="Oldingi sahifadagi next_cursor"),
+    limit: int = Query(50, ge=1, le=BOOKINGS_PAGE_MAX),
+    db: Session = Depends(get_db)
+):
+    """
+    Bronlar ro'yxati (admin panel). Sana/vaqt bo'yicha o'sish tartibida, keyset pagination:
+    OFFSET yo'q - har bir sahifa indeks bo'yicha cursordan davom etadi.
+    Xizmatlar selectinload bilan bitta qo'shimcha so'rovda yuklanadi.
+    booking_day/start_minute NULL bo'lgan eski qatorlar (noto'g'ri sana/vaqt) ro'yxatga kirmaydi -
+    ularni tartiblab ham, cursorga yozib ham bo'lmaydi.
+    """
+    query = booking_service.bookings_with_services(db).filter(
+        Booking.booking_day.isnot(None),
+        Booking.start_minute.isnot(None)
+    )
+    if barber_id is not None:
+        query = query.filter(Booking.barber_id == barber_id)
+    if is_active is not None:
+        query = query.filter(Booking.is_active == is_active)
+    start_day = parse_date_param(date_from, "date_from")
+    end_day = parse_date_param(date_to, "date_to")
+    if start_day:
+        query = query.filter(Booking.booking_day >= start_day)
+    if end_day:
+        query = query.filter(Booking.booking_day <= end_day)
+    if phone:
+        query = query.filter(Booking.user_phone.startswith(phone.strip(), autoescape=True))
+
+    # Jami son - faqat birinchi sahifada va BOOKINGS_COUNT_CAP bilan cheklangan
+    total_estimate = None
+    total_exact = False
+    if not cursor:
+        capped = query.with_entities(Booking.id).limit(BOOKINGS_COUNT_CAP + 1).subquery()
+        total_estimate = db.query(func.count()).select_from(capped).scalar()
+        total_exact = total_estimate <= BOOKINGS_COUNT_CAP
+        total_estimate = min(total_estimate, BOOKINGS_COUNT_CAP)
+
+    if cursor:
+        query = query.filter(
+            tuple_(Booking.booking_day, Booking.start_minute, Booking.id) > decode_booking_cursor(cursor)
         )
-        for booking in bookings
+
+    bookings = query.order_by(
+        Booking.booking_day, Booking.start_minute, Booking.id
+    ).limit(limit + 1).all()
+
+    has_more = len(bookings) > limit
+    bookings = bookings[:limit]
+    return BookingPage(
+        items=[booking_list_item(booking) for booking in bookings],
+        next_cursor=encode_booking_cursor(bookings[-1]) if has_more else None,
+        has_more=has_more,
+        total_estimate=total_estimate,
+        total_exact=total_exact
+    )
+
+@profiling.traced("template")
+def build_admin_notifications(booking: Booking):
+    """Admin va Super Adminlar uchun yangi bron xabarlari: [(chat_id, text), ...]"""
+    # Xizmatlar ro'yxatini yaratish
+    services_text = ""
+    if booking.services:
+        services_text = "\n\n💼 **Xizmatlar:**\n"
+        for service in booking.services:
+            services_text += f"   • {service.service_name} - {service.price:,.0f} so'm ({service.duration} soat)\n"
+
+    # Super Admin uchun maxsus xabar (ko'proq ma'lumot bilan)
+    super_admin_message = (
+        f"👑 **YANGI BRON QILINDI!** (Super Admin)\n\n"
+        f"👤 **Mijoz:** {booking.user_name}\n"
+        f"📱 **Telefon:** {booking.user_phone}\n"
+        f"🆔 **Telegram ID:** {booking.user_telegram_id}\n"
+        f"📅 **Sana:** {booking.booking_date}\n"
+        f"⏰ **Vaqt:** {booking.booking_time}\n"
+        f"⏱ **Davomiyligi:** {booking.total_duration} soat"
+        f"{services_text}\n"
+        f"💰 **Jami summa:** {booking.total_price:,.0f} so'm\n"
+        f"🆔 **Bron ID:** #{booking.id}\n\n"
+        f"📋 Bugungi mijozlar: /mijozlar\n"
+        f"📊 Statistika: /statistika"
+    )
+
+    # Oddiy Admin uchun xabar
+    admin_message = (
+        f"🎉 **YANGI BRON QILINDI!**\n\n"
+        f"👤 **Mijoz:** {booking.user_name}\n"
+        f"📱 **Telefon:** {booking.user_phone}\n"
+        f"📅 **Sana:** {booking.booking_date}\n"
+        f"⏰ **Vaqt:** {booking.booking_time}\n"
+        f"⏱ **Davomiyligi:** {booking.total_duration} soat"
+        f"{services_text}\n"
+        f"💰 **Jami summa:** {booking.total_price:,.0f} so'm\n"
+        f"🆔 **Bron ID:** #{booking.id}\n\n"
+        f"📋 Bugungi mijozlar: /mijozlar\n"
+        f"📊 Statistika: /statistika"
+    )
+
+    messages = [(super_admin_id, super_admin_message) for super_admin_id in SUPER_ADMIN_CHAT_IDS]
+    # Oddiy Admin larga yuborish (Super Adminlarni chiqarib tashlash)
+    messages += [
+        (admin_id, admin_message)
+        for admin_id in ADMIN_CHAT_IDS
+        if admin_id not in SUPER_ADMIN_CHAT_IDS
     ]
+    return messages
 
-async def send_admin_notification(booking: Booking):
-    """Admin va Super Adminga yangi bron haqida xabar yuborish"""
+def queue_admin_notifications(db: Session, booking: Booking):
+    """
+    Admin va Super Adminga yangi bron haqida xabarlarni outboxga yozish.
+    Bron bilan bitta tranzaksiyada saqlanadi - dispatcher fonda yuboradi.
+    """
     if not BOT_TOKEN or not ALL_ADMIN_IDS:
-        return False
+        return
+
+    for chat_id, text in build_admin_notifications(booking):
+        notifications.queue_notification(db, chat_id, text)
 
+def save_booking(db: Session, booking_request: BookingRequest) -> Booking:
+    """Bronni bazaga yozish (DB thread pool'da bajariladi)"""
     try:
-        # Xizmatlar ro'yxatini yaratish
-        services_text = ""
-        if booking.services:
-            services_text = "\n\n💼 **Xizmatlar:**\n"
-            for service in booking.services:
-                services_text += f"   • {service.service_name} - {service.price:,.0f} so'm ({service.duration} soat)\n"
-
-        # Super Admin uchun maxsus xabar (ko'proq ma'lumot bilan)
-        super_admin_message = (
-            f"👑 **YANGI BRON QILINDI!** (Super Admin)\n\n"
-            f"👤 **Mijoz:** {booking.user_name}\n"
-            f"📱 **Telefon:** {booking.user_phone}\n"
-            f"🆔 **Telegram ID:** {booking.user_telegram_id}\n"
-            f"📅 **Sana:** {booking.booking_date}\n"
-            f"⏰ **Vaqt:** {booking.booking_time}\n"
-            f"⏱ **Davomiyligi:** {booking.total_duration} soat"
-            f"{services_text}\n"
-            f"💰 **Jami summa:** {booking.total_price:,.0f} so'm\n"
-            f"🆔 **Bron ID:** #{booking.id}\n\n"
-            f"📋 Bugungi mijozlar: /mijozlar\n"
-            f"📊 Statistika: /statistika"
+        return booking_service.create_booking(
+            db,
+            barber_id=None,
+            user_telegram_id=booking_request.user_telegram_id,
+            user_name=booking_request.user_name,
+            user_phone=booking_request.user_phone,
+            booking_date=booking_request.date,
+            booking_time=booking_request.time,
+            total_duration=booking_request.total_duration,
+            total_price=booking_request.total_price,
+            services=[service.model_dump() for service in booking_request.services],
+            register_user=True,
+            before_commit=queue_admin_notifications
         )
-
-        # Oddiy Admin uchun xabar
-        admin_message = (
-            f"🎉 **YANGI BRON QILINDI!**\n\n"
-            f"👤 **Mijoz:** {booking.user_name}\n"
-            f"📱 **Telefon:** {booking.user_phone}\n"
-            f"📅 **Sana:** {booking.booking_date}\n"
-            f"⏰ **Vaqt:** {booking.booking_time}\n"
-            f"⏱ **Davomiyligi:** {booking.total_duration} soat"
-            f"{services_text}\n"
-            f"💰 **Jami summa:** {booking.total_price:,.0f} so'm\n"
-            f"🆔 **Bron ID:** #{booking.id}\n\n"
-            f"📋 Bugungi mijozlar: /mijozlar\n"
-            f"📊 Statistika: /statistika"
+    except booking_service.SlotTakenError:
+        raise HTTPException(
+            status_code=400,
+            detail="Bu vaqt allaqachon band. Iltimos, boshqa vaqtni tanlang."
         )
 
-        telegram_url = f"https://api.telegram.org/bot{BOT_TOKEN}/sendMessage"
-        success = True
-
-        async with httpx.AsyncClient() as client:
-            # Super Admin larga yuborish
-            if SUPER_ADMIN_CHAT_IDS:
-                for super_admin_id in SUPER_ADMIN_CHAT_IDS:
-                    try:
-                        payload = {
-                            "chat_id": super_admin_id,
-                            "text": super_admin_message,
-                            "parse_mode": "Markdown"
-                        }
-                        response = await client.post(telegram_url, json=payload)
-                        if response.status_code != 200:
-                            success = False
-                            print(f"Super Admin {super_admin_id} ga xabar yuborishda xatolik")
-                    except Exception as e:
-                        print(f"Super Admin {super_admin_id} ga xabar yuborishda xatolik: {e}")
-                        success = False
-
-            # Oddiy Admin larga yuborish (Super Adminlarni chiqarib tashlash)
-            if ADMIN_CHAT_IDS:
-                for admin_id in ADMIN_CHAT_IDS:
-                    # Agar bu admin Super Admin bo'lmasa, faqat shunda yuborish
-                    if not SUPER_ADMIN_CHAT_IDS or admin_id not in SUPER_ADMIN_CHAT_IDS:
-                        try:
-                            payload = {
-                                "chat_id": admin_id,
-                                "text": admin_message,
-                                "parse_mode": "Markdown"
-                            }
-                            response = await client.post(telegram_url, json=payload)
-                            if response.status_code != 200:
-                                success = False
-                                print(f"Admin {admin_id} ga xabar yuborishda xatolik")
-                        except Exception as e:
-                            print(f"Admin {admin_id} ga xabar yuborishda xatolik: {e}")
-                            success = False
-
-        return success
-    except Exception as e:
-        print(f"Admin'ga xabar yuborishda xatolik: {e}")
-        return False
-
 @app.post("/bookings")
 async def create_booking(booking_request: BookingRequest, db: Session = Depends(get_db)):
     try:
@@ -462,92 +600,38 @@ async def create_booking(booking_request: BookingRequest, db: Session = Depends(
     except ValueError:
         raise HTTPException(status_code=400, detail="Invalid date format. Use YYYY-MM-DD")
 
-    # Foydalanuvchini tekshirish/yaratish
-    user = db.query(User).filter(User.telegram_id == booking_request.user_telegram_id).first()
-    if not user:
-        user = User(
-            telegram_id=booking_request.user_telegram_id,
-            name=booking_request.user_name,
-            phone=booking_request.user_phone
-        )
-        db.add(user)
-        db.commit()
-        db.refresh(user)
-
-    # Yangi bron yaratish
-    new_booking = Booking(
-        user_telegram_id=booking_request.user_telegram_id,
-        user_name=booking_request.user_name,
-        user_phone=booking_request.user_phone,
-        booking_date=booking_request.date,
-        booking_time=booking_request.time,
-        total_duration=booking_request.total_duration,
-        total_price=booking_request.total_price
-    )
-
-    try:
-        db.add(new_booking)
-        db.commit()
-        db.refresh(new_booking)
-
-        # Xizmatlarni qo'shish
-        if booking_request.services:
-            for service in booking_request.services:
-                booking_service = BookingService(
-                    booking_id=new_booking.id,
-                    service_name=service.name,
-                    service_code=service.service,
-                    price=service.price,
-                    duration=service.duration
-                )
-                db.add(booking_service)
-
-            db.commit()
-            db.refresh(new_booking)
+    # Noto'g'ri vaqt start_minute=None bilan saqlanib, bandlik hisobiga tushmay qolardi
+    if parse_start_minute(booking_request.time) is None:
+        raise HTTPException(status_code=400, detail="Invalid time format. Use HH:MM")
 
-    except IntegrityError:
-        db.rollback()
-        raise HTTPException(
-            status_code=400,
-            detail="Bu vaqt allaqachon band. Iltimos, boshqa vaqtni tanlang."
-        )
+    new_booking = await run_db(save_booking, db, booking_request)
 
-    # Admin'ga xabar yuborish
-    await send_admin_notification(new_booking)
+    # Admin xabarnomalari outboxda - dispatcherni uyg'otish
+    notifications.wake()
 
     return {
         "success": True,
         "message": "Bron muvaffaqiyatli yaratildi!",
-        "booking": {
-            "id": new_booking.id,
-            "date": new_booking.booking_date,
-            "time": new_booking.booking_time,
-            "user_name": new_booking.user_name,
-            "user_phone": new_booking.user_phone,
-            "total_price": new_booking.total_price,
-            "total_duration": new_booking.total_duration,
-            "services": [
-                {
-                    "service_name": service.service_name,
-                    "service_code": service.service_code,
-                    "price": service.price,
-                    "duration": service.duration
-                }
-                for service in new_booking.services
-            ]
-        }
+        "booking": booking_service.booking_to_dict(new_booking)
     }
 
 # ==================== BARBER CRUD ENDPOINTS ====================
 
 @app.get("/api/barbers", response_model=List[BarberResponse])
-async def get_barbers(
+def get_barbers(
+    request: Request,
+    response: Response,
     skip: int = Query(0, description="Skip N barbers"),
     limit: int = Query(100, description="Limit results"),
     is_active: Optional[bool] = Query(None, description="Filter by active status"),
     db: Session = Depends(get_db)
 ):
     """Barcha sartaroshlarni olish"""
+    cached = catalogue.not_modified(request)
+    if cached:
+        return cached
+    catalogue.set_headers(response)
+
     query = db.query(Barber)
 
     if is_active is not None:
@@ -557,7 +641,7 @@ async def get_barbers(
     return barbers
 
 @app.post("/api/barbers", response_model=BarberResponse)
-async def create_barber(barber: BarberCreate, db: Session = Depends(get_db)):
+def create_barber(barber: BarberCreate, db: Session = Depends(get_db)):
     """Yangi sartarosh qo'shish"""
     # Check if bot_token already exists
     existing_barber = db.query(Barber).filter(Barber.bot_token == barber.bot_token).first()
@@ -590,7 +674,6 @@ async def create_barber(barber: BarberCreate, db: Session = Depends(get_db)):
         db.add(new_barber)
         db.commit()
         db.refresh(new_barber)
-        return new_barber
     except IntegrityError:
         db.rollback()
         raise HTTPException(
@@ -598,16 +681,63 @@ async def create_barber(barber: BarberCreate, db: Session = Depends(get_db)):
             detail="Sartarosh yaratishda xatolik. Bot token unique bo'lishi kerak."
         )
 
+    barber_registry.refresh(new_barber.id, db)
+    catalogue.bump()
+    return new_barber
+
 @app.get("/api/barbers/{barber_id}", response_model=BarberResponse)
-async def get_barber(barber_id: int, db: Session = Depends(get_db)):
-    """Bitta sartaroshni olish"""
-    barber = db.query(Barber).filter(Barber.id == barber_id).first()
+def get_barber(barber_id: int, request: Request, response: Response, db: Session = Depends(get_db)):
+    """Bitta sartaroshni olish (barber registry dan)"""
+    # ETag butun katalog uchun umumiy - avval yozuv mavjudligi tekshiriladi, aks holda o'chirilgan id ga 304
+    barber = barber_registry.get(barber_id, db)
     if not barber:
         raise HTTPException(status_code=404, detail="Sartarosh topilmadi")
+
+    cached = catalogue.not_modified(request)
+    if cached:
+        return cached
+    catalogue.set_headers(response)
     return barber
 
+def build_bootstrap(db: Session, barber_id: int):
+    barber = barber_registry.get(barber_id, db)
+    if not barber:
+        return None
+    services = db.query(Service).filter(
+        Service.barber_id == barber_id,
+        Service.is_active == True
+    ).order_by(Service.id).all()
+    return {
+        "barber": BarberPublic.model_validate(barber).model_dump(),
+        "services": [ServiceResponseDetailed.model_validate(service).model_dump(mode="json") for service in services],
+        "catalogue_version": catalogue.version(),
+    }
+
+@app.get("/api/barbers/{barber_id}/bootstrap")
+def get_barber_bootstrap(barber_id: int, request: Request, response: Response, db: Session = Depends(get_db)):
+    """
+    Web App ni chizish uchun hamma narsa bitta so'rovda: sartarosh + aktiv xizmatlar.
+    Katalog versiyasi bo'yicha xotirada keshlanadi va ETag bilan qaytariladi.
+    """
+    payload = catalogue.get_bootstrap(barber_id)
+    if payload is None and not barber_registry.get(barber_id, db):
+        raise HTTPException(status_code=404, detail="Sartarosh topilmadi")
+
+    cached = catalogue.not_modified(request)
+    if cached:
+        return cached
+
+    if payload is None:
+        version = catalogue.version()
+        payload = build_bootstrap(db, barber_id)
+        if payload is None:
+            raise HTTPException(status_code=404, detail="Sartarosh topilmadi")
+        catalogue.set_bootstrap(barber_id, version, payload)
+    catalogue.set_headers(response)
+    return payload
+
 @app.put("/api/barbers/{barber_id}", response_model=BarberResponse)
-async def update_barber(
+def update_barber(
     barber_id: int,
     barber_update: BarberUpdate,
     db: Session = Depends(get_db)
@@ -644,7 +774,6 @@ async def update_barber(
     try:
         db.commit()
         db.refresh(barber)
-        return barber
     except IntegrityError:
         db.rollback()
         raise HTTPException(
@@ -652,8 +781,16 @@ async def update_barber(
             detail="Sartarosh yangilashda xatolik"
         )
 
+    barber_registry.refresh(barber_id, db)
+    catalogue.bump()
+
+    # Ish soatlari o'zgargan bo'lishi mumkin - keshni tozalash
+    if "work_start" in update_data or "work_end" in update_data:
+        availability.invalidate_barber(barber_id)
+    return barber
+
 @app.delete("/api/barbers/{barber_id}")
-async def delete_barber(barber_id: int, db: Session = Depends(get_db)):
+def delete_barber(barber_id: int, db: Session = Depends(get_db)):
     """Sartaroshni o'chirish"""
     barber = db.query(Barber).filter(Barber.id == barber_id).first()
     if not barber:
@@ -667,6 +804,8 @@ async def delete_barber(barber_id: int, db: Session = Depends(get_db)):
         # Soft delete - just deactivate
         barber.is_active = False
         db.commit()
+        barber_registry.refresh(barber_id, db)
+        catalogue.bump()
         return {
             "success": True,
             "message": f"Sartarosh deaktivatsiya qilindi (mijozlar va bronlar mavjud). Bronlar: {booking_count}, Mijozlar: {user_count}",
@@ -676,6 +815,8 @@ async def delete_barber(barber_id: int, db: Session = Depends(get_db)):
         # Hard delete - no data associated
         db.delete(barber)
         db.commit()
+        barber_registry.remove(barber_id)
+        catalogue.bump()
         return {
             "success": True,
             "message": "Sartarosh butunlay o'chirildi",
@@ -685,7 +826,9 @@ async def delete_barber(barber_id: int, db: Session = Depends(get_db)):
 # ==================== SERVICE CRUD ENDPOINTS ====================
 
 @app.get("/api/services", response_model=List[ServiceResponseDetailed])
-async def get_services(
+def get_services(
+    request: Request,
+    response: Response,
     barber_id: Optional[int] = Query(None, description="Filter by barber ID"),
     is_active: Optional[bool] = Query(None, description="Filter by active status"),
     gender_category: Optional[str] = Query(None, description="Filter by gender category"),
@@ -694,6 +837,11 @@ async def get_services(
     db: Session = Depends(get_db)
 ):
     """Barcha xizmatlarni olish (filtrlash imkoniyati bilan)"""
+    cached = catalogue.not_modified(request)
+    if cached:
+        return cached
+    catalogue.set_headers(response)
+
     query = db.query(Service)
 
     if barber_id is not None:
@@ -709,10 +857,10 @@ async def get_services(
     return services
 
 @app.post("/api/services", response_model=ServiceResponseDetailed)
-async def create_service(service: ServiceCreate, db: Session = Depends(get_db)):
+def create_service(service: ServiceCreate, db: Session = Depends(get_db)):
     """Yangi xizmat qo'shish"""
     # Check if barber exists
-    barber = db.query(Barber).filter(Barber.id == service.barber_id).first()
+    barber = barber_registry.get(service.barber_id, db)
     if not barber:
         raise HTTPException(status_code=404, detail="Sartarosh topilmadi")
 
@@ -743,6 +891,7 @@ async def create_service(service: ServiceCreate, db: Session = Depends(get_db)):
         db.add(new_service)
         db.commit()
         db.refresh(new_service)
+        catalogue.bump()
         return new_service
     except IntegrityError:
         db.rollback()
@@ -752,15 +901,20 @@ async def create_service(service: ServiceCreate, db: Session = Depends(get_db)):
         )
 
 @app.get("/api/services/{service_id}", response_model=ServiceResponseDetailed)
-async def get_service(service_id: int, db: Session = Depends(get_db)):
+def get_service(service_id: int, request: Request, response: Response, db: Session = Depends(get_db)):
     """Bitta xizmatni olish"""
     service = db.query(Service).filter(Service.id == service_id).first()
     if not service:
         raise HTTPException(status_code=404, detail="Xizmat topilmadi")
+
+    cached = catalogue.not_modified(request)
+    if cached:
+        return cached
+    catalogue.set_headers(response)
     return service
 
 @app.put("/api/services/{service_id}", response_model=ServiceResponseDetailed)
-async def update_service(
+def update_service(
     service_id: int,
     service_update: ServiceUpdate,
     db: Session = Depends(get_db)
@@ -793,6 +947,7 @@ async def update_service(
     try:
         db.commit()
         db.refresh(service)
+        catalogue.bump()
         return service
     except IntegrityError:
         db.rollback()
@@ -802,7 +957,7 @@ async def update_service(
         )
 
 @app.delete("/api/services/{service_id}")
-async def delete_service(service_id: int, db: Session = Depends(get_db)):
+def delete_service(service_id: int, db: Session = Depends(get_db)):
     """Xizmatni o'chirish"""
     service = db.query(Service).filter(Service.id == service_id).first()
     if not service:
@@ -817,6 +972,7 @@ async def delete_service(service_id: int, db: Session = Depends(get_db)):
         # Soft delete - just deactivate
         service.is_active = False
         db.commit()
+        catalogue.bump()
         return {
             "success": True,
             "message": f"Xizmat deaktivatsiya qilindi (bronlarda ishlatilgan: {booking_service_count})",
@@ -826,6 +982,7 @@ async def delete_service(service_id: int, db: Session = Depends(get_db)):
         # Hard delete - no bookings associated
         db.delete(service)
         db.commit()
+        catalogue.bump()
         return {
             "success": True,
             "message": "Xizmat butunlay o'chirildi",
@@ -834,31 +991,36 @@ async def delete_service(service_id: int, db: Session = Depends(get_db)):
 
 # ==================== BOT MANAGEMENT ENDPOINTS ====================
 
+def get_barber_by_id(db: Session, barber_id: int) -> Optional[Barber]:
+    return db.query(Barber).filter(Barber.id == barber_id).first()
+
 @app.get("/api/bots/status")
 async def get_bots_status():
-    """Barcha botlar holatini olish"""
+    """Barcha botlar holatini olish (ishga tushish davomiyligi va xatoliklari bilan)"""
     if not _bot_manager:
-        return {"running_bots": [], "total": 0, "manager_active": False}
-
-    running_ids = list(_bot_manager.running_bots.keys())
-
-    db_session = next(get_db())
-    try:
-        barbers = db_session.query(Barber).filter(Barber.is_active == True).all()
-        status_list = []
-        for barber in barbers:
-            status_list.append({
-                "barber_id": barber.id,
-                "barber_name": barber.name,
-                "is_running": barber.id in running_ids
-            })
-        return {
-            "running_bots": status_list,
-            "total": len(running_ids),
-            "manager_active": True
-        }
-    finally:
-        db_session.close()
+        return {"running_bots": [], "total": 0, "manager_active": False, "mode": None, "starting": False}
+
+    barbers = barber_registry.registry.active()
+    status_list = []
+    for barber in barbers:
+        status = _bot_manager.bot_status.get(barber.id, {})
+        state = status.get("state", "running" if barber.id in _bot_manager.running_bots else "stopped")
+        status_list.append({
+            "barber_id": barber.id,
+            "barber_name": barber.name,
+            "is_running": state == "running",
+            "state": state,
+            "startup_seconds": status.get("startup_seconds"),
+            "error": status.get("error")
+        })
+    return {
+        "running_bots": status_list,
+        "total": sum(1 for item in status_list if item["is_running"]),
+        "failed": sum(1 for item in status_list if item["state"] == "failed"),
+        "manager_active": True,
+        "mode": _bot_manager.BOT_MODE,
+        "starting": _bot_manager.is_starting()
+    }
 
 @app.post("/api/bots/{barber_id}/start")
 async def start_bot_endpoint(barber_id: int, db: Session = Depends(get_db)):
@@ -866,7 +1028,7 @@ async def start_bot_endpoint(barber_id: int, db: Session = Depends(get_db)):
     if not _bot_manager:
         raise HTTPException(status_code=503, detail="Bot manager ishlamayapti")
 
-    barber = db.query(Barber).filter(Barber.id == barber_id).first()
+    barber = await run_db(get_barber_by_id, db, barber_id)
     if not barber:
         raise HTTPException(status_code=404, detail="Sartarosh topilmadi")
 
@@ -885,7 +1047,7 @@ async def stop_bot_endpoint(barber_id: int, db: Session = Depends(get_db)):
     if not _bot_manager:
         raise HTTPException(status_code=503, detail="Bot manager ishlamayapti")
 
-    barber = db.query(Barber).filter(Barber.id == barber_id).first()
+    barber = await run_db(get_barber_by_id, db, barber_id)
     barber_name = barber.name if barber else f"Barber-{barber_id}"
 
     if barber_id not in _bot_manager.running_bots:
@@ -910,6 +1072,34 @@ async def restart_all_bots():
         "message": f"{len(_bot_manager.running_bots)} ta bot qayta ishga tushirildi"
     }
 
+# ==================== TELEGRAM WEBHOOK ====================
+
+@app.post("/tg/{barber_id}/{secret}")
+async def telegram_webhook(barber_id: int, secret: str, request: Request):
+    """
+    Barcha sartarosh botlari uchun yagona webhook (BOT_MODE=webhook).
+    Update tegishli Application navbatiga qo'yiladi va darhol 200 qaytariladi -
+    handlerlar application ichida (process_update) bajariladi.
+    """
+    if not _bot_manager:
+        raise HTTPException(status_code=503, detail="Bot manager ishlamayapti")
+
+    application = _bot_manager.get_webhook_application(barber_id, secret)
+    header_secret = request.headers.get("X-Telegram-Bot-Api-Secret-Token", "")
+    if not application or not hmac.compare_digest(header_secret, secret):
+        raise HTTPException(status_code=404, detail="Bot topilmadi")
+
+    try:
+        payload = await request.json()
+    except ValueError:
+        raise HTTPException(status_code=400, detail="Noto'g'ri JSON")
+    if not isinstance(payload, dict):
+        raise HTTPException(status_code=400, detail="Noto'g'ri JSON")
+
+    update = Update.de_json(payload, application.bot)
+    await application.update_queue.put(update)
+    return {"ok": True}
+
 # ==================== BROADCAST ENDPOINTS ====================
 
 class BroadcastRequest(BaseModel):
@@ -918,51 +1108,64 @@ class BroadcastRequest(BaseModel):
 
 @app.post("/api/broadcast")
 async def broadcast_message(request: BroadcastRequest, db: Session = Depends(get_db)):
-    """Sartarosh mijozlariga xabar yuborish"""
+    """
+    Sartarosh mijozlariga xabar yuborish.
+    Job yaratiladi va darhol qaytariladi - holatini GET /api/broadcast/{job_id} orqali kuzatish mumkin.
+    """
     if not _bot_manager:
         raise HTTPException(status_code=503, detail="Bot manager ishlamayapti")
 
-    barber = db.query(Barber).filter(Barber.id == request.barber_id).first()
+    barber = await run_db(get_barber_by_id, db, request.barber_id)
     if not barber:
         raise HTTPException(status_code=404, detail="Sartarosh topilmadi")
 
     if request.barber_id not in _bot_manager.running_bots:
         raise HTTPException(status_code=400, detail=f"{barber.name} boti ishlamayapti. Avval botni ishga tushiring.")
 
-    # Bu sartarosh mijozlarini olish
-    users = db.query(User).filter(User.barber_id == request.barber_id).all()
+    active_job = await run_db(broadcast.get_active_job, db, request.barber_id)
+    if active_job:
+        raise HTTPException(
+            status_code=409,
+            detail=f"{barber.name} uchun xabar yuborish davom etmoqda (job #{active_job.id})"
+        )
 
-    if not users:
-        return {"success": False, "sent": 0, "failed": 0, "total": 0, "message": "Mijozlar topilmadi"}
+    job = await run_db(broadcast.create_job, db, request.barber_id, request.message)
+    if not job.total:
+        await run_db(broadcast.set_job_status, db, job.id, "completed")
+        return {"success": False, "job_id": job.id, "status": "completed", "total": 0, "message": "Mijozlar topilmadi"}
 
     # Bot application dan bot objectni olish
-    application = _bot_manager.running_bots[request.barber_id]
-    bot = application.bot
-
-    sent = 0
-    failed = 0
-    for user in users:
-        try:
-            await bot.send_message(
-                chat_id=int(user.telegram_id),
-                text=f"📢 {barber.name} sartaroshxonasidan xabar:\n\n{request.message}",
-                parse_mode='Markdown'
-            )
-            sent += 1
-        except Exception as e:
-            failed += 1
-            logging.getLogger(__name__).error(f"Broadcast failed for user {user.telegram_id}: {e}")
+    bot = _bot_manager.running_bots[request.barber_id].bot
+    broadcast.start_job(job, bot, barber.name)
 
     return {
         "success": True,
-        "sent": sent,
-        "failed": failed,
-        "total": len(users),
-        "message": f"{sent} ta mijozga xabar yuborildi" + (f", {failed} ta xatolik" if failed else "")
+        "job_id": job.id,
+        "status": job.status,
+        "total": job.total,
+        "message": f"{job.total} ta mijozga xabar yuborish boshlandi"
+    }
+
+@app.get("/api/broadcast/{job_id}")
+def get_broadcast_status(job_id: int, db: Session = Depends(get_db)):
+    """Broadcast job holati: yuborilgan, xatolik, bloklagan mijozlar soni"""
+    status = broadcast.get_job_status(db, job_id)
+    if not status:
+        raise HTTPException(status_code=404, detail="Broadcast topilmadi")
+    return status
+
+# ==================== NOTIFICATIONS ====================
+
+@app.get("/api/notifications/outbox")
+def get_outbox_status(db: Session = Depends(get_db)):
+    """Xabarnomalar outbox holati: status bo'yicha sonlar va dispatcher statistikasi"""
+    return {
+        "counts": notifications.outbox_counts(db),
+        "dispatcher": notifications.dispatcher.stats()
     }
 
 @app.get("/api/users/count")
-async def get_users_count(
+def get_users_count(
     barber_id: Optional[int] = Query(None, description="Filter by barber ID"),
     db: Session = Depends(get_db)
 ):
@@ -973,9 +1176,28 @@ async def get_users_count(
     count = query.count()
     return {"count": count, "barber_id": barber_id}
 
+@app.get("/api/stats")
+def get_stats(
+    barber_id: Optional[int] = Query(None, description="Sartarosh bo'yicha (bo'lmasa - hammasi)"),
+    db: Session = Depends(get_db)
+):
+    """Dashboard statistikasi: oynalar bo'yicha bronlar, daromad va eng band soatlar (keshlangan)"""
+    today = availability.current_tashkent_time().date()
+    scope = stats.ALL_BARBERS if barber_id is None else barber_id
+    return {**stats.get_stats(db, scope, today), "cache": stats.cache.stats()}
+
+@app.get("/api/admin/slow-requests", dependencies=[Depends(require_admin_token)])
+def get_slow_requests(
+    limit: int = Query(50, ge=1, le=500),
+    kind: Optional[str] = Query(None, description="http yoki bot"),
+    slow_only: bool = Query(False, description="Faqat PROFILING_SLOW_MS dan sekinlari")
+):
+    """Profillangan so'rov/update'lar (yangilari birinchi): db/telegram/sheets/template bo'yicha vaqt"""
+    return {**profiling.buffer.stats(), "traces": profiling.buffer.list(limit, kind, slow_only)}
+
 # ==================== ADMIN PANEL (mount at the end) ====================
 # Admin panel mount eng oxirida bo'lishi kerak, chunki u barcha sub-pathlarni ushlab oladi
-app.mount("/admin", StaticFiles(directory=str(ADMIN_DIR), html=True), name="admin")
+app.mount("/admin", PrecompressedStaticFiles(directory=str(ADMIN_DIR), bundle="admin", html=True), name="admin")
 
 if __name__ == "__main__":
     import uvicorn
@@ -0,0 +1,345 @@
+"""
+Prometheus formatidagi metrikalar (GET /metrics, ADMIN_API_TOKEN bilan himoyalangan)
+
+Web App sekin ishlasa sababini ajratish uchun: HTTP route, DB, event loop yoki Telegram.
+- http_request_duration_seconds - FastAPI route shabloni bo'yicha (MetricsMiddleware)
+- db_query_duration_seconds - SQLAlchemy engine hodisalari orqali (instrument_engine)
+- bot_update_duration_seconds, bot_update_queue_depth - har bir sartarosh boti
+- telegram_api_duration_seconds, telegram_api_errors_total - outbox client va bot so'rovlari
+- sheets_export_* - Google Sheets eksport navbati va kechikishi
+- event_loop_lag_seconds - asyncio loop bloklanganini ko'rsatadi
+
+Tashqi kutubxona kerak emas: metrikalar process ichida yig'iladi va text formatda beriladi.
+Scrape paytida o'qiladigan qiymatlar (navbat uzunligi va h.k.) register_collector() orqali yangilanadi.
+"""
+
+import asyncio
+import logging
+import os
+import threading
+import time
+from contextlib import contextmanager
+
+from sqlalchemy import event
+
+import log_setup
+
+logger = logging.getLogger(__name__)
+
+METRICS_ENABLED = os.getenv("METRICS_ENABLED", "1") == "1"
+METRICS_LOOP_INTERVAL = float(os.getenv("METRICS_LOOP_INTERVAL", "1"))
+
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+DB_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0)
+
+# Starlette "; charset=utf-8" ni o'zi qo'shadi
+CONTENT_TYPE = "text/plain; version=0.0.4"
+
+
+def escape_label(value) -> str:
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def format_labels(names, values, extra=None) -> str:
+    pairs = [f'{name}="{escape_label(value)}"' for name, value in zip(names, values)]
+    if extra:
+        pairs.append(extra)
+    return "{" + ",".join(pairs) + "}" if pairs else ""
+
+
+def format_value(value) -> str:
+    if value == float("inf"):
+        return "+Inf"
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+class Metric:
+    """Label qiymatlari (tuple) -> qiymat. Yozish lock bilan (DB hodisalari threadpoolda keladi)"""
+
+    metric_type = "untyped"
+
+    def __init__(self, name, documentation, labelnames=()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._values = {}
+        self._lock = threading.Lock()
+        REGISTRY.append(self)
+
+    def _key(self, labels):
+        return tuple(str(labels.get(name, "")) for name in self.labelnames)
+
+    def clear(self):
+        with self._lock:
+            self._values = {}
+
+    def samples(self):
+        with self._lock:
+            return list(self._values.items())
+
+    def render(self):
+        lines = [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} {self.metric_type}"]
+        for key, value in sorted(self.samples()):
+            lines.append(f"{self.name}{format_labels(self.labelnames, key)} {format_value(value)}")
+        return lines
+
+
+class Counter(Metric):
+    metric_type = "counter"
+
+    def inc(self, value=1, **labels):
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + value
+
+
+class Gauge(Metric):
+    metric_type = "gauge"
+
+    def __init__(self, name, documentation, labelnames=(), metric_type="gauge"):
+        # Boshqa modul hisoblagichini scrape paytida ko'chirish uchun metric_type="counter"
+        super().__init__(name, documentation, labelnames)
+        self.metric_type = metric_type
+
+    def set(self, value, **labels):
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = value
+
+    def inc(self, value=1, **labels):
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + value
+
+    def dec(self, value=1, **labels):
+        self.inc(-value, **labels)
+
+
+class Histogram(Metric):
+    metric_type = "histogram"
+
+    def __init__(self, name, documentation, labelnames=(), buckets=DEFAULT_BUCKETS):
+        super().__init__(name, documentation, labelnames)
+        self.buckets = tuple(sorted(buckets))
+
+    def observe(self, value, **labels):
+        key = self._key(labels)
+        with self._lock:
+            entry = self._values.get(key)
+            if entry is None:
+                # [har bir bucket soni..., sum, count]
+                entry = self._values[key] = [0] * len(self.buckets) + [0.0, 0]
+            for i, bound in enumerate(self.buckets):
+                if value <= bound:
+                    entry[i] += 1
+            entry[-2] += value
+            entry[-1] += 1
+
+    @contextmanager
+    def time(self, **labels):
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(time.perf_counter() - started, **labels)
+
+    def samples(self):
+        with self._lock:
+            return [(key, list(entry)) for key, entry in self._values.items()]
+
+    def render(self):
+        lines = [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} histogram"]
+        for key, entry in sorted(self.samples()):
+            for bound, count in zip(self.buckets, entry):
+                le = format_labels(self.labelnames, key, f'le="{format_value(float(bound))}"')
+                lines.append(f"{self.name}_bucket{le} {count}")
+            labels = format_labels(self.labelnames, key)
+            inf = format_labels(self.labelnames, key, 'le="+Inf"')
+            lines.append(f"{self.name}_bucket{inf} {entry[-1]}")
+            lines.append(f"{self.name}_sum{labels} {format_value(float(entry[-2]))}")
+            lines.append(f"{self.name}_count{labels} {entry[-1]}")
+        return lines
+
+
+REGISTRY = []
+_collectors = []
+
+
+def register_collector(func):
+    """Scrape oldidan chaqiriladigan funksiya (gauge qiymatlarini yangilash uchun)"""
+    _collectors.append(func)
+    return func
+
+
+def render() -> str:
+    for collector in _collectors:
+        try:
+            collector()
+        except Exception as e:
+            logger.warning(f"⚠️ Metrika collector xatoligi ({collector.__name__}): {e}")
+    lines = []
+    for metric in REGISTRY:
+        lines.extend(metric.render())
+    return "\n".join(lines) + "\n"
+
+
+# ==================== METRIKALAR ====================
+
+http_requests = Counter(
+    "http_requests_total", "HTTP so'rovlar soni", ["method", "route", "status"]
+)
+http_duration = Histogram(
+    "http_request_duration_seconds", "HTTP so'rov davomiyligi (route shabloni bo'yicha)", ["method", "route"]
+)
+http_in_progress = Gauge("http_requests_in_progress", "Hozir bajarilayotgan HTTP so'rovlar")
+
+db_queries = Counter("db_queries_total", "SQL so'rovlar soni", ["operation"])
+db_duration = Histogram(
+    "db_query_duration_seconds", "SQL so'rov davomiyligi", ["operation"], buckets=DB_BUCKETS
+)
+db_errors = Counter("db_query_errors_total", "Xatolik bilan tugagan SQL so'rovlar", ["operation"])
+
+bot_update_duration = Histogram(
+    "bot_update_duration_seconds", "Bot updateni qayta ishlash davomiyligi", ["barber_id"]
+)
+bot_queue_depth = Gauge("bot_update_queue_depth", "Bot update navbatidagi updatelar", ["barber_id"])
+bots_running = Gauge("bots_running", "Ishlayotgan botlar soni")
+
+telegram_duration = Histogram(
+    "telegram_api_duration_seconds", "Telegram Bot API so'rov davomiyligi", ["source", "method"]
+)
+telegram_errors = Counter(
+    "telegram_api_errors_total", "Telegram Bot API xatoliklari", ["source", "method", "reason"]
+)
+
+sheets_lag = Gauge("sheets_export_lag_seconds", "Oxirgi batch: navbatga qo'shilgandan Sheets'ga yozilgungacha")
+sheets_pending = Gauge("sheets_export_pending", "Sheets eksport navbatidagi qatorlar")
+sheets_oldest_pending = Gauge("sheets_export_oldest_pending_seconds", "Navbatdagi eng eski qator kutayotgan vaqt")
+sheets_rows = Gauge("sheets_export_rows_total", "Sheets eksport qilingan qatorlar", ["status"], metric_type="counter")
+
+log_dropped = Gauge("log_records_dropped_total", "Navbat to'lgani uchun tashlangan log yozuvlari", metric_type="counter")
+
+loop_lag = Gauge("event_loop_lag_seconds", "asyncio event loop kechikishi (oxirgi o'lchov)")
+loop_lag_max = Gauge("event_loop_lag_max_seconds", "asyncio event loop maksimal kechikishi (process boshidan)")
+
+
+@register_collector
+def collect_log_metrics():
+    log_dropped.set(log_setup.stats()["dropped"])
+
+
+# ==================== HTTP ====================
+
+def route_label(scope) -> str:
+    """Route shabloni (/available-times/{date}); mount uchun prefiks; topilmasa - 'unmatched'"""
+    route = scope.get("route")
+    if route is not None and getattr(route, "path", None):
+        return route.path
+    root_path = scope.get("root_path")
+    return root_path if root_path else "unmatched"
+
+
+class MetricsMiddleware:
+    """Pure ASGI middleware: so'rov soni, davomiyligi va status kodi"""
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or not METRICS_ENABLED:
+            await self.app(scope, receive, send)
+            return
+
+        status = 500
+        started = time.perf_counter()
+
+        async def send_with_status(message):
+            nonlocal status
+            if message["type"] == "http.response.start":
+                status = message["status"]
+            await send(message)
+
+        http_in_progress.inc()
+        try:
+            await self.app(scope, receive, send_with_status)
+        finally:
+            http_in_progress.dec()
+            route = route_label(scope)
+            method = scope.get("method", "")
+            http_duration.observe(time.perf_counter() - started, method=method, route=route)
+            http_requests.inc(method=method, route=route, status=status)
+
+
+# ==================== DB ====================
+
+def statement_operation(statement: str) -> str:
+    word = statement.lstrip().split(None, 1)[0].upper() if statement.strip() else ""
+    return word if word in ("SELECT", "INSERT", "UPDATE", "DELETE", "PRAGMA", "WITH") else "OTHER"
+
+
+def before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    conn.info.setdefault("metrics_started", []).append(time.perf_counter())
+
+
+def after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    started = conn.info["metrics_started"].pop()
+    operation = statement_operation(statement)
+    db_duration.observe(time.perf_counter() - started, operation=operation)
+    db_queries.inc(operation=operation)
+
+
+def handle_error(context):
+    stack = context.connection.info.get("metrics_started") if context.connection is not None else None
+    if stack:
+        stack.pop()
+    db_errors.inc(operation=statement_operation(context.statement or ""))
+
+
+def instrument_engine(engine):
+    """Engine ga cursor hodisalarini ulash (qayta chaqirilsa ikkinchi marta ulanmaydi)"""
+    if not METRICS_ENABLED or event.contains(engine, "before_cursor_execute", before_cursor_execute):
+        return
+    event.listen(engine, "before_cursor_execute", before_cursor_execute)
+    event.listen(engine, "after_cursor_execute", after_cursor_execute)
+    event.listen(engine, "handle_error", handle_error)
+
+
+# ==================== TELEGRAM ====================
+
+def observe_telegram(source, method, duration, error=None):
+    """source: 'outbox' (notifications.TelegramClient) yoki 'bot' (PTB so'rovlari)"""
+    telegram_duration.observe(duration, source=source, method=method)
+    if error:
+        telegram_errors.inc(source=source, method=method, reason=error)
+
+
+# ==================== EVENT LOOP ====================
+
+_loop_task = None
+
+
+async def _watch_loop_lag():
+    """sleep(METRICS_LOOP_INTERVAL) kutilgandan qancha kech uyg'ondi - loop shuncha band bo'lgan"""
+    max_lag = 0.0
+    while True:
+        started = time.perf_counter()
+        await asyncio.sleep(METRICS_LOOP_INTERVAL)
+        lag = max(0.0, time.perf_counter() - started - METRICS_LOOP_INTERVAL)
+        max_lag = max(max_lag, lag)
+        loop_lag.set(round(lag, 6))
+        loop_lag_max.set(round(max_lag, 6))
+
+
+def start():
+    """FastAPI startupda: event loop kechikishini o'lchovchi fon vazifasi"""
+    global _loop_task
+    if METRICS_ENABLED and _loop_task is None:
+        _loop_task = asyncio.create_task(_watch_loop_lag())
+
+
+async def stop():
+    global _loop_task
+    if _loop_task is not None:
+        _loop_task.cancel()
+        await asyncio.gather(_loop_task, return_exceptions=True)
+        _loop_task = None
@@ -0,0 +1,274 @@
+"""
+Versiyalangan sxema migratsiyalari
+Har bir migratsiya bir marta bajariladi va schema_migrations jadvalida qayd etiladi.
+
+    python migrations.py               # migratsiyalarni bajarish
+    python migrations.py check-plans   # hot so'rovlar indeks ishlatishini tekshirish
+"""
+
+import logging
+import sys
+from datetime import datetime
+
+from sqlalchemy import Column, DateTime, Integer, MetaData, String, Table, bindparam, inspect, select, text
+from sqlalchemy.exc import IntegrityError
+
+from database import Base, engine, parse_booking_day, parse_start_minute
+
+logger = logging.getLogger(__name__)
+
+migration_metadata = MetaData()
+
+schema_migrations = Table(
+    "schema_migrations",
+    migration_metadata,
+    Column("version", Integer, primary_key=True),
+    Column("description", String),
+    Column("applied_at", DateTime, default=datetime.utcnow),
+)
+
+# (version, description, func, transactional)
+MIGRATIONS = []
+
+
+def migration(version, description, transactional=True):
+    """
+    Migratsiyani ro'yxatga qo'shish uchun decorator.
+    transactional=True - func(conn) bitta tranzaksiyada bajariladi.
+    transactional=False - func(bind) tranzaksiyalarni o'zi ochadi (katta backfill batch-batch commit qilinadi);
+    yarmida to'xtasa qayta ishga tushirish xavfsiz bo'lishi kerak.
+    """
+    def decorator(func):
+        MIGRATIONS.append((version, description, func, transactional))
+        MIGRATIONS.sort(key=lambda item: item[0])
+        return func
+    return decorator
+
+
+def create_model_indexes(conn, table_name, index_names):
+    """Modelda e'lon qilingan indekslarni mavjud jadvalga qo'shish (bor bo'lsa o'tkazib yuboriladi)"""
+    table = Base.metadata.tables[table_name]
+    for index in table.indexes:
+        if index.name in index_names:
+            index.create(bind=conn, checkfirst=True)
+
+
+@migration(1, "Hot query uchun composite va covering indekslar")
+def add_hot_path_indexes(conn):
+    create_model_indexes(conn, "bookings", {
+        "ix_bookings_barber_active_date",
+        "ix_bookings_date_active",
+        "ix_bookings_barber_created",
+    })
+    create_model_indexes(conn, "users", {"ix_users_barber_telegram"})
+    create_model_indexes(conn, "booking_services", {"ix_booking_services_booking_id"})
+    create_model_indexes(conn, "services", {"ix_services_barber_active"})
+
+
+def add_column_if_missing(conn, table_name, column_name, ddl):
+    """Mavjud jadvalga kolonka qo'shish (create_all yangi bazada allaqachon yaratgan bo'lishi mumkin)"""
+    columns = {column["name"] for column in inspect(conn).get_columns(table_name)}
+    if column_name not in columns:
+        conn.execute(text(f"ALTER TABLE {table_name} ADD COLUMN {column_name} {ddl}"))
+
+
+@migration(2, "users.is_blocked - botni bloklagan mijozlar broadcastdan chiqariladi")
+def add_user_is_blocked(conn):
+    add_column_if_missing(conn, "users", "is_blocked", "BOOLEAN NOT NULL DEFAULT FALSE")
+
+
+BACKFILL_BATCH_SIZE = 1000
+
+
+@migration(3, "bookings.booking_day (DATE) va start_minute (INTEGER) + backfill + indekslar", transactional=False)
+def add_booking_native_columns(bind):
+    with bind.begin() as conn:
+        add_column_if_missing(conn, "bookings", "booking_day", "DATE")
+        add_column_if_missing(conn, "bookings", "start_minute", "INTEGER")
+
+    # Backfill: id bo'yicha sahifalab, har sahifa bitta executemany UPDATE va alohida commit -
+    # katta jadvalda yozish lock'i uzoq ushlanmaydi, to'xtab qolsa booking_day IS NULL dan davom etadi
+    bookings = Base.metadata.tables["bookings"]
+    update = bookings.update().where(bookings.c.id == bindparam("row_id")).values(
+        booking_day=bindparam("day"), start_minute=bindparam("minute")
+    )
+    last_id = 0
+    filled = 0
+    while True:
+        with bind.begin() as conn:
+            rows = conn.execute(
+                select(bookings.c.id, bookings.c.booking_date, bookings.c.booking_time)
+                .where(bookings.c.id > last_id, bookings.c.booking_day.is_(None))
+                .order_by(bookings.c.id)
+                .limit(BACKFILL_BATCH_SIZE)
+            ).all()
+            if not rows:
+                break
+            conn.execute(update, [
+                {"row_id": row.id, "day": parse_booking_day(row.booking_date), "minute": parse_start_minute(row.booking_time)}
+                for row in rows
+            ])
+        last_id = rows[-1].id
+        filled += len(rows)
+    if filled:
+        logger.info(f"bookings: {filled} ta qator backfill qilindi")
+
+    with bind.begin() as conn:
+        create_model_indexes(conn, "bookings", {"ix_bookings_barber_active_day", "ix_bookings_day_active"})
+
+
+@migration(4, "notifications_outbox.lease_until - dispatcher xabarni yuborishdan oldin egallaydi")
+def add_outbox_lease(conn):
+    add_column_if_missing(conn, "notifications_outbox", "lease_until", "TIMESTAMP")
+
+
+def applied_versions(conn):
+    return {row.version for row in conn.execute(select(schema_migrations.c.version))}
+
+
+def run_migrations(bind=engine):
+    """Bajarilmagan migratsiyalarni tartib bilan bajarish. Bajarilgan versiyalar ro'yxatini qaytaradi"""
+    migration_metadata.create_all(bind=bind)
+
+    applied = []
+    for version, description, func, transactional in MIGRATIONS:
+        if not transactional:
+            with bind.connect() as conn:
+                done = version in applied_versions(conn)
+            if done:
+                continue
+            func(bind)
+
+        with bind.begin() as conn:
+            if version in applied_versions(conn):
+                continue
+            if transactional:
+                func(conn)
+            try:
+                conn.execute(schema_migrations.insert().values(
+                    version=version, description=description, applied_at=datetime.utcnow()
+                ))
+            except IntegrityError:
+                # Boshqa process (API yoki bot) shu migratsiyani allaqachon qayd etgan
+                continue
+        logger.info(f"✅ Migratsiya #{version} bajarildi: {description}")
+        applied.append(version)
+    return applied
+
+
+# ==================== QUERY PLAN TEKSHIRUVI ====================
+
+# Hot so'rovlar: nom -> (SQL, parametrlar)
+HOT_QUERIES = {
+    "availability_day": (
+        "SELECT start_minute, total_duration FROM bookings "
+        "WHERE barber_id = :barber_id AND booking_day = :date AND is_active = :active",
+        {"barber_id": 1, "date": "2030-01-01", "active": True},
+    ),
+    "availability_range": (
+        "SELECT booking_day, start_minute, total_duration FROM bookings "
+        "WHERE barber_id = :barber_id AND booking_day >= :start AND booking_day <= :end AND is_active = :active",
+        {"barber_id": 1, "start": "2030-01-01", "end": "2030-01-31", "active": True},
+    ),
+    "stats_window_count": (
+        "SELECT COUNT(*) FROM bookings "
+        "WHERE barber_id = :barber_id AND is_active = :active AND booking_day >= :start",
+        {"barber_id": 1, "active": True, "start": "2030-01-01"},
+    ),
+    "bookings_by_date": (
+        "SELECT id FROM bookings WHERE booking_day = :date AND is_active = :active",
+        {"date": "2030-01-01", "active": True},
+    ),
+    "recent_bookings": (
+        "SELECT id FROM bookings WHERE barber_id = :barber_id ORDER BY created_at DESC LIMIT 10",
+        {"barber_id": 1},
+    ),
+    "user_by_telegram_and_barber": (
+        "SELECT id FROM users WHERE telegram_id = :telegram_id AND barber_id = :barber_id",
+        {"telegram_id": "1", "barber_id": 1},
+    ),
+    "users_by_barber": (
+        "SELECT telegram_id FROM users WHERE barber_id = :barber_id",
+        {"barber_id": 1},
+    ),
+    "broadcast_users_page": (
+        "SELECT id, telegram_id FROM users "
+        "WHERE barber_id = :barber_id AND is_blocked = :blocked AND id > :last_id ORDER BY id LIMIT 500",
+        {"barber_id": 1, "blocked": False, "last_id": 0},
+    ),
+    "bookings_admin_page": (
+        "SELECT id FROM bookings "
+        "WHERE barber_id = :barber_id AND is_active = :active AND booking_day >= :start "
+        "AND start_minute IS NOT NULL "
+        "AND (booking_day, start_minute, id) > (:cursor_day, :cursor_minute, :cursor_id) "
+        "ORDER BY booking_day, start_minute, id LIMIT 51",
+        {"barber_id": 1, "active": True, "start": "2030-01-01",
+         "cursor_day": "2030-01-01", "cursor_minute": 600, "cursor_id": 1},
+    ),
+    "booking_services_by_booking": (
+        "SELECT service_name, price, duration FROM booking_services WHERE booking_id = :booking_id",
+        {"booking_id": 1},
+    ),
+}
+
+
+def explain(conn, sql, params):
+    """So'rov rejasini qatorlar ro'yxati ko'rinishida olish"""
+    if conn.dialect.name == "sqlite":
+        rows = conn.execute(text(f"EXPLAIN QUERY PLAN {sql}"), params)
+        return [row[-1] for row in rows]
+    if conn.dialect.name == "postgresql":
+        # Kichik jadvallarda planner baribir Seq Scan tanlaydi - indeks mavjudligini tekshirish uchun o'chiramiz
+        conn.execute(text("SET LOCAL enable_seqscan = off"))
+        rows = conn.execute(text(f"EXPLAIN {sql}"), params)
+        return [row[0] for row in rows]
+    raise RuntimeError(f"EXPLAIN qo'llab-quvvatlanmaydi: {conn.dialect.name}")
+
+
+def is_full_scan(dialect_name, plan):
+    """Reja to'liq jadval skanini o'z ichiga oladimi"""
+    for line in plan:
+        if dialect_name == "sqlite" and line.startswith("SCAN ") and "CONSTANT ROW" not in line:
+            return True
+        if dialect_name == "postgresql" and "Seq Scan" in line:
+            return True
+    return False
+
+
+def check_query_plans(bind=engine):
+    """
+    Har bir hot so'rov uchun (ok, reja) qaytaradi.
+    ok=False - so'rov to'liq skan qilyapti (indeks yo'q yoki ishlatilmayapti).
+    """
+    results = {}
+    with bind.connect() as conn:
+        for name, (sql, params) in HOT_QUERIES.items():
+            with conn.begin():
+                plan = explain(conn, sql, params)
+            results[name] = (not is_full_scan(conn.dialect.name, plan), plan)
+    return results
+
+
+def main():
+    import log_setup
+    log_setup.configure(fmt="text", text_format=log_setup.CLI_FORMAT)
+
+    from database import create_tables
+    create_tables()
+    applied = run_migrations()
+    logger.info(f"Bajarilgan migratsiyalar: {applied}" if applied else "Yangi migratsiya yo'q")
+
+    if len(sys.argv) > 1 and sys.argv[1] == "check-plans":
+        failed = 0
+        for name, (ok, plan) in check_query_plans().items():
+            logger.info(f"{'✅' if ok else '❌'} {name}")
+            for line in plan:
+                logger.info(f"      {line}")
+            failed += 0 if ok else 1
+        if failed:
+            logger.error(f"❌ {failed} ta so'rov to'liq skan qilyapti")
+            sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
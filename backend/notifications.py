@@ -0,0 +1,379 @@
+"""
+Telegram xabarnomalari: umumiy HTTP client va doimiy (DB) outbox
+
+- TelegramClient - bitta uzoq yashovchi httpx.AsyncClient (connection pool, keep-alive,
+  h2 o'rnatilgan bo'lsa HTTP/2). Har bir bronda yangi TCP/TLS ulanish ochilmaydi.
+- queue_notification() - xabarni notifications_outbox jadvaliga bron bilan bitta tranzaksiyada yozadi.
+- OutboxDispatcher - jadvalni fonda bo'shatadi: batch, har bir chat uchun tartib saqlanadi,
+  xatolikda eksponensial backoff, MAX_ATTEMPTS dan keyin yoki qayta urinish foydasiz bo'lsa - "dead".
+  Xabarlar restartdan keyin ham yo'qolmaydi.
+- Yuborishdan oldin qatorlar egallanadi (status=sending + lease_until) - bir nechta worker/process
+  bitta xabarni ikki marta yubormaydi. Worker yiqilsa, lease tugagach xabar qayta olinadi.
+
+Client va dispatcher FastAPI startup/shutdown da start()/stop() orqali boshqariladi.
+Lokal test uchun: python fake_telegram.py va TELEGRAM_API_URL=http://127.0.0.1:8081
+"""
+
+import asyncio
+import logging
+import os
+import time
+from collections import OrderedDict, namedtuple
+from datetime import datetime, timedelta
+
+import httpx
+from sqlalchemy import and_, func, or_, select, update
+
+import barber_registry
+import metrics
+import profiling
+from database import run_in_session, NotificationOutbox
+
+logger = logging.getLogger(__name__)
+
+TELEGRAM_API_URL = os.getenv("TELEGRAM_API_URL", "https://api.telegram.org").rstrip("/")
+TELEGRAM_HTTP2 = os.getenv("TELEGRAM_HTTP2", "1") == "1"
+TELEGRAM_MAX_CONNECTIONS = int(os.getenv("TELEGRAM_MAX_CONNECTIONS", "20"))
+TELEGRAM_TIMEOUT = float(os.getenv("TELEGRAM_TIMEOUT", "10"))
+
+BOT_TOKEN = os.getenv("BOT_TOKEN")  # barber_id = None bo'lgan xabarlar shu bot orqali
+
+OUTBOX_BATCH_SIZE = int(os.getenv("OUTBOX_BATCH_SIZE", "100"))
+OUTBOX_POLL_INTERVAL = float(os.getenv("OUTBOX_POLL_INTERVAL", "2"))
+OUTBOX_MAX_ATTEMPTS = int(os.getenv("OUTBOX_MAX_ATTEMPTS", "8"))
+OUTBOX_BACKOFF_BASE = float(os.getenv("OUTBOX_BACKOFF_BASE", "2"))
+OUTBOX_BACKOFF_MAX = float(os.getenv("OUTBOX_BACKOFF_MAX", "600"))
+OUTBOX_RETENTION_DAYS = int(os.getenv("OUTBOX_RETENTION_DAYS", "7"))
+OUTBOX_LEASE_SECONDS = int(os.getenv("OUTBOX_LEASE_SECONDS", "300"))
+
+# ok, qayta urinish mumkinmi, retry_after (s), xatolik matni
+SendResult = namedtuple("SendResult", ["ok", "retryable", "retry_after", "error"])
+
+
+def is_parse_error(result):
+    """Telegram Markdown ni tahlil qila olmadi (masalan ismda yopilmagan "_" yoki "*")"""
+    return not result.ok and "can't parse entities" in (result.error or "")
+
+
+def http2_available():
+    """HTTP/2 uchun h2 paketi kerak (pip install httpx[http2]) - bo'lmasa HTTP/1.1 keep-alive"""
+    if not TELEGRAM_HTTP2:
+        return False
+    try:
+        import h2  # noqa: F401
+        return True
+    except ImportError:
+        logger.warning("⚠️ TELEGRAM_HTTP2=1, lekin h2 o'rnatilmagan (httpx[http2]) - HTTP/1.1 ishlatiladi")
+        return False
+
+
+class TelegramClient:
+    """Bot API ga so'rovlar uchun umumiy, connection-pooled client"""
+
+    def __init__(self, base_url=TELEGRAM_API_URL):
+        self.base_url = base_url
+        self._client = None
+
+    async def start(self):
+        if self._client is None:
+            http2 = http2_available()
+            self._client = httpx.AsyncClient(
+                http2=http2,
+                limits=httpx.Limits(
+                    max_connections=TELEGRAM_MAX_CONNECTIONS,
+                    max_keepalive_connections=TELEGRAM_MAX_CONNECTIONS,
+                    keepalive_expiry=60
+                ),
+                timeout=httpx.Timeout(TELEGRAM_TIMEOUT)
+            )
+            logger.info(f"✅ Telegram HTTP client tayyor (HTTP/2: {http2})")
+
+    async def close(self):
+        if self._client is not None:
+            await self._client.aclose()
+            self._client = None
+
+    @property
+    def client(self):
+        if self._client is None:
+            raise RuntimeError("TelegramClient ishga tushirilmagan (start() chaqirilmagan)")
+        return self._client
+
+    async def send_message(self, token, chat_id, text, parse_mode="Markdown"):
+        """Bitta xabar yuborish. SendResult qaytaradi"""
+        payload = {"chat_id": chat_id, "text": text}
+        if parse_mode:
+            payload["parse_mode"] = parse_mode
+        started = time.perf_counter()
+        try:
+            with profiling.span("telegram", "sendMessage"):
+                response = await self.client.post(f"{self.base_url}/bot{token}/sendMessage", json=payload)
+        except httpx.HTTPError as e:
+            metrics.observe_telegram("outbox", "sendMessage", time.perf_counter() - started, type(e).__name__)
+            return SendResult(False, True, None, f"{type(e).__name__}: {e}")
+
+        metrics.observe_telegram(
+            "outbox", "sendMessage", time.perf_counter() - started,
+            None if response.status_code == 200 else str(response.status_code)
+        )
+        if response.status_code == 200:
+            return SendResult(True, False, None, None)
+
+        try:
+            data = response.json()
+        except ValueError:
+            data = {}
+        error = f"{response.status_code} {data.get('description') or response.text[:200]}"
+        if response.status_code == 429:
+            retry_after = (data.get("parameters") or {}).get("retry_after")
+            return SendResult(False, True, retry_after, error)
+        # 5xx - Telegram tomonida vaqtinchalik xatolik; 400/403 (chat topilmadi, bloklangan) - qayta urinish foydasiz
+        return SendResult(False, response.status_code >= 500, None, error)
+
+
+# ==================== OUTBOX (DB) ====================
+
+def queue_notification(db, chat_id, text, barber_id=None, parse_mode="Markdown"):
+    """Xabarni outboxga qo'shish. Commit chaqiruvchi tranzaksiyasida bo'ladi"""
+    db.add(NotificationOutbox(
+        barber_id=barber_id,
+        chat_id=str(chat_id),
+        text=text,
+        parse_mode=parse_mode,
+        next_attempt_at=datetime.utcnow()
+    ))
+
+
+def backoff_seconds(attempts, retry_after=None):
+    if retry_after:
+        return float(retry_after)
+    return min(OUTBOX_BACKOFF_BASE ** attempts, OUTBOX_BACKOFF_MAX)
+
+
+def claim_due_batch(db, now, limit=OUTBOX_BATCH_SIZE):
+    """
+    Navbatdagi xabarlarni egallash (status=sending, lease_until) va chat bo'yicha guruhlab olish.
+    Faqat shu chaqiruv egallagan qatorlar qaytariladi - boshqa worker ularni ololmaydi.
+    Chatda backoffdagi yoki boshqa worker yuborayotgan xabar bo'lsa, butun chat o'tkazib yuboriladi -
+    keyingi xabarlar undan oldin ketib qolmasligi uchun.
+    Qaytaradi: ({chat_id: [xabar dict, ...]}, {barber_id: bot_token})
+    """
+    outbox = NotificationOutbox
+    claimable = or_(
+        outbox.status == "pending",
+        and_(outbox.status == "sending", outbox.lease_until < now)  # yiqilgan worker qoldirgan
+    )
+    busy_chats = select(outbox.chat_id).where(or_(
+        and_(outbox.status == "pending", outbox.next_attempt_at > now),
+        and_(outbox.status == "sending", outbox.lease_until >= now)
+    ))
+    ids = db.execute(
+        select(outbox.id).where(claimable, outbox.chat_id.notin_(busy_chats)).order_by(outbox.id).limit(limit)
+    ).scalars().all()
+    if not ids:
+        return OrderedDict(), {}
+
+    # Shart qayta tekshiriladi: parallel worker shu orada egallagan qatorlar RETURNING ga tushmaydi
+    rows = db.execute(
+        update(outbox)
+        .where(outbox.id.in_(ids), claimable)
+        .values(status="sending", lease_until=now + timedelta(seconds=OUTBOX_LEASE_SECONDS))
+        .returning(outbox.id, outbox.barber_id, outbox.chat_id, outbox.text, outbox.parse_mode, outbox.attempts)
+        .execution_options(synchronize_session=False)
+    ).all()
+    db.commit()
+    rows.sort(key=lambda row: row.id)
+
+    chats = OrderedDict()
+    for row in rows:
+        chats.setdefault(row.chat_id, []).append({
+            "id": row.id,
+            "barber_id": row.barber_id,
+            "chat_id": row.chat_id,
+            "text": row.text,
+            "parse_mode": row.parse_mode,
+            "attempts": row.attempts,
+        })
+
+    tokens = {None: BOT_TOKEN}
+    for barber_id in {row.barber_id for row in rows if row.barber_id}:
+        barber = barber_registry.get(barber_id, db)
+        tokens[barber_id] = barber.bot_token if barber else None
+    return chats, tokens
+
+
+def save_results(db, results, now, released_ids=()):
+    """
+    [(xabar dict, SendResult), ...] natijalarini bitta tranzaksiyada yozish.
+    released_ids - egallangan, lekin yuborilmagan xabarlar (chatdagi oldingi xabar xato berdi) - navbatga qaytadi
+    """
+    if released_ids:
+        db.query(NotificationOutbox).filter(
+            NotificationOutbox.id.in_(released_ids),
+            NotificationOutbox.status == "sending"
+        ).update({"status": "pending", "lease_until": None}, synchronize_session=False)
+
+    for message, result in results:
+        row = db.get(NotificationOutbox, message["id"])
+        row.attempts = message["attempts"] + 1
+        row.lease_until = None
+        if result.ok:
+            row.status = "sent"
+            row.sent_at = now
+            row.last_error = None
+            continue
+        row.last_error = (result.error or "")[:500]
+        if not result.retryable or row.attempts >= OUTBOX_MAX_ATTEMPTS:
+            row.status = "dead"
+            logger.error(f"☠️ Xabarnoma #{row.id} (chat {row.chat_id}) dead-letter: {row.last_error}")
+        else:
+            row.status = "pending"
+            row.next_attempt_at = now + timedelta(seconds=backoff_seconds(row.attempts, result.retry_after))
+    db.commit()
+
+
+def purge_sent(db, older_than):
+    count = db.query(NotificationOutbox).filter(
+        NotificationOutbox.status == "sent",
+        NotificationOutbox.sent_at < older_than
+    ).delete(synchronize_session=False)
+    db.commit()
+    return count
+
+
+def outbox_counts(db):
+    rows = db.query(NotificationOutbox.status, func.count(NotificationOutbox.id)).group_by(
+        NotificationOutbox.status
+    ).all()
+    return {status: count for status, count in rows}
+
+
+class OutboxDispatcher:
+    """notifications_outbox jadvalini fonda bo'shatuvchi worker"""
+
+    def __init__(self, telegram_client):
+        self.telegram_client = telegram_client
+        self._task = None
+        self._wakeup = None
+        self._stopping = False
+        self._last_purge = None
+        self.sent = 0
+        self.retried = 0
+        self.dead = 0
+
+    def start(self):
+        if self._task:
+            return
+        self._stopping = False
+        self._wakeup = asyncio.Event()
+        self._task = asyncio.create_task(self._run())
+
+    def wake(self):
+        """Yangi xabar yozildi - poll intervalni kutmasdan yuborish"""
+        if self._wakeup is not None:
+            self._wakeup.set()
+
+    async def _send_chat(self, messages, tokens):
+        """Bitta chat xabarlarini ketma-ket yuborish; vaqtinchalik xatolikda to'xtaladi (tartib buzilmaydi)"""
+        results = []
+        for message in messages:
+            token = tokens.get(message["barber_id"])
+            if not token:
+                result = SendResult(False, False, None, "Bot token topilmadi")
+            else:
+                result = await self.telegram_client.send_message(
+                    token, message["chat_id"], message["text"], message["parse_mode"]
+                )
+                if message["parse_mode"] and is_parse_error(result):
+                    # Qayta urinish foydasiz - bir marta formatlashsiz yuboramiz
+                    logger.warning(f"⚠️ Xabarnoma #{message['id']} Markdown xato, oddiy matn sifatida yuborilmoqda")
+                    result = await self.telegram_client.send_message(
+                        token, message["chat_id"], message["text"], None
+                    )
+            results.append((message, result))
+            if not result.ok and result.retryable:
+                break
+        return results
+
+    async def dispatch_once(self):
+        """Bitta batch ni yuborish. Ko'rilgan xabarlar sonini qaytaradi"""
+        now = datetime.utcnow()
+        chats, tokens = await run_in_session(claim_due_batch, now)
+        if not chats:
+            return 0
+
+        # Turli chatlar parallel, bitta chat ichida - ketma-ket
+        per_chat = await asyncio.gather(*(self._send_chat(messages, tokens) for messages in chats.values()))
+        results = [item for chat_results in per_chat for item in chat_results]
+        attempted = {message["id"] for message, _ in results}
+        released = [message["id"] for messages in chats.values() for message in messages if message["id"] not in attempted]
+        await run_in_session(save_results, results, datetime.utcnow(), released)
+
+        for message, result in results:
+            if result.ok:
+                self.sent += 1
+            elif result.retryable and message["attempts"] + 1 < OUTBOX_MAX_ATTEMPTS:
+                self.retried += 1
+            else:
+                self.dead += 1
+        return len(results)
+
+    async def _purge_if_due(self):
+        now = datetime.utcnow()
+        if self._last_purge and now - self._last_purge < timedelta(hours=1):
+            return
+        self._last_purge = now
+        count = await run_in_session(purge_sent, now - timedelta(days=OUTBOX_RETENTION_DAYS))
+        if count:
+            logger.info(f"🧹 Outboxdan {count} ta eski yuborilgan xabar o'chirildi")
+
+    async def _run(self):
+        while not self._stopping:
+            processed = 0
+            try:
+                processed = await self.dispatch_once()
+                await self._purge_if_due()
+            except Exception as e:
+                logger.error(f"❌ Outbox dispatcher xatolik: {e}", exc_info=True)
+
+            if processed >= OUTBOX_BATCH_SIZE or self._stopping:
+                continue
+            try:
+                await asyncio.wait_for(self._wakeup.wait(), OUTBOX_POLL_INTERVAL)
+            except asyncio.TimeoutError:
+                pass
+            self._wakeup.clear()
+
+    async def stop(self, timeout=10):
+        """Joriy batch tugashini kutib to'xtatish. Yuborilmagan xabarlar jadvalda qoladi"""
+        if not self._task:
+            return
+        self._stopping = True
+        self.wake()
+        try:
+            await asyncio.wait_for(self._task, timeout)
+        except asyncio.TimeoutError:
+            self._task.cancel()
+            await asyncio.gather(self._task, return_exceptions=True)
+        self._task = None
+
+    def stats(self):
+        return {"sent": self.sent, "retried": self.retried, "dead": self.dead, "running": self._task is not None}
+
+
+telegram_client = TelegramClient()
+dispatcher = OutboxDispatcher(telegram_client)
+
+
+def wake():
+    dispatcher.wake()
+
+
+async def start():
+    await telegram_client.start()
+    dispatcher.start()
+
+
+async def stop(timeout=10):
+    await dispatcher.stop(timeout)
+    await telegram_client.close()
@@ -0,0 +1,284 @@
+"""
+So'rov va bot update profillash (opt-in): qaysi qismga qancha vaqt ketdi
+
+PROFILING_ENABLED=1 bo'lsa har bir HTTP so'rov (ProfilingMiddleware) va bot handler
+(profile_handler) uchun trace ochiladi; ichidagi spanlar kategoriya bo'yicha yig'iladi:
+- db - har bir SQL so'rov (engine hodisalari)
+- telegram - Bot API chaqiruvlari
+- sheets - Google Sheets eksport chaqiruvlari
+- template - xabar/javob matnini yasash
+
+Trace saqlanadi, agar u PROFILING_SLOW_MS dan sekin bo'lsa yoki PROFILING_SAMPLE_RATE ulushiga tushsa.
+Saqlanganlar ring bufferda (PROFILING_BUFFER_SIZE) - GET /api/admin/slow-requests.
+Span yozish - perf_counter va list append; trace bo'lmasa span() darhol qaytadi.
+"""
+
+import contextvars
+import functools
+import logging
+import os
+import random
+import threading
+import time
+from collections import deque
+from contextlib import contextmanager
+from datetime import datetime
+
+from sqlalchemy import event
+
+import log_setup
+
+logger = logging.getLogger(__name__)
+
+PROFILING_ENABLED = os.getenv("PROFILING_ENABLED", "0") == "1"
+PROFILING_SAMPLE_RATE = float(os.getenv("PROFILING_SAMPLE_RATE", "0.01"))
+PROFILING_SLOW_MS = float(os.getenv("PROFILING_SLOW_MS", "500"))
+PROFILING_BUFFER_SIZE = int(os.getenv("PROFILING_BUFFER_SIZE", "200"))
+
+# Bitta tracedagi batafsil spanlar soni (kategoriya jami hisoblari cheklanmaydi)
+SPAN_LIMIT = 100
+SPAN_NAME_LENGTH = 120
+
+_current = contextvars.ContextVar("profiling_trace", default=None)
+
+
+class Trace:
+    """Bitta so'rov/update: kategoriya bo'yicha jami va birinchi SPAN_LIMIT ta span"""
+
+    def __init__(self, kind, name):
+        self.kind = kind
+        self.name = name
+        self.started_at = datetime.utcnow()
+        self.started = time.perf_counter()
+        self.duration = None
+        self.status = None
+        self.totals = {}
+        self.spans = []
+        self.dropped_spans = 0
+        self._lock = threading.Lock()
+
+    def add(self, category, name, started, duration):
+        # DB spanlari thread pool'dan keladi (run_db konteksti ko'chiradi) - lock bilan
+        with self._lock:
+            count, total = self.totals.get(category, (0, 0.0))
+            self.totals[category] = (count + 1, total + duration)
+            if len(self.spans) < SPAN_LIMIT:
+                self.spans.append((category, name, started - self.started, duration))
+            else:
+                self.dropped_spans += 1
+
+    def to_dict(self, slow, sampled):
+        duration_ms = self.duration * 1000
+        accounted = sum(total for _, total in self.totals.values()) * 1000
+        return {
+            "kind": self.kind,
+            "name": self.name,
+            "status": self.status,
+            "started_at": self.started_at.isoformat(),
+            "duration_ms": round(duration_ms, 2),
+            "slow": slow,
+            "sampled": sampled,
+            "context": dict(log_setup.current_context()),
+            "breakdown": {
+                category: {"count": count, "ms": round(total * 1000, 2)}
+                for category, (count, total) in sorted(self.totals.items())
+            },
+            "other_ms": round(max(0.0, duration_ms - accounted), 2),
+            "spans": [
+                {"category": category, "name": name, "offset_ms": round(offset * 1000, 2), "ms": round(duration * 1000, 2)}
+                for category, name, offset, duration in self.spans
+            ],
+            "dropped_spans": self.dropped_spans,
+        }
+
+
+class TraceBuffer:
+    """Oxirgi PROFILING_BUFFER_SIZE ta saqlangan trace (eskilari avtomatik chiqib ketadi)"""
+
+    def __init__(self, size=PROFILING_BUFFER_SIZE):
+        self._items = deque(maxlen=size)
+        self._lock = threading.Lock()
+        self.seen = 0
+        self.slow = 0
+        self.sampled = 0
+        self._next_id = 1
+
+    def record(self, trace):
+        """Trace tugadi: sekin yoki sampled bo'lsa saqlash. Saqlangan bo'lsa dict qaytaradi"""
+        slow = trace.duration * 1000 >= PROFILING_SLOW_MS
+        sampled = not slow and random.random() < PROFILING_SAMPLE_RATE
+        with self._lock:
+            self.seen += 1
+            self.slow += slow
+            self.sampled += sampled
+        if not (slow or sampled):
+            return None
+        entry = trace.to_dict(slow, sampled)
+        with self._lock:
+            entry["id"] = self._next_id
+            self._next_id += 1
+            self._items.append(entry)
+        return entry
+
+    def list(self, limit=50, kind=None, slow_only=False):
+        with self._lock:
+            items = list(self._items)
+        items = [
+            item for item in reversed(items)
+            if (kind is None or item["kind"] == kind) and (not slow_only or item["slow"])
+        ]
+        return items[:limit]
+
+    def stats(self):
+        with self._lock:
+            return {
+                "enabled": PROFILING_ENABLED,
+                "sample_rate": PROFILING_SAMPLE_RATE,
+                "slow_ms": PROFILING_SLOW_MS,
+                "buffered": len(self._items),
+                "seen": self.seen,
+                "slow": self.slow,
+                "sampled": self.sampled,
+            }
+
+
+buffer = TraceBuffer()
+
+
+# ==================== TRACE / SPAN ====================
+
+@contextmanager
+def trace(kind, name):
+    """Yangi trace ochish (ichma-ich bo'lsa tashqisi ishlatiladi)"""
+    if not PROFILING_ENABLED or _current.get() is not None:
+        yield None
+        return
+    current = Trace(kind, name)
+    token = _current.set(current)
+    try:
+        yield current
+    finally:
+        _current.reset(token)
+        current.duration = time.perf_counter() - current.started
+        finish(current)
+
+
+def finish(current):
+    entry = buffer.record(current)
+    if entry and entry["slow"]:
+        breakdown = ", ".join(f"{category}={data['ms']}ms/{data['count']}" for category, data in entry["breakdown"].items())
+        logger.warning(
+            "Sekin %s: %s %.0fms (%s)", current.kind, current.name, entry["duration_ms"], breakdown or "spansiz",
+            extra={"trace_id": entry["id"]}
+        )
+
+
+@contextmanager
+def span(category, name):
+    """Joriy trace ichida vaqtni o'lchash; trace yo'q bo'lsa hech narsa qilmaydi"""
+    current = _current.get()
+    if current is None:
+        yield
+        return
+    started = time.perf_counter()
+    try:
+        yield
+    finally:
+        current.add(category, name, started, time.perf_counter() - started)
+
+
+def traced(category, name=None):
+    """Sinxron funksiya uchun span dekoratori: @traced("template")"""
+    def decorator(func):
+        span_name = name or func.__name__
+
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            if _current.get() is None:
+                return func(*args, **kwargs)
+            with span(category, span_name):
+                return func(*args, **kwargs)
+        return wrapper
+    return decorator
+
+
+# ==================== DB ====================
+
+def before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    if _current.get() is not None:
+        conn.info.setdefault("profiling_started", []).append(time.perf_counter())
+
+
+def after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    current = _current.get()
+    stack = conn.info.get("profiling_started")
+    if current is None or not stack:
+        return
+    started = stack.pop()
+    current.add("db", " ".join(statement.split())[:SPAN_NAME_LENGTH], started, time.perf_counter() - started)
+
+
+def handle_error(context):
+    stack = context.connection.info.get("profiling_started") if context.connection is not None else None
+    if stack:
+        stack.pop()
+
+
+def instrument_engine(engine):
+    if not PROFILING_ENABLED or event.contains(engine, "before_cursor_execute", before_cursor_execute):
+        return
+    event.listen(engine, "before_cursor_execute", before_cursor_execute)
+    event.listen(engine, "after_cursor_execute", after_cursor_execute)
+    event.listen(engine, "handle_error", handle_error)
+
+
+# ==================== HTTP ====================
+
+class ProfilingMiddleware:
+    """Pure ASGI middleware: har bir so'rov uchun trace (nomi - route shabloni)"""
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        status = 500
+
+        async def send_with_status(message):
+            nonlocal status
+            if message["type"] == "http.response.start":
+                status = message["status"]
+            await send(message)
+
+        with trace("http", scope.get("path", "")) as current:
+            try:
+                await self.app(scope, receive, send_with_status)
+            finally:
+                if current is not None:
+                    route = scope.get("route")
+                    current.name = f"{scope.get('method', '')} {getattr(route, 'path', None) or scope.get('path', '')}"
+                    current.status = status
+
+
+# ==================== BOT ====================
+
+def profile_handler(callback):
+    """PTB handler callback uchun wrapper: trace nomi - bot:<handler nomi>. O'chiq bo'lsa callback o'zi"""
+    if not PROFILING_ENABLED:
+        return callback
+
+    @functools.wraps(callback)
+    async def wrapper(update, context, *args, **kwargs):
+        with trace("bot", f"bot:{callback.__name__}") as current:
+            status = "error"
+            try:
+                result = await callback(update, context, *args, **kwargs)
+                status = "ok"
+                return result
+            finally:
+                if current is not None:
+                    current.status = status
+    return wrapper
@@ -0,0 +1,51 @@
+"""
+SQL so'rovlar sonini o'lchash - N+1 regressiyalarini ushlash uchun
+
+    with count_queries() as counter:
+        ...
+    counter.count, counter.statements
+
+    with assert_max_queries(2):
+        ...  # ko'proq so'rov bo'lsa AssertionError (bajarilgan SQL ro'yxati bilan)
+
+Bronlar o'qiladigan asosiy yo'llar uchun byudjet testlari: tests/test_query_budget.py
+"""
+
+from contextlib import contextmanager
+
+from sqlalchemy import event
+
+
+class QueryCounter:
+    def __init__(self):
+        self.statements = []
+
+    @property
+    def count(self):
+        return len(self.statements)
+
+    def __call__(self, conn, cursor, statement, parameters, context, executemany):
+        self.statements.append(statement)
+
+
+@contextmanager
+def count_queries(bind=None):
+    """Blok ichida bind (default - database.engine) orqali bajarilgan SQL so'rovlarni yig'ish"""
+    if bind is None:
+        from database import engine as bind
+    counter = QueryCounter()
+    event.listen(bind, "before_cursor_execute", counter)
+    try:
+        yield counter
+    finally:
+        event.remove(bind, "before_cursor_execute", counter)
+
+
+@contextmanager
+def assert_max_queries(limit, bind=None):
+    """Blok `limit` tadan ko'p so'rov bajarsa AssertionError"""
+    with count_queries(bind) as counter:
+        yield counter
+    if counter.count > limit:
+        statements = "\n".join(f"  {i}. {sql}" for i, sql in enumerate(counter.statements, 1))
+        raise AssertionError(f"{counter.count} ta so'rov bajarildi (ruxsat: {limit}):\n{statements}")
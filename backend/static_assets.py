@@ -0,0 +1,350 @@
+"""
+Web App va admin panel statik fayllari: fingerprint + oldindan siqilgan variantlar
+
+Build bosqichi (deployda bir marta: python static_assets.py va STATIC_BUILD=0,
+yoki startupda avtomatik):
+- har bir asset (js, css, rasm) kontent hashi bilan nusxalanadi: app.js -> app.3f9c2a1b7e.js
+- matnli fayllar uchun .gz (va `brotli` o'rnatilgan bo'lsa .br) variantlari oldindan yoziladi
+- HTML src/href, CSS url(...) va JS satrlaridagi asset havolalari hashli nomlarga almashtiriladi
+  (havola qilingan fayl oldin hashlanadi - uning hashi havola qiluvchining hashiga kiradi)
+
+Har bir bundle manba hashi bo'yicha nomlangan papkaga (frontend.<hash>) yoziladi: process o'zining
+vaqtinchalik papkasida build qiladi va tayyor papkani rename qiladi, `frontend` esa unga symlink
+(os.replace bilan atomar almashtiriladi). Bir nechta worker bir vaqtda ishga tushsa bir-biriga
+xalaqit bermaydi; manba o'zgarmagan bo'lsa build qayta qilinmaydi.
+
+Serve qilish (PrecompressedStaticFiles):
+- Accept-Encoding bo'yicha .br / .gz variant tanlanadi, Vary: Accept-Encoding
+- hashli fayllar: Cache-Control: public, max-age=31536000, immutable
+- HTML va hashsiz nomlar: no-cache (ETag/Last-Modified bilan qayta tekshiriladi)
+"""
+
+import gzip
+import hashlib
+import json
+import logging
+import mimetypes
+import os
+import pathlib
+import re
+import shutil
+import sys
+import tempfile
+
+from starlette.datastructures import Headers
+from starlette.responses import FileResponse
+from starlette.staticfiles import NotModifiedResponse, StaticFiles
+
+logger = logging.getLogger(__name__)
+
+ROOT_DIR = pathlib.Path(__file__).parent.parent
+BUILD_DIR = pathlib.Path(os.getenv("STATIC_BUILD_DIR", str(pathlib.Path(__file__).parent / "static_build")))
+
+# (manba papka, URL prefiks, build ichidagi papka nomi)
+BUNDLES = [
+    (ROOT_DIR / "frontend", "/static/", "frontend"),
+    (ROOT_DIR / "admin", "/admin/", "admin"),
+]
+
+HASHED_SUFFIXES = {".js", ".css", ".png", ".jpg", ".jpeg", ".svg", ".webp", ".ico", ".woff2"}
+COMPRESSIBLE_SUFFIXES = {".html", ".js", ".css", ".svg", ".json"}
+SKIP_NAMES = {"vercel.json", "manifest.json"}
+MIN_COMPRESS_SIZE = 256
+
+STATIC_BUILD = os.getenv("STATIC_BUILD", "1") == "1"
+
+IMMUTABLE_CACHE = "public, max-age=31536000, immutable"
+REVALIDATE_CACHE = "no-cache"
+
+MANIFEST_NAME = "manifest.json"
+BUILD_FORMAT = "2"  # build natijasi o'zgarsa oshiriladi - eski hashli papkalar qayta ishlatilmaydi
+
+ATTR_RE = re.compile(r'(\b(?:src|href)=")([^"]+)(")')
+CSS_URL_RE = re.compile(r'(url\(\s*["\']?)([^"\')\s]+)(["\']?\s*\))')
+JS_ASSET_RE = re.compile(
+    r'(["\'`])([^"\'`\s]+\.(?:' + "|".join(sorted(s.lstrip(".") for s in HASHED_SUFFIXES)) + r')(?:\?[^"\'`\s]*)?)(\1)'
+)
+
+# suffix -> (havola regexi, nisbiy yo'l fayl papkasiga nisbatanmi)
+# JS dagi nisbiy URL sahifaga nisbatan hal qilinadi (skriptga emas) - u yerda faqat url_prefix li havolalar
+REFERENCE_PATTERNS = {
+    ".html": (ATTR_RE, True),
+    ".css": (CSS_URL_RE, True),
+    ".js": (JS_ASSET_RE, False),
+}
+
+
+def brotli_module():
+    """Brotli ixtiyoriy (pip install brotli) - bo'lmasa faqat gzip"""
+    try:
+        import brotli
+        return brotli
+    except ImportError:
+        return None
+
+
+def fingerprint(data: bytes) -> str:
+    return hashlib.sha256(data).hexdigest()[:10]
+
+
+def hashed_name(rel_path: str, digest: str) -> str:
+    path = pathlib.PurePosixPath(rel_path)
+    return str(path.with_name(f"{path.stem}.{digest}{path.suffix}"))
+
+
+def write_variants(path: pathlib.Path, data: bytes, brotli) -> None:
+    """Matnli fayl yoniga .gz va .br yozish (siqilgan hajm kichik bo'lsagina)"""
+    if path.suffix not in COMPRESSIBLE_SUFFIXES or len(data) < MIN_COMPRESS_SIZE:
+        return
+    gz = gzip.compress(data, compresslevel=9, mtime=0)
+    if len(gz) < len(data):
+        path.with_name(path.name + ".gz").write_bytes(gz)
+    if brotli is not None:
+        br = brotli.compress(data, quality=11)
+        if len(br) < len(data):
+            path.with_name(path.name + ".br").write_bytes(br)
+
+
+def reference_rel(path: str, base_dir: str, url_prefix: str, relative: bool):
+    """Havola bundle ichidagi qaysi faylga (bundle ga nisbatan yo'l) ishora qiladi, tashqi bo'lsa None"""
+    if path.startswith(("http:", "https:", "//", "#", "data:", "mailto:")):
+        return None
+    if path.startswith(url_prefix):
+        return path[len(url_prefix):]
+    if path.startswith("/") or not relative:
+        return None
+    return os.path.normpath(os.path.join(base_dir, path)).replace(os.sep, "/")
+
+
+def rewrite_references(text: str, rel: str, url_prefix: str, manifest: dict) -> str:
+    """HTML/CSS/JS dagi lokal asset havolalarini hashli nomlarga almashtirish"""
+    pattern, relative = REFERENCE_PATTERNS[pathlib.PurePosixPath(rel).suffix]
+    base_dir = str(pathlib.PurePosixPath(rel).parent)
+    base_dir = "" if base_dir == "." else base_dir
+
+    def replace(match):
+        path, sep, query = match.group(2).partition("?")
+        target_rel = reference_rel(path, base_dir, url_prefix, relative)
+        target = manifest.get(target_rel) if target_rel else None
+        if not target:
+            return match.group(0)
+        if path.startswith(url_prefix):
+            new_path = url_prefix + target
+        else:
+            new_path = os.path.relpath(target, base_dir or ".").replace(os.sep, "/")
+        return f"{match.group(1)}{new_path}{sep}{query}{match.group(3)}"
+
+    return pattern.sub(replace, text)
+
+
+def local_references(text: str, rel: str, url_prefix: str) -> set:
+    """Fayl havola qilgan bundle ichidagi fayllar"""
+    pattern, relative = REFERENCE_PATTERNS[pathlib.PurePosixPath(rel).suffix]
+    base_dir = str(pathlib.PurePosixPath(rel).parent)
+    base_dir = "" if base_dir == "." else base_dir
+    refs = set()
+    for match in pattern.finditer(text):
+        target_rel = reference_rel(match.group(2).partition("?")[0], base_dir, url_prefix, relative)
+        if target_rel:
+            refs.add(target_rel)
+    return refs
+
+
+def source_files(source: pathlib.Path) -> list:
+    return sorted(
+        path for path in source.rglob("*")
+        if path.is_file() and path.name not in SKIP_NAMES and not path.name.startswith(".")
+    )
+
+
+def source_digest(source: pathlib.Path, files: list, url_prefix: str, brotli) -> str:
+    """Manba fayllar va build sozlamalari hashi - build papkasi nomi"""
+    digest = hashlib.sha256(f"{BUILD_FORMAT}|{url_prefix}|{brotli is not None}".encode())
+    for path in files:
+        digest.update(path.relative_to(source).as_posix().encode() + b"\0")
+        digest.update(path.read_bytes() + b"\0")
+    return digest.hexdigest()[:10]
+
+
+def write_asset(target: pathlib.Path, rel: str, data: bytes, brotli, manifest: dict) -> None:
+    out = target / rel
+    out.parent.mkdir(parents=True, exist_ok=True)
+    # Asl nom ham qoladi - eski HTML yoki tashqi havolalar uchun
+    out.write_bytes(data)
+    write_variants(out, data, brotli)
+    if out.suffix in HASHED_SUFFIXES:
+        hashed = hashed_name(rel, fingerprint(data))
+        hashed_out = target / hashed
+        hashed_out.write_bytes(data)
+        write_variants(hashed_out, data, brotli)
+        manifest[rel] = hashed
+
+
+def write_bundle(source: pathlib.Path, files: list, url_prefix: str, target: pathlib.Path, brotli) -> dict:
+    """Bundle fayllarini target papkaga yozish. Manifest qaytaradi: {asl nom: hashli nom}"""
+    manifest = {}
+    pending = {}
+    for path in files:
+        rel = path.relative_to(source).as_posix()
+        if path.suffix in REFERENCE_PATTERNS:
+            pending[rel] = path.read_text(encoding="utf-8")
+        else:
+            write_asset(target, rel, path.read_bytes(), brotli, manifest)
+
+    # Havola qilingan fayl avval hashlanadi; aylanma havolada qolganlari mavjud manifest bilan yoziladi
+    while pending:
+        ready = [
+            rel for rel, text in pending.items()
+            if not (local_references(text, rel, url_prefix) - {rel}) & pending.keys()
+        ] or list(pending)
+        for rel in sorted(ready):
+            text = rewrite_references(pending.pop(rel), rel, url_prefix, manifest)
+            write_asset(target, rel, text.encode("utf-8"), brotli, manifest)
+
+    (target / MANIFEST_NAME).write_text(json.dumps(manifest, indent=2, sort_keys=True), encoding="utf-8")
+    return manifest
+
+
+def switch_link(link: pathlib.Path, build: pathlib.Path) -> None:
+    """link -> build symlinkini atomar almashtirish (os.replace symlink ustiga yozadi)"""
+    if link.is_dir() and not link.is_symlink():
+        shutil.rmtree(link, ignore_errors=True)  # eski formatdagi oddiy papka
+    tmp_link = link.with_name(f".{link.name}.link-{os.getpid()}-{os.urandom(4).hex()}")
+    os.symlink(build.name, tmp_link)
+    os.replace(tmp_link, link)
+
+
+def remove_old_builds(link: pathlib.Path, keep: set) -> None:
+    """Joriy va oldingi (hali ishlayotgan eski processlar uchun) builddan boshqalarini o'chirish"""
+    for path in link.parent.glob(f"{link.name}.*"):
+        if path.name not in keep and path.is_dir() and not path.is_symlink():
+            shutil.rmtree(path, ignore_errors=True)
+
+
+def build_bundle(source: pathlib.Path, url_prefix: str, target: pathlib.Path, brotli) -> dict:
+    """Bitta papkani build qilish. Manifest qaytaradi: {asl nom: hashli nom}"""
+    files = source_files(source)
+    build = target.with_name(f"{target.name}.{source_digest(source, files, url_prefix, brotli)}")
+    target.parent.mkdir(parents=True, exist_ok=True)
+
+    if not (build / MANIFEST_NAME).exists():
+        # Har bir process o'z vaqtinchalik papkasida build qiladi - yarim build serve qilinmaydi
+        tmp = pathlib.Path(tempfile.mkdtemp(prefix=f".{target.name}.tmp-", dir=target.parent))
+        try:
+            write_bundle(source, files, url_prefix, tmp, brotli)
+            try:
+                tmp.rename(build)
+            except OSError:
+                # Boshqa worker xuddi shu buildni oldinroq tugatgan
+                if not (build / MANIFEST_NAME).exists():
+                    raise
+        finally:
+            shutil.rmtree(tmp, ignore_errors=True)
+
+    previous = os.readlink(target) if target.is_symlink() else None
+    if previous != build.name:
+        switch_link(target, build)
+    remove_old_builds(target, {build.name, previous})
+    return json.loads((build / MANIFEST_NAME).read_text(encoding="utf-8"))
+
+
+def build_all(build_dir: pathlib.Path = BUILD_DIR) -> dict:
+    """Barcha bundlelarni build qilish. {bundle nomi: manifest}"""
+    brotli = brotli_module()
+    result = {}
+    for source, url_prefix, name in BUNDLES:
+        if not source.is_dir():
+            continue
+        result[name] = build_bundle(source, url_prefix, build_dir / name, brotli)
+        logger.info(f"✅ Statik fayllar build qilindi: {name} ({len(result[name])} ta asset, brotli: {brotli is not None})")
+    return result
+
+
+def prepare():
+    """
+    Startupda chaqiriladi: STATIC_BUILD=1 bo'lsa build qiladi, keyin mount qilingan
+    PrecompressedStaticFiles larni build papkasiga o'tkazadi (build bo'lmasa - asl papkada qoladi).
+    """
+    if STATIC_BUILD:
+        try:
+            build_all()
+        except OSError as e:
+            logger.error(f"❌ Statik fayllarni build qilib bo'lmadi, asl fayllar beriladi: {e}")
+    for app in _instances:
+        app.use_build()
+
+
+def accepted_encodings(scope) -> set:
+    for key, value in scope.get("headers", []):
+        if key == b"accept-encoding":
+            return {
+                part.split(";")[0].strip()
+                for part in value.decode("latin-1").lower().split(",")
+                if not part.strip().endswith(";q=0")
+            }
+    return set()
+
+
+class PrecompressedStaticFiles(StaticFiles):
+    """
+    StaticFiles + oldindan siqilgan variantlar va fingerprint bo'yicha Cache-Control.
+    Asl manba papkadan boshlaydi; prepare() dan keyin build papkasidan beradi.
+    """
+
+    def __init__(self, *, directory, bundle, **kwargs):
+        super().__init__(directory=directory, **kwargs)
+        self.bundle = bundle
+        self.hashed = set()
+        _instances.append(self)
+
+    def use_build(self):
+        built = BUILD_DIR / self.bundle
+        manifest_path = built / MANIFEST_NAME
+        if not manifest_path.exists():
+            return
+        self.hashed = set(json.loads(manifest_path.read_text(encoding="utf-8")).values())
+        # Symlink emas, aniq build papkasi - boshqa worker linkni almashtirsa ham shu build beriladi
+        self.directory = str(built.resolve())
+        self.all_directories = self.get_directories(self.directory, self.packages)
+
+    def file_response(self, full_path, stat_result, scope, status_code=200):
+        full_path = str(full_path)
+        rel = os.path.relpath(full_path, self.directory).replace(os.sep, "/")
+        compressible = pathlib.PurePosixPath(full_path).suffix in COMPRESSIBLE_SUFFIXES
+
+        response = None
+        if compressible:
+            encodings = accepted_encodings(scope)
+            for encoding, extension in (("br", ".br"), ("gzip", ".gz")):
+                variant = full_path + extension
+                if encoding in encodings and os.path.isfile(variant):
+                    response = FileResponse(
+                        variant,
+                        status_code=status_code,
+                        stat_result=os.stat(variant),
+                        method=scope["method"],
+                        media_type=mimetypes.guess_type(full_path)[0] or "application/octet-stream",
+                        headers={"Content-Encoding": encoding},
+                    )
+                    if self.is_not_modified(response.headers, Headers(scope=scope)):
+                        response = NotModifiedResponse(response.headers)
+                    break
+        if response is None:
+            response = super().file_response(full_path, stat_result, scope, status_code)
+
+        if compressible:
+            response.headers["Vary"] = "Accept-Encoding"
+        response.headers["Cache-Control"] = IMMUTABLE_CACHE if rel in self.hashed else REVALIDATE_CACHE
+        return response
+
+
+# Mount qilingan barcha instance'lar (prepare() ularni build papkasiga o'tkazadi)
+_instances = []
+
+
+if __name__ == "__main__":
+    import log_setup
+    log_setup.configure(fmt="text", text_format=log_setup.CLI_FORMAT)
+    if len(sys.argv) > 1:
+        BUILD_DIR = pathlib.Path(sys.argv[1])
+    build_all(BUILD_DIR)
@@ -0,0 +1,172 @@
+"""
+Bronlar statistikasi (/statistika, super admin panel, /api/stats)
+
+Barcha oynalar (bugun, 7 kun, 30 kun), daromad va soatlar bo'yicha histogram bitta
+conditional-aggregation so'rovida (SUM(CASE ...)) hisoblanadi - besh-olti alohida COUNT o'rniga.
+Natija sartarosh bo'yicha keshlanadi; bron yaratilganda invalidate() chaqiriladi.
+
+barber_id: aniq id - shu sartarosh; None - bitta bot rejimi (barber_id IS NULL, /statistika);
+ALL_BARBERS - barcha sartaroshlar yig'indisi (/api/stats filtrsiz).
+Kesh bitta process ichida - bot.py alohida servis bo'lsa, ikkinchi process yozgan
+bronlar faqat STATS_CACHE_TTL o'tgach ko'rinadi (docker-compose da TTL qisqa).
+"""
+
+import os
+import threading
+import time as _time
+from datetime import date, datetime, timedelta
+from typing import Optional, Union
+
+from sqlalchemy import case, func, select
+from sqlalchemy.orm import Session
+
+from database import Booking, User
+
+STATS_CACHE_TTL = float(os.getenv("STATS_CACHE_TTL", "300"))
+
+HOURS = range(24)
+
+# Barcha sartaroshlar bo'yicha statistika (None emas - None bitta bot rejimidagi barber_id IS NULL)
+ALL_BARBERS = "all"
+BarberScope = Union[int, str, None]
+
+
+def window_sum(condition, value=1):
+    return func.coalesce(func.sum(case((condition, value), else_=0)), 0)
+
+
+def barber_condition(column, barber_id: BarberScope):
+    """barber_id bo'yicha filtr sharti (ALL_BARBERS - filtr yo'q)"""
+    if barber_id == ALL_BARBERS:
+        return None
+    if barber_id is None:
+        return column.is_(None)
+    return column == barber_id
+
+
+def compute_stats(db: Session, barber_id: BarberScope, today: date) -> dict:
+    """Bitta so'rov: oynalar bo'yicha sonlar, daromad, soatlar histogrammasi va mijozlar soni"""
+    week_ago = today - timedelta(days=7)
+    month_ago = today - timedelta(days=30)
+    in_month = Booking.booking_day >= month_ago
+
+    users = select(func.count(User.id))
+    user_condition = barber_condition(User.barber_id, barber_id)
+    if user_condition is not None:
+        users = users.where(user_condition)
+    users = users.scalar_subquery()
+
+    columns = [
+        users.label("total_users"),
+        func.count(Booking.id).label("total_bookings"),
+        window_sum(Booking.booking_day == today).label("today_bookings"),
+        window_sum(Booking.booking_day >= week_ago).label("week_bookings"),
+        window_sum(in_month).label("month_bookings"),
+        func.coalesce(func.sum(Booking.total_price), 0).label("revenue_total"),
+        window_sum(Booking.booking_day == today, Booking.total_price).label("revenue_today"),
+        window_sum(Booking.booking_day >= week_ago, Booking.total_price).label("revenue_week"),
+        window_sum(in_month, Booking.total_price).label("revenue_month"),
+    ]
+    # Soatlar bo'yicha histogram (30 kunlik oyna) - har bir soat alohida SUM(CASE) ustuni
+    columns += [
+        window_sum(in_month & (Booking.start_minute >= h * 60) & (Booking.start_minute < (h + 1) * 60)).label(f"hour_{h}")
+        for h in HOURS
+    ]
+
+    query = select(*columns).where(Booking.is_active == True)
+    booking_condition = barber_condition(Booking.barber_id, barber_id)
+    if booking_condition is not None:
+        query = query.where(booking_condition)
+    row = db.execute(query).one()._mapping
+
+    return {
+        "barber_id": None if barber_id == ALL_BARBERS else barber_id,
+        "date": today.isoformat(),
+        "total_users": row["total_users"],
+        "total_bookings": row["total_bookings"],
+        "today_bookings": row["today_bookings"],
+        "week_bookings": row["week_bookings"],
+        "month_bookings": row["month_bookings"],
+        "revenue": {
+            "total": float(row["revenue_total"]),
+            "today": float(row["revenue_today"]),
+            "week": float(row["revenue_week"]),
+            "month": float(row["revenue_month"]),
+        },
+        "busiest_hours": [
+            {"hour": h, "bookings": row[f"hour_{h}"]} for h in HOURS if row[f"hour_{h}"]
+        ],
+        "generated_at": datetime.utcnow().isoformat(),
+    }
+
+
+class StatsCache:
+    """
+    (barber_id, sana) -> statistika. TTL bilan, bron yozilganda aniq invalidatsiya.
+    Hisoblash davomida invalidatsiya bo'lsa natija yozilmaydi (begin() versiyasi bilan).
+    """
+
+    def __init__(self, ttl: float = STATS_CACHE_TTL):
+        self.ttl = ttl
+        self._entries = {}
+        self._lock = threading.Lock()
+        self._version = 0
+        self._invalidated = {}
+        self._floor = 0
+        self.hits = 0
+        self.misses = 0
+
+    def begin(self) -> int:
+        with self._lock:
+            return self._version
+
+    def get(self, barber_id: BarberScope, today: date):
+        with self._lock:
+            entry = self._entries.get(barber_id)
+            if entry is None or entry[0] < _time.monotonic() or entry[1] != today:
+                self.misses += 1
+                return None
+            self.hits += 1
+            return entry[2]
+
+    def set(self, barber_id: BarberScope, today: date, value: dict, version: Optional[int] = None) -> None:
+        with self._lock:
+            if version is not None and (version < self._floor or self._invalidated.get(barber_id, -1) > version):
+                return
+            self._entries[barber_id] = (_time.monotonic() + self.ttl, today, value)
+
+    def invalidate(self, barber_id: Optional[int]) -> None:
+        """Sartarosh va umumiy (ALL_BARBERS) statistikani o'chirish"""
+        with self._lock:
+            self._version += 1
+            for key in (barber_id, ALL_BARBERS):
+                self._entries.pop(key, None)
+                self._invalidated[key] = self._version
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+            self._version += 1
+            self._invalidated.clear()
+            self._floor = self._version
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {"entries": len(self._entries), "ttl_seconds": self.ttl, "hits": self.hits, "misses": self.misses}
+
+
+cache = StatsCache()
+
+
+def get_stats(db: Session, barber_id: BarberScope, today: date, use_cache: bool = True) -> dict:
+    result = cache.get(barber_id, today) if use_cache else None
+    if result is None:
+        version = cache.begin()
+        result = compute_stats(db, barber_id, today)
+        cache.set(barber_id, today, result, version=version)
+    return result
+
+
+def invalidate(barber_id: Optional[int]) -> None:
+    """Bron yaratilgandan/bekor qilingandan keyin chaqiriladi"""
+    cache.invalidate(barber_id)
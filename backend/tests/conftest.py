@@ -0,0 +1,48 @@
+"""
+Testlar vaqtinchalik SQLite bazada ishlaydi: DATABASE_URL `database` import qilinishidan
+oldin o'rnatiladi, jadvallar va migratsiyalar sessiya boshida bir marta.
+Har bir test toza bazadan boshlanadi (`db` fixture) - keshlar ham tozalanadi.
+"""
+
+import os
+import tempfile
+
+_TMP_DIR = tempfile.mkdtemp(prefix="botbackend-tests-")
+os.environ["DATABASE_URL"] = f"sqlite:///{_TMP_DIR}/test.db"
+os.environ.setdefault("LOG_FORMAT", "text")
+os.environ.setdefault("STATIC_BUILD", "0")
+
+import pytest  # noqa: E402
+
+
+@pytest.fixture(scope="session", autouse=True)
+def tables():
+    import migrations
+    from database import create_tables
+
+    create_tables()
+    migrations.run_migrations()
+
+
+def clear_tables():
+    import availability
+    import barber_registry
+    import stats
+    from database import Base, engine
+
+    with engine.begin() as conn:
+        for table in reversed(Base.metadata.sorted_tables):
+            conn.execute(table.delete())
+    availability.cache.clear()
+    stats.cache.clear()
+    barber_registry.reload()
+
+
+@pytest.fixture
+def db():
+    """Toza baza va unga ochilgan session"""
+    from database import SessionLocal
+
+    clear_tables()
+    with SessionLocal() as session:
+        yield session
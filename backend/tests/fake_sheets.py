@@ -0,0 +1,69 @@
+"""
+Testlar uchun gspread Worksheet/Spreadsheet o'rnini bosuvchilar (tarmoqsiz).
+GoogleSheetsManager(sheet=FakeWorksheet()) bilan ishlatiladi.
+"""
+
+import gspread
+
+
+class FakeQuotaError(Exception):
+    """FakeWorksheet kvota xatoligi (gspread APIError 429 o'rniga)"""
+    status_code = 429
+
+
+class FakeWorksheet:
+    """
+    gspread Worksheet o'rnini bosuvchi: qatorlar va chaqiruvlar xotirada.
+    fail_next - keyingi N ta yozish chaqiruvi kvota xatoligi bilan tugaydi.
+    """
+
+    def __init__(self, title="Sheet1", spreadsheet=None):
+        self.title = title
+        self.rows = []
+        self.calls = []
+        self.fail_next = 0
+        self.spreadsheet = spreadsheet or FakeSpreadsheet(self)
+
+    def _call(self, name):
+        self.calls.append(name)
+        if self.fail_next > 0:
+            self.fail_next -= 1
+            raise FakeQuotaError("Quota exceeded (fake)")
+
+    def row_values(self, row):
+        self.calls.append('row_values')
+        return list(self.rows[row - 1]) if len(self.rows) >= row else []
+
+    def insert_row(self, values, index=1):
+        self._call('insert_row')
+        self.rows.insert(index - 1, list(values))
+
+    def append_row(self, values):
+        self._call('append_row')
+        self.rows.append(list(values))
+
+    def append_rows(self, values):
+        self._call('append_rows')
+        self.rows.extend(list(row) for row in values)
+
+    def clear(self):
+        self._call('clear')
+        self.rows = []
+
+
+class FakeSpreadsheet:
+    """FakeWorksheet'lar to'plami (gspread Spreadsheet o'rnini bosuvchi)"""
+
+    id = "fake-spreadsheet"
+
+    def __init__(self, first_sheet):
+        self.worksheets = {first_sheet.title: first_sheet}
+
+    def worksheet(self, title):
+        if title not in self.worksheets:
+            raise gspread.exceptions.WorksheetNotFound(title)
+        return self.worksheets[title]
+
+    def add_worksheet(self, title, rows, cols):
+        self.worksheets[title] = FakeWorksheet(title, spreadsheet=self)
+        return self.worksheets[title]
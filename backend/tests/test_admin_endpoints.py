@@ -0,0 +1,31 @@
+"""/metrics va /api/admin/slow-requests faqat ADMIN_API_TOKEN bilan ochiladi"""
+
+import pytest
+from fastapi.testclient import TestClient
+
+import main
+
+PATHS = ["/metrics", "/api/admin/slow-requests"]
+
+
+@pytest.fixture
+def client():
+    return TestClient(main.app)
+
+
+@pytest.mark.parametrize("path", PATHS)
+def test_closed_without_configured_token(client, monkeypatch, path):
+    monkeypatch.setattr(main, "ADMIN_API_TOKEN", "")
+    assert client.get(path).status_code == 403
+    assert client.get(path, params={"secret": ""}).status_code == 403
+
+
+@pytest.mark.parametrize("path", PATHS)
+def test_requires_token(client, monkeypatch, path):
+    monkeypatch.setattr(main, "ADMIN_API_TOKEN", "s3cret")
+    assert client.get(path).status_code == 403
+    assert client.get(path, params={"secret": "wrong"}).status_code == 403
+    assert client.get(path, headers={"Authorization": "Bearer wrong"}).status_code == 403
+
+    assert client.get(path, params={"secret": "s3cret"}).status_code == 200
+    assert client.get(path, headers={"Authorization": "Bearer s3cret"}).status_code == 200
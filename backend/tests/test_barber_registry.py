@@ -0,0 +1,53 @@
+"""Barber registry: alohida bot processida (registry yuklanmagan) TTL bilan yangilanish"""
+
+import barber_registry
+from database import Barber
+
+
+def add_barber(db, admin_id="111"):
+    barber = Barber(name="Ali", bot_token="1:token", admin_telegram_id=admin_id)
+    db.add(barber)
+    db.commit()
+    return barber
+
+
+def test_unloaded_registry_rereads_after_ttl(db, monkeypatch):
+    barber = add_barber(db)
+    registry = barber_registry.BarberRegistry()  # bot.py alohida servis: warm() chaqirilmagan
+
+    assert registry.get(barber.id).admin_telegram_id == "111"
+
+    # API processi admin ID ni o'zgartirdi - bu processning registry si bilmaydi
+    barber.admin_telegram_id = "222"
+    db.commit()
+    assert registry.get(barber.id).admin_telegram_id == "111"
+    assert registry.misses == 1
+
+    monkeypatch.setattr(barber_registry, "BARBER_REGISTRY_TTL", 0)
+    assert registry.get(barber.id).admin_telegram_id == "222"
+    assert registry.misses == 2
+
+
+def test_unloaded_registry_sees_deleted_barber(db, monkeypatch):
+    barber = add_barber(db)
+    registry = barber_registry.BarberRegistry()
+    assert registry.get(barber.id) is not None
+
+    db.delete(barber)
+    db.commit()
+    monkeypatch.setattr(barber_registry, "BARBER_REGISTRY_TTL", 0)
+    assert registry.get(barber.id) is None
+
+
+def test_loaded_registry_does_not_hit_db(db):
+    barber = add_barber(db)
+    registry = barber_registry.BarberRegistry()
+    registry.load(db)
+
+    barber.admin_telegram_id = "222"
+    db.commit()
+    # API processi: o'zgarishlar refresh() orqali keladi, get() bazaga bormaydi
+    assert registry.get(barber.id).admin_telegram_id == "111"
+    assert registry.misses == 0
+    registry.refresh(barber.id, db)
+    assert registry.get(barber.id).admin_telegram_id == "222"
@@ -0,0 +1,49 @@
+"""GET /api/bookings keyset pagination: NULL booking_day/start_minute li eski qatorlar"""
+
+from fastapi.testclient import TestClient
+from sqlalchemy import text
+
+import main
+from database import Booking, engine
+
+
+def add_booking(db, day, time, phone):
+    db.add(Booking(
+        user_telegram_id=phone, user_name="Mijoz", user_phone=phone,
+        booking_date=day, booking_time=time, total_duration=1, total_price=0, is_active=True
+    ))
+    db.commit()
+
+
+def test_pagination_skips_rows_without_native_columns(db):
+    add_booking(db, "2030-01-07", "10:00", "1")
+    add_booking(db, "2030-01-07", "11:00", "2")
+    add_booking(db, "2030-01-08", "09:00", "3")
+    # Validatsiyadan oldin saqlangan eski qatorlar: sana yoki vaqt tahlil qilinmagan
+    add_booking(db, "2030-01-07", "abc", "4")
+    add_booking(db, "07.01.2030", "12:00", "5")
+    with engine.begin() as conn:
+        conn.execute(text("UPDATE bookings SET start_minute = NULL WHERE user_phone = '4'"))
+
+    client = TestClient(main.app)
+    phones, cursor = [], None
+    while True:
+        params = {"limit": 1, **({"cursor": cursor} if cursor else {})}
+        response = client.get("/api/bookings", params=params)
+        assert response.status_code == 200
+        page = response.json()
+        phones += [item["user_phone"] for item in page["items"]]
+        if not page["has_more"]:
+            break
+        cursor = page["next_cursor"]
+
+    assert phones == ["1", "2", "3"]
+
+
+def test_first_page_count_matches_listed_rows(db):
+    add_booking(db, "2030-01-07", "10:00", "1")
+    add_booking(db, "bad-date", "10:00", "2")
+
+    page = TestClient(main.app).get("/api/bookings").json()
+    assert [item["user_phone"] for item in page["items"]] == ["1"]
+    assert page["total_estimate"] == 1
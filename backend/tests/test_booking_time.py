@@ -0,0 +1,77 @@
+"""Bron vaqti tekshiruvi va booking_day/start_minute backfill migratsiyasi"""
+
+import pytest
+from fastapi.testclient import TestClient
+from sqlalchemy import text
+
+import main
+import migrations
+from database import Booking, engine, parse_start_minute
+
+
+@pytest.mark.parametrize("value, expected", [
+    ("10:00", 600),
+    ("9:30", 570),
+    ("23:59", 1439),
+    ("25:00", None),
+    ("10:75", None),
+    ("10", None),
+    ("abc", None),
+    ("", None),
+    (None, None),
+])
+def test_parse_start_minute(value, expected):
+    assert parse_start_minute(value) == expected
+
+
+@pytest.mark.parametrize("time", ["abc", "25:00", "10"])
+def test_create_booking_rejects_invalid_time(db, time):
+    response = TestClient(main.app).post("/bookings", json={
+        "date": "2030-01-07",
+        "time": time,
+        "user_telegram_id": "1",
+        "user_name": "Ali",
+        "user_phone": "+998901234567",
+    })
+    assert response.status_code == 400
+    assert db.query(Booking).count() == 0
+
+
+def add_unfilled_bookings(db, count):
+    db.add_all([
+        Booking(user_telegram_id=str(i), booking_date="2030-01-07", booking_time=f"{8 + i:02d}:00", is_active=True)
+        for i in range(count)
+    ])
+    db.commit()
+    with engine.begin() as conn:
+        conn.execute(text("UPDATE bookings SET booking_day = NULL, start_minute = NULL"))
+
+
+def filled_count():
+    with engine.connect() as conn:
+        return conn.execute(text("SELECT COUNT(*) FROM bookings WHERE booking_day IS NOT NULL")).scalar()
+
+
+def test_backfill_commits_each_batch(db, monkeypatch):
+    add_unfilled_bookings(db, 5)
+    monkeypatch.setattr(migrations, "BACKFILL_BATCH_SIZE", 2)
+
+    calls = []
+
+    def failing_parse(value):
+        calls.append(value)
+        if len(calls) > 2:
+            raise RuntimeError("uzildi")
+        return parse_start_minute(value)
+
+    monkeypatch.setattr(migrations, "parse_start_minute", failing_parse)
+    with pytest.raises(RuntimeError):
+        migrations.add_booking_native_columns(engine)
+    # Birinchi batch commit qilingan - qayta ishga tushganda shundan davom etadi
+    assert filled_count() == 2
+
+    monkeypatch.undo()
+    migrations.add_booking_native_columns(engine)
+    assert filled_count() == 5
+    db.expire_all()
+    assert sorted(booking.start_minute for booking in db.query(Booking)) == [480, 540, 600, 660, 720]
@@ -0,0 +1,76 @@
+"""Broadcast: restartdan keyin kursordan davom ettirish va plain text yuborish"""
+
+import asyncio
+from datetime import datetime, timedelta
+
+import pytest
+
+import broadcast
+from database import Barber, BroadcastJob, User
+
+
+class FakeBot:
+    def __init__(self):
+        self.sent = []
+
+    async def send_message(self, chat_id, text, **kwargs):
+        self.sent.append((chat_id, text, kwargs))
+
+
+@pytest.fixture
+def barber(db):
+    db.add(Barber(id=1, name="Ali", bot_token="1:t"))
+    db.add_all([User(id=i, telegram_id=str(100 + i), name=f"u{i}", phone="1", barber_id=1) for i in range(1, 6)])
+    db.commit()
+    broadcast._resumable.clear()
+    return 1
+
+
+def add_job(db, status, last_user_id=0, age_hours=0):
+    job = BroadcastJob(
+        barber_id=1, message="Chegirma *50%", status=status, total=5, last_user_id=last_user_id,
+        created_at=datetime.utcnow() - timedelta(hours=age_hours)
+    )
+    db.add(job)
+    db.commit()
+    return job.id
+
+
+def test_interrupted_job_resumes_from_cursor(db, barber):
+    job_id = add_job(db, "running", last_user_id=3)
+    assert broadcast.mark_interrupted_jobs(db) == 1
+
+    bot = FakeBot()
+
+    async def resume():
+        assert await broadcast.resume_jobs(1, bot, "Ali") == 1
+        await asyncio.gather(*broadcast._tasks.values())
+
+    asyncio.run(resume())
+
+    assert [chat_id for chat_id, _, _ in bot.sent] == [104, 105]
+    db.expire_all()
+    job = db.get(BroadcastJob, job_id)
+    assert job.status == "completed"
+    assert job.last_user_id == 5
+
+
+def test_old_jobs_are_not_resumed(db, barber):
+    add_job(db, "interrupted", age_hours=broadcast.RESUME_MAX_AGE_HOURS + 1)
+    broadcast.mark_interrupted_jobs(db)
+    assert broadcast._resumable == {}
+
+
+def test_claim_is_exclusive(db, barber):
+    job_id = add_job(db, "interrupted")
+    assert broadcast.claim_job(db, job_id) is not None
+    assert broadcast.claim_job(db, job_id) is None
+
+
+def test_message_sent_as_plain_text(db, barber):
+    bot = FakeBot()
+    ok, error, blocked = asyncio.run(
+        broadcast.send_one(bot, "101", "Chegirma *50%", broadcast.TokenBucket(1000), broadcast.ChatThrottle(0))
+    )
+    assert ok
+    assert "parse_mode" not in bot.sent[0][2]
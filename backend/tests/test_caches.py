@@ -0,0 +1,113 @@
+"""Keshlar: o'qish davomida invalidatsiya bo'lsa eski natija qayta yozilmasligi"""
+
+from datetime import date
+
+import availability
+import stats
+
+DAY = "2030-01-07"
+
+
+def test_availability_set_dropped_after_invalidate():
+    cache = availability.AvailabilityCache()
+    version = cache.begin()
+    cache.invalidate(1, DAY)
+    cache.set(1, DAY, (9, 21, 0), version=version)
+    assert cache.get(1, DAY) is None
+    assert cache.stats()["stale_writes"] == 1
+
+
+def test_availability_invalidate_covers_all_barbers_key():
+    cache = availability.AvailabilityCache()
+    version = cache.begin()
+    cache.invalidate(1, DAY)
+    cache.set(None, DAY, (9, 21, 0), version=version)
+    assert cache.get(None, DAY) is None
+
+
+def test_availability_other_keys_still_cached():
+    cache = availability.AvailabilityCache()
+    version = cache.begin()
+    cache.invalidate(1, DAY)
+    cache.set(2, DAY, (9, 21, 0), version=version)
+    assert cache.get(2, DAY) == (9, 21, 0)
+
+
+def test_availability_invalidate_barber_drops_inflight_read():
+    cache = availability.AvailabilityCache()
+    version = cache.begin()
+    cache.invalidate_barber(1)
+    cache.set(1, "2030-02-01", (10, 18, 0), version=version)
+    assert cache.get(1, "2030-02-01") is None
+
+
+def test_availability_read_after_invalidate_is_cached():
+    cache = availability.AvailabilityCache()
+    cache.invalidate(1, DAY)
+    version = cache.begin()
+    cache.set(1, DAY, (9, 21, 0), version=version)
+    assert cache.get(1, DAY) == (9, 21, 0)
+
+
+def test_availability_pruned_versions_reject_older_reads():
+    cache = availability.AvailabilityCache(max_entries=1)
+    version = cache.begin()
+    for day in range(1, 10):
+        cache.invalidate(2, f"2030-01-{day:02d}")
+    cache.set(1, DAY, (9, 21, 0), version=version)
+    assert cache.get(1, DAY) is None
+
+
+def test_stats_set_dropped_after_invalidate():
+    cache = stats.StatsCache()
+    today = date(2030, 1, 7)
+    version = cache.begin()
+    cache.invalidate(1)
+    cache.set(1, today, {"total": 1}, version=version)
+    cache.set(stats.ALL_BARBERS, today, {"total": 1}, version=version)
+    assert cache.get(1, today) is None
+    assert cache.get(stats.ALL_BARBERS, today) is None
+
+    version = cache.begin()
+    cache.set(1, today, {"total": 2}, version=version)
+    assert cache.get(1, today) == {"total": 2}
+
+
+def test_booking_invalidates_day_state(db):
+    import booking_service
+    from database import Barber
+
+    db.add(Barber(name="A", bot_token="1:t"))
+    db.commit()
+    assert "10:00" in availability.get_available_times(db, DAY, 1, 1)
+
+    booking_service.create_booking(
+        db, barber_id=1, user_telegram_id="5", user_name="u", user_phone="1",
+        booking_date=DAY, booking_time="10:00", total_duration=1, total_price=0
+    )
+    assert "10:00" not in availability.get_available_times(db, DAY, 1, 1)
+
+
+def test_stats_scope_single_bot_vs_all_barbers(db):
+    from database import Barber, Booking, User
+
+    db.add_all([Barber(id=1, name="A", bot_token="1:t"), Barber(id=2, name="B", bot_token="2:t")])
+    db.add_all([User(telegram_id=str(i), name="u", phone="1", barber_id=barber_id)
+                for i, barber_id in enumerate([None, 1, 2])])
+    db.add_all([
+        Booking(barber_id=barber_id, user_telegram_id="1", booking_date=DAY, booking_time="10:00",
+                total_duration=1, total_price=price, is_active=True)
+        for barber_id, price in [(None, 100), (1, 200), (2, 400)]
+    ])
+    db.commit()
+    today = date.fromisoformat(DAY)
+
+    single = stats.get_stats(db, None, today)  # bitta bot rejimi: faqat barber_id IS NULL
+    assert (single["total_users"], single["total_bookings"], single["revenue"]["total"]) == (1, 1, 100)
+
+    barber = stats.get_stats(db, 2, today)
+    assert (barber["total_users"], barber["total_bookings"], barber["revenue"]["total"]) == (1, 1, 400)
+
+    everything = stats.get_stats(db, stats.ALL_BARBERS, today)
+    assert (everything["total_users"], everything["total_bookings"], everything["revenue"]["total"]) == (3, 3, 700)
+    assert everything["barber_id"] is None
@@ -0,0 +1,34 @@
+"""Katalog ETag: mavjud bo'lmagan yozuvga 304 emas, 404 qaytishi kerak"""
+
+import pytest
+from fastapi.testclient import TestClient
+
+import barber_registry
+import catalogue
+import main
+from database import Barber, Service
+
+
+@pytest.fixture
+def client(db):
+    barber = Barber(id=1, name="Ali", bot_token="1:token")
+    db.add(barber)
+    db.add(Service(id=1, barber_id=1, name="Soch", price=30000, duration=1))
+    db.commit()
+    barber_registry.refresh(1, db)
+    return TestClient(main.app)
+
+
+@pytest.mark.parametrize("path", ["/api/barbers/{id}", "/api/barbers/{id}/bootstrap", "/api/services/{id}"])
+def test_etag_for_existing_record_is_304(client, path):
+    response = client.get(path.format(id=1))
+    assert response.status_code == 200
+
+    response = client.get(path.format(id=1), headers={"If-None-Match": response.headers["ETag"]})
+    assert response.status_code == 304
+
+
+@pytest.mark.parametrize("path", ["/api/barbers/{id}", "/api/barbers/{id}/bootstrap", "/api/services/{id}"])
+def test_etag_for_missing_record_is_404(client, path):
+    response = client.get(path.format(id=999), headers={"If-None-Match": catalogue.etag()})
+    assert response.status_code == 404
@@ -0,0 +1,195 @@
+"""Google Sheets eksporti: navbat bo'laklari, kvota xatoligida qayta urinish, to'liq eksport"""
+
+import pytest
+
+import google_sheets
+from database import Booking
+from fake_sheets import FakeWorksheet
+
+
+def make_booking(db, booking_id, barber_id=None):
+    booking = Booking(
+        id=booking_id, barber_id=barber_id, user_telegram_id=str(booking_id), user_name=f"Mijoz {booking_id}",
+        user_phone="+998900000000", booking_date="2030-01-07", booking_time=f"{8 + booking_id % 12:02d}:00",
+        total_duration=1, total_price=0
+    )
+    db.add(booking)
+    db.commit()
+    return booking
+
+
+@pytest.fixture
+def sheet(db):
+    return FakeWorksheet()
+
+
+@pytest.fixture
+def manager(sheet):
+    return google_sheets.GoogleSheetsManager(sheet=sheet)
+
+
+def make_queue(manager, **kwargs):
+    options = dict(batch_size=3, flush_interval=0.05, max_retries=3, backoff_base=0, sleep=lambda _: None)
+    options.update(kwargs)
+    return google_sheets.SheetsExportQueue(manager, **options)
+
+
+def row(booking_id):
+    return [booking_id, f"Mijoz {booking_id}", "+998900000000", "2030-01-07", "10:00", "", "Aktiv", str(booking_id)]
+
+
+def test_queue_writes_in_batches(manager, sheet):
+    export_queue = make_queue(manager)
+    for booking_id in range(1, 8):
+        export_queue.enqueue(row(booking_id))
+    export_queue.flush(timeout=5)
+
+    assert sheet.rows[0] == google_sheets.HEADERS
+    assert [r[0] for r in sheet.rows[1:]] == list(range(1, 8))
+    assert sheet.calls.count("append_rows") == export_queue.batches
+    assert export_queue.batches < 7
+    assert export_queue.stats()["exported"] == 7
+
+
+def test_queue_retries_quota_errors(manager, sheet):
+    manager.create_headers_if_needed()
+    sheet.fail_next = 2
+    export_queue = make_queue(manager)
+    export_queue.enqueue(row(1))
+    export_queue.flush(timeout=5)
+
+    assert export_queue.retries == 2
+    assert export_queue.failed == 0
+    assert [r[0] for r in sheet.rows[1:]] == [1]
+
+
+def test_queue_gives_up_after_max_retries(manager, sheet):
+    manager.create_headers_if_needed()
+    sheet.fail_next = 10
+    export_queue = make_queue(manager, max_retries=2)
+    export_queue.enqueue(row(1))
+    export_queue.flush(timeout=5)
+
+    assert export_queue.failed == 1
+    assert sheet.rows == [google_sheets.HEADERS]
+
+
+def test_full_export_writes_chunks(db, manager, sheet):
+    for booking_id in range(1, 6):
+        make_booking(db, booking_id)
+
+    assert manager.export_all_bookings(chunk_size=2)
+    assert sheet.rows[0] == google_sheets.HEADERS
+    assert [r[0] for r in sheet.rows[1:]] == [1, 2, 3, 4, 5]
+    assert sheet.calls.count("append_rows") == 3
+
+
+def test_incremental_export_appends_only_new(db, manager, sheet):
+    make_booking(db, 1)
+    assert manager.export_all_bookings()
+    make_booking(db, 2)
+    assert manager.export_all_bookings(incremental=True)
+
+    assert [r[0] for r in sheet.rows[1:]] == [1, 2]
+
+
+def test_per_barber_export_uses_separate_worksheets(db, manager, sheet):
+    from database import Barber
+
+    db.add_all([Barber(id=1, name="Ali", bot_token="1:t"), Barber(id=2, name="Vali", bot_token="2:t")])
+    db.commit()
+    make_booking(db, 1, barber_id=1)
+    make_booking(db, 2, barber_id=2)
+    make_booking(db, 3, barber_id=2)
+
+    assert manager.export_all_bookings(per_barber=True)
+    worksheets = sheet.spreadsheet.worksheets
+    assert [r[0] for r in worksheets["Ali #1"].rows[1:]] == [1]
+    assert [r[0] for r in worksheets["Vali #2"].rows[1:]] == [2, 3]
+
+
+def queued(export_queue, *ids):
+    """Navbatga qo'yilgan (worker threadsiz) bo'lak: _write_batch ga beriladi"""
+    with export_queue._ids_lock:
+        export_queue._outstanding.update(ids)
+    return [(0.0, row(booking_id)) for booking_id in ids]
+
+
+def watermark(db):
+    db.expire_all()
+    return google_sheets.get_last_exported_id(db, google_sheets.MAIN_SHEET_KEY)
+
+
+def test_watermark_stops_before_failed_batch(db, manager, sheet):
+    manager.create_headers_if_needed()
+    export_queue = make_queue(manager, max_retries=0)
+    first, second = queued(export_queue, 1, 2), queued(export_queue, 3, 4)
+
+    sheet.fail_next = 1
+    assert not export_queue._write_batch(first)
+    assert export_queue._write_batch(second)
+
+    assert [r[0] for r in sheet.rows[1:]] == [3, 4]
+    assert watermark(db) == 0
+
+
+def test_watermark_waits_for_pending_rows(db, manager, sheet):
+    export_queue = make_queue(manager)
+    first, second = queued(export_queue, 5), queued(export_queue, 6)
+
+    export_queue._write_batch(second)
+    assert watermark(db) == 4
+    export_queue._write_batch(first)
+    assert watermark(db) == 6
+
+
+def test_incremental_export_recovers_failed_rows(db, manager, sheet, monkeypatch):
+    for booking_id in range(1, 5):
+        make_booking(db, booking_id)
+    manager.create_headers_if_needed()
+    export_queue = make_queue(manager, max_retries=0)
+    monkeypatch.setattr(google_sheets, "sheets_manager", manager)
+    monkeypatch.setattr(google_sheets, "export_queue", export_queue)
+    first, second = queued(export_queue, 1, 2), queued(export_queue, 3, 4)
+
+    sheet.fail_next = 1
+    export_queue._write_batch(first)
+    export_queue._write_batch(second)
+
+    assert google_sheets.export_all_bookings_to_sheets(incremental=True)
+    assert {r[0] for r in sheet.rows[1:]} == {1, 2, 3, 4}
+    assert watermark(db) == 4
+    assert export_queue.stats()["lowest_failed_id"] is None
+
+
+def test_full_export_skips_rows_already_queued(db, manager, sheet, monkeypatch):
+    for booking_id in range(1, 4):
+        make_booking(db, booking_id)
+    export_queue = make_queue(manager)
+    monkeypatch.setattr(google_sheets, "sheets_manager", manager)
+    monkeypatch.setattr(google_sheets, "export_queue", export_queue)
+    pending = queued(export_queue, 3)
+
+    # Qator navbatda qolgan paytda to'liq eksport uni ham yozadi
+    assert google_sheets.export_all_bookings_to_sheets()
+    assert export_queue._write_batch(pending)
+
+    assert [r[0] for r in sheet.rows[1:]] == [1, 2, 3]
+    assert export_queue.stats()["exported"] == 0
+
+
+def test_full_export_waits_for_inflight_batch(db, manager, sheet, monkeypatch):
+    import threading
+
+    make_booking(db, 1)
+    export_queue = make_queue(manager)
+    monkeypatch.setattr(google_sheets, "sheets_manager", manager)
+    monkeypatch.setattr(google_sheets, "export_queue", export_queue)
+
+    done = threading.Event()
+    with export_queue.paused():
+        thread = threading.Thread(target=lambda: (google_sheets.export_all_bookings_to_sheets(), done.set()))
+        thread.start()
+        assert not done.wait(0.2)
+    thread.join(5)
+    assert done.is_set()
@@ -0,0 +1,202 @@
+"""Outbox dispatcher: egallash (claim), backoff, dead-letter va Markdown fallback - fake_telegram ustida"""
+
+import asyncio
+from datetime import datetime, timedelta
+
+import httpx
+import pytest
+
+import fake_telegram
+import notifications
+from database import NotificationOutbox
+
+
+@pytest.fixture(autouse=True)
+def fake_api(monkeypatch):
+    monkeypatch.setattr(notifications, "BOT_TOKEN", "1:main")
+    fake_telegram.messages.clear()
+    fake_telegram.failures.clear()
+    yield
+    fake_telegram.messages.clear()
+    fake_telegram.failures.clear()
+
+
+def run(scenario):
+    """scenario(dispatcher, http) ni fake Telegram API ga ulangan dispatcher bilan bajarish"""
+    async def main():
+        telegram_client = notifications.TelegramClient(base_url="http://fake-telegram")
+        http = httpx.AsyncClient(transport=httpx.ASGITransport(app=fake_telegram.app), base_url="http://fake-telegram")
+        telegram_client._client = http
+        try:
+            return await scenario(notifications.OutboxDispatcher(telegram_client), http)
+        finally:
+            await http.aclose()
+    return asyncio.run(main())
+
+
+def queue(db, chat_id, text, parse_mode="Markdown"):
+    notifications.queue_notification(db, chat_id, text, parse_mode=parse_mode)
+    db.commit()
+
+
+def rows(db):
+    db.expire_all()
+    return db.query(NotificationOutbox).order_by(NotificationOutbox.id).all()
+
+
+def make_due(db):
+    db.query(NotificationOutbox).update({"next_attempt_at": datetime.utcnow() - timedelta(seconds=1)})
+    db.commit()
+
+
+def sent_texts():
+    return [message["text"] for message in fake_telegram.messages]
+
+
+def test_transient_failure_backs_off_then_sends(db):
+    queue(db, 100, "salom")
+
+    async def scenario(dispatcher, http):
+        await http.post("/_fake/fail", json={"chat_id": "100", "status": 502})
+        return await dispatcher.dispatch_once()
+
+    assert run(scenario) == 1
+    [row] = rows(db)
+    assert (row.status, row.attempts, row.lease_until) == ("pending", 1, None)
+    assert row.next_attempt_at > datetime.utcnow()
+    assert "502" in row.last_error
+
+    # Backoff tugamaguncha chat olinmaydi
+    assert run(lambda dispatcher, http: dispatcher.dispatch_once()) == 0
+
+    make_due(db)
+    assert run(lambda dispatcher, http: dispatcher.dispatch_once()) == 1
+    [row] = rows(db)
+    assert (row.status, row.attempts) == ("sent", 2)
+    assert sent_texts() == ["salom"]
+
+
+def test_retry_after_is_respected(db):
+    queue(db, 100, "salom")
+
+    async def scenario(dispatcher, http):
+        await http.post("/_fake/fail", json={"chat_id": "100", "status": 429, "retry_after": 30})
+        await dispatcher.dispatch_once()
+
+    run(scenario)
+    [row] = rows(db)
+    assert row.status == "pending"
+    assert row.next_attempt_at - datetime.utcnow() > timedelta(seconds=25)
+
+
+def test_permanent_failure_goes_to_dead_letter(db):
+    queue(db, 100, "salom")
+
+    async def scenario(dispatcher, http):
+        await http.post("/_fake/fail", json={"chat_id": "100", "status": 403})
+        await dispatcher.dispatch_once()
+        return dispatcher.stats()
+
+    assert run(scenario)["dead"] == 1
+    [row] = rows(db)
+    assert row.status == "dead"
+    assert "blocked" in row.last_error
+    assert sent_texts() == []
+
+
+def test_max_attempts_goes_to_dead_letter(db, monkeypatch):
+    monkeypatch.setattr(notifications, "OUTBOX_MAX_ATTEMPTS", 2)
+    queue(db, 100, "salom")
+
+    async def scenario(dispatcher, http):
+        await http.post("/_fake/fail", json={"chat_id": "100", "status": 500, "times": 2})
+        await dispatcher.dispatch_once()
+
+    run(scenario)
+    make_due(db)
+    run(scenario)
+    [row] = rows(db)
+    assert (row.status, row.attempts) == ("dead", 2)
+
+
+def test_chat_order_kept_after_failure(db):
+    queue(db, 100, "birinchi")
+    queue(db, 100, "ikkinchi")
+    queue(db, 200, "boshqa chat")
+
+    async def scenario(dispatcher, http):
+        await http.post("/_fake/fail", json={"chat_id": "100", "status": 500})
+        await dispatcher.dispatch_once()
+
+    run(scenario)
+    first, second, other = rows(db)
+    assert (first.status, first.attempts) == ("pending", 1)
+    # Egallangan, lekin yuborilmagan xabar navbatga qaytadi
+    assert (second.status, second.attempts, second.lease_until) == ("pending", 0, None)
+    assert other.status == "sent"
+
+    make_due(db)
+    run(lambda dispatcher, http: dispatcher.dispatch_once())
+    assert sent_texts() == ["boshqa chat", "birinchi", "ikkinchi"]
+
+
+def test_claimed_rows_are_not_taken_twice(db):
+    queue(db, 100, "a")
+    queue(db, 200, "b")
+    now = datetime.utcnow()
+
+    chats, _ = notifications.claim_due_batch(db, now)
+    assert list(chats) == ["100", "200"]
+    assert {row.status for row in rows(db)} == {"sending"}
+
+    # Ikkinchi worker hech narsa olmaydi
+    chats, _ = notifications.claim_due_batch(db, now)
+    assert not chats
+
+    # Worker yiqildi - lease tugagach xabarlar qayta olinadi
+    later = now + timedelta(seconds=notifications.OUTBOX_LEASE_SECONDS + 1)
+    chats, _ = notifications.claim_due_batch(db, later)
+    assert list(chats) == ["100", "200"]
+
+
+def test_chat_with_message_in_flight_is_skipped(db):
+    queue(db, 100, "a")
+    now = datetime.utcnow()
+    notifications.claim_due_batch(db, now)
+    queue(db, 100, "b")
+
+    # "a" hali yuborilmoqda - "b" undan oldin ketib qolmasligi kerak
+    chats, _ = notifications.claim_due_batch(db, now)
+    assert not chats
+
+
+def test_concurrent_dispatchers_send_once(db):
+    for i in range(20):
+        queue(db, 100 + i, f"xabar {i}")
+
+    async def scenario(dispatcher, http):
+        other = notifications.OutboxDispatcher(dispatcher.telegram_client)
+        await asyncio.gather(dispatcher.dispatch_once(), other.dispatch_once())
+
+    run(scenario)
+    assert sorted(sent_texts()) == sorted(f"xabar {i}" for i in range(20))
+    assert {row.status for row in rows(db)} == {"sent"}
+
+
+def test_markdown_parse_error_falls_back_to_plain_text(db):
+    queue(db, 100, "Yangi bron: *Ali_Valiyev*")
+
+    run(lambda dispatcher, http: dispatcher.dispatch_once())
+    [row] = rows(db)
+    assert row.status == "sent"
+    [message] = fake_telegram.messages
+    assert message["text"] == "Yangi bron: *Ali_Valiyev*"
+    assert message["parse_mode"] is None
+
+
+def test_valid_markdown_keeps_parse_mode(db):
+    queue(db, 100, "*Yangi bron*")
+
+    run(lambda dispatcher, http: dispatcher.dispatch_once())
+    [message] = fake_telegram.messages
+    assert message["parse_mode"] == "Markdown"
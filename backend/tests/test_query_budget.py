@@ -0,0 +1,95 @@
+"""
+Bronlar o'qiladigan asosiy yo'llar uchun SQL so'rovlar byudjeti (N+1 regressiyalari).
+Har bir yo'l kichik va katta ma'lumot bilan bir xil sondagi so'rov bajarishi
+va QUERY_BUDGET dan oshmasligi kerak.
+"""
+
+from datetime import date, timedelta
+
+import pytest
+
+from query_counter import assert_max_queries, count_queries
+
+# Har bir o'qish yo'li uchun maksimal so'rovlar (bronlar + selectin xizmatlar [+ count])
+QUERY_BUDGET = 3
+SMALL_SEED = 1
+LARGE_SEED = 60
+DAY = date(2030, 1, 7)
+
+
+def seed_bookings(db, count, start=0):
+    from database import Barber, Booking, BookingService
+
+    if not db.query(Barber).first():
+        db.add_all([Barber(name=f"Barber {i}", bot_token=f"{i}:token") for i in range(1, 4)])
+    for i in range(start, start + count):
+        db.add(Booking(
+            barber_id=1 + i % 3,
+            user_telegram_id=str(1000 + i),
+            user_name=f"Mijoz {i}",
+            user_phone=f"+99890{i:07d}",
+            booking_date=(DAY + timedelta(days=i // 42)).isoformat(),
+            booking_time=f"{8 + (i // 3) % 14:02d}:00",
+            total_duration=1,
+            total_price=50000,
+            services=[
+                BookingService(service_name="Soch", service_code="1", price=30000, duration=1),
+                BookingService(service_name="Soqol", service_code="2", price=20000, duration=1),
+            ],
+        ))
+    db.commit()
+
+
+def touch(bookings):
+    """Javob/xabar yasash kabi - har bir bronning xizmatlarini o'qish"""
+    return [service.service_name for booking in bookings for service in booking.services]
+
+
+def read_get_bookings(db):
+    import main
+    return main.get_bookings(DAY.isoformat(), db)
+
+
+def read_list_bookings(db):
+    import main
+    return main.list_bookings(
+        barber_id=1, date_from=None, date_to=None, is_active=True,
+        phone=None, cursor=None, limit=main.BOOKINGS_PAGE_MAX, db=db
+    )
+
+
+def read_bot_day(db):
+    import bot
+    return touch(bot.get_bookings_for_date(db, 1, DAY))
+
+
+def read_bot_month(db):
+    import bot
+    return touch(bot.get_bookings_between(db, 1, DAY, DAY + timedelta(days=30)))
+
+
+READ_PATHS = [
+    pytest.param(read_get_bookings, id="GET /bookings/{date}"),
+    pytest.param(read_list_bookings, id="GET /api/bookings"),
+    pytest.param(read_bot_day, id="bot /mijozlar"),
+    pytest.param(read_bot_month, id="bot barcha bronlar"),
+]
+
+
+def measure(db, read):
+    db.expire_all()
+    with count_queries() as counter:
+        read(db)
+    return counter.count
+
+
+@pytest.mark.parametrize("read", READ_PATHS)
+def test_query_count_does_not_grow_with_bookings(db, read):
+    seed_bookings(db, SMALL_SEED)
+    small = measure(db, read)
+
+    seed_bookings(db, LARGE_SEED - SMALL_SEED, start=SMALL_SEED)
+    db.expire_all()
+    with assert_max_queries(QUERY_BUDGET):
+        read(db)
+    assert measure(db, read) == small
@@ -0,0 +1,104 @@
+"""Statik build: JS/CSS ichidagi havolalar va parallel workerlar"""
+
+import threading
+
+import static_assets
+
+
+def make_source(tmp_path, logo=b"logo-v1"):
+    source = tmp_path / "src"
+    (source / "img").mkdir(parents=True)
+    (source / "img" / "logo.png").write_bytes(logo)
+    (source / "app.js").write_text(
+        'const LOGO = "/static/img/logo.png";\n'
+        "const page = 'index.html';\n"
+        'const remote = "https://cdn.example.com/x.png";\n',
+        encoding="utf-8",
+    )
+    (source / "app.css").write_text(".logo { background: url('img/logo.png'); }\n", encoding="utf-8")
+    (source / "index.html").write_text(
+        '<link href="app.css"><script src="/static/app.js"></script>', encoding="utf-8"
+    )
+    return source
+
+
+def build(source, target):
+    return static_assets.build_bundle(source, "/static/", target, None)
+
+
+def test_references_inside_js_and_css_are_fingerprinted(tmp_path):
+    source = make_source(tmp_path)
+    target = tmp_path / "build" / "frontend"
+    manifest = build(source, target)
+
+    logo = manifest["img/logo.png"]
+    app_js = (target / manifest["app.js"]).read_text(encoding="utf-8")
+    assert f'"/static/{logo}"' in app_js
+    assert "'index.html'" in app_js
+    assert "https://cdn.example.com/x.png" in app_js
+    assert f"url('{logo}')" in (target / manifest["app.css"]).read_text(encoding="utf-8")
+
+    html = (target / "index.html").read_text(encoding="utf-8")
+    assert f'href="{manifest["app.css"]}"' in html
+    assert f'src="/static/{manifest["app.js"]}"' in html
+
+
+def test_changed_asset_changes_referencing_file_hash(tmp_path):
+    target = tmp_path / "build" / "frontend"
+    first = build(make_source(tmp_path / "a"), target)
+    second = build(make_source(tmp_path / "b", logo=b"logo-v2"), target)
+
+    assert first["img/logo.png"] != second["img/logo.png"]
+    # JS matni o'zgarmagan, lekin havola qilgan rasm o'zgardi - eski immutable JS keshda qolmasligi kerak
+    assert first["app.js"] != second["app.js"]
+    assert first["app.css"] != second["app.css"]
+    assert (target / second["app.js"]).exists()
+
+
+def test_parallel_workers_build_without_clobbering(tmp_path):
+    source = make_source(tmp_path)
+    target = tmp_path / "build" / "frontend"
+    results, errors = [], []
+
+    def worker():
+        try:
+            results.append(build(source, target))
+        except Exception as e:
+            errors.append(e)
+
+    threads = [threading.Thread(target=worker) for _ in range(6)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert not errors
+    assert all(result == results[0] for result in results)
+    assert target.is_symlink()
+    assert (target / results[0]["app.js"]).exists()
+    leftovers = [path.name for path in target.parent.iterdir() if ".tmp-" in path.name or ".link-" in path.name]
+    assert leftovers == []
+
+
+def test_rebuild_switches_link_and_keeps_previous_build(tmp_path):
+    target = tmp_path / "build" / "frontend"
+    build(make_source(tmp_path / "a"), target)
+    first = target.resolve()
+    build(make_source(tmp_path / "b", logo=b"logo-v2"), target)
+    second = target.resolve()
+    build(make_source(tmp_path / "c", logo=b"logo-v3"), target)
+
+    assert target.resolve() != second
+    assert second.exists()  # eski process hali shundan berayotgan bo'lishi mumkin
+    assert not first.exists()
+
+
+def test_legacy_plain_directory_is_replaced(tmp_path):
+    target = tmp_path / "build" / "frontend"
+    target.mkdir(parents=True)
+    (target / "stale.js").write_text("old", encoding="utf-8")
+
+    manifest = build(make_source(tmp_path), target)
+    assert target.is_symlink()
+    assert not (target / "stale.js").exists()
+    assert (target / manifest["app.js"]).exists()
@@ -0,0 +1,72 @@
+"""Webhook rejimi: sozlama tekshiruvi va /tg route ning noto'g'ri body ga javobi"""
+
+import asyncio
+from types import SimpleNamespace
+
+import pytest
+from fastapi.testclient import TestClient
+
+import bot_manager
+import main
+
+
+@pytest.fixture
+def webhook_mode(monkeypatch):
+    monkeypatch.setattr(bot_manager, "BOT_MODE", "webhook")
+    monkeypatch.setattr(bot_manager, "WEBHOOK_BASE_URL", "https://api.example.com")
+    monkeypatch.setattr(bot_manager, "WEBHOOK_SECRET", "s3cret")
+    monkeypatch.setattr(bot_manager, "bot_status", {})
+
+
+def test_webhook_mode_requires_secret(webhook_mode, monkeypatch):
+    assert bot_manager.webhook_config_error() is None
+
+    monkeypatch.setattr(bot_manager, "WEBHOOK_SECRET", "")
+    assert "WEBHOOK_SECRET" in bot_manager.webhook_config_error()
+
+    # Bitta botni API orqali ishga tushirish ham rad etiladi
+    started = asyncio.run(bot_manager.start_bot(7, "7:token", "Ali"))
+    assert started is False
+    assert bot_manager.bot_status[7]["state"] == "failed"
+    assert "WEBHOOK_SECRET" in bot_manager.bot_status[7]["error"]
+    assert 7 not in bot_manager.running_bots
+
+
+def test_polling_mode_ignores_webhook_settings(monkeypatch):
+    monkeypatch.setattr(bot_manager, "BOT_MODE", "polling")
+    monkeypatch.setattr(bot_manager, "WEBHOOK_SECRET", "")
+    assert bot_manager.webhook_config_error() is None
+
+
+@pytest.fixture
+def webhook_client(monkeypatch):
+    queue = asyncio.Queue()
+    application = SimpleNamespace(bot=None, update_queue=queue)
+    manager = SimpleNamespace(
+        get_webhook_application=lambda barber_id, secret: application if secret == "abc" else None
+    )
+    monkeypatch.setattr(main, "_bot_manager", manager)
+    return TestClient(main.app), queue
+
+
+@pytest.mark.parametrize("body", [b"{not json", b"[1, 2]"])
+def test_webhook_rejects_invalid_json(webhook_client, body):
+    client, queue = webhook_client
+    response = client.post(
+        "/tg/1/abc",
+        content=body,
+        headers={"X-Telegram-Bot-Api-Secret-Token": "abc", "Content-Type": "application/json"},
+    )
+    assert response.status_code == 400
+    assert queue.empty()
+
+
+def test_webhook_accepts_update(webhook_client):
+    client, queue = webhook_client
+    response = client.post(
+        "/tg/1/abc",
+        json={"update_id": 1},
+        headers={"X-Telegram-Bot-Api-Secret-Token": "abc"},
+    )
+    assert response.status_code == 200
+    assert queue.get_nowait().update_id == 1
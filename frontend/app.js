@@ -16,6 +16,9 @@ let selectedTime = null;
 let selectedServices = []; // Tanlangan xizmatlar
 let currentBarber = null; // Sartarosh ma'lumotlari
 let availableServices = []; // API'dan yuklangan xizmatlar
+let calendarRange = null; // Kalendarda ko'rinadigan sanalar oralig'i {start, end}
+const availabilityByDuration = {}; // duration -> {fetchedAt, days: {sana: [vaqtlar]}}
+const AVAILABILITY_TTL_MS = 60 * 1000; // Boshqalar band qilgan vaqtlar kalendarda shu oraliqdan keyin ko'rinadi
 const API_BASE_URL = window.location.origin; // Use same origin as frontend
 
 // URL'dan barber_id ni olish
@@ -50,6 +53,7 @@ document.addEventListener('DOMContentLoaded', async function() {
     await loadBarberData();
 
     generateCalendar();
+    markFullyBookedDays();
     setupEventListeners();
     setupQuickDateButtons();
     setupAdminPanel();
@@ -66,19 +70,15 @@ async function loadBarberData() {
     }
 
     try {
-        // Sartarosh va xizmatlarni parallel yuklash
-        const [barberResp, servicesResp] = await Promise.all([
-            fetchAPI(`${API_BASE_URL}/api/barbers/${barberId}`),
-            fetchAPI(`${API_BASE_URL}/api/services?barber_id=${barberId}&is_active=true`)
-        ]);
-
-        if (barberResp.ok) {
-            currentBarber = await barberResp.json();
+        // Sartarosh va xizmatlar bitta so'rovda (ETag bilan keshlanadi)
+        const response = await fetchAPI(`${API_BASE_URL}/api/barbers/${barberId}/bootstrap`);
+
+        if (response.ok) {
+            const data = await response.json();
+            currentBarber = data.barber;
             updateBarberHeader(currentBarber);
-        }
 
-        if (servicesResp.ok) {
-            availableServices = await servicesResp.json();
+            availableServices = data.services;
             renderServices(availableServices);
         }
     } catch (error) {
@@ -158,6 +158,7 @@ function generateCalendar() {
     
     // Clear calendar
     calendarDates.innerHTML = '';
+    calendarRange = { start: formatDate(today), end: formatDate(today) };
     
     // Add empty cells for days before month starts
     for (let i = 0; i < startingDayOfWeek; i++) {
@@ -183,6 +184,7 @@ function generateCalendar() {
         
         if (!isPastDate) {
             dayElement.addEventListener('click', () => selectDate(dateStr, dayElement));
+            calendarRange.end = dateStr;
         }
         
         calendarDates.appendChild(dayElement);
@@ -205,12 +207,90 @@ function generateCalendar() {
         
         dayElement.addEventListener('click', () => selectDate(dateStr, dayElement));
         calendarDates.appendChild(dayElement);
+        calendarRange.end = dateStr;
         
         // Stop if we have filled 6 weeks (42 cells)
         if (calendarDates.children.length >= 42) break;
     }
 }
 
+// Butunlay band kunlarni kalendarda kulrang qilish
+async function markFullyBookedDays() {
+    const days = await fetchAvailabilityRange(1);
+    if (!days) return;
+
+    Object.entries(days).forEach(([dateStr, times]) => {
+        if (times.length === 0) markDayFullyBooked(dateStr);
+    });
+}
+
+function markDayFullyBooked(dateStr) {
+    const dayElement = document.querySelector(`.calendar-day[data-date="${dateStr}"]`);
+    if (dayElement) {
+        dayElement.classList.add('disabled', 'fully-booked');
+    }
+}
+
+// Kalendar oralig'i uchun bo'sh vaqtlarni bitta so'rovda olish
+async function fetchAvailabilityRange(duration) {
+    const cached = availabilityByDuration[duration];
+    if (cached && Date.now() - cached.fetchedAt < AVAILABILITY_TTL_MS) {
+        return cached.days;
+    }
+    if (!calendarRange) return null;
+
+    try {
+        const barberId = getBarberIdFromURL();
+        const barberParam = barberId ? `&barber_id=${barberId}` : '';
+        const response = await fetchAPI(
+            `${API_BASE_URL}/available-times/range?start=${calendarRange.start}&end=${calendarRange.end}&duration=${duration}${barberParam}`
+        );
+        if (!response.ok) return null;
+
+        const data = await response.json();
+        const days = {};
+        data.days.forEach(day => {
+            days[day.date] = day.available_times;
+        });
+        availabilityByDuration[duration] = { fetchedAt: Date.now(), days };
+        return days;
+    } catch (error) {
+        console.error('Kalendar bo\'sh vaqtlarini yuklashda xatolik:', error);
+        return cached ? cached.days : null;
+    }
+}
+
+// Bitta sana uchun bo'sh vaqtlar. Vaqt tanlashdan oldin har doim yangidan so'raladi -
+// kalendar ochilgandan keyin boshqa mijoz band qilgan vaqt ko'rsatilmasin
+async function getAvailableTimesForDate(date, duration) {
+    const cached = availabilityByDuration[duration];
+    const barberId = getBarberIdFromURL();
+    const barberParam = barberId ? `&barber_id=${barberId}` : '';
+
+    let response;
+    try {
+        response = await fetchAPI(`${API_BASE_URL}/available-times/${date}?duration=${duration}${barberParam}`);
+    } catch (error) {
+        // Tarmoq xatosi - kalendar oralig'idagi (eskiroq) ma'lumot bilan davom etamiz
+        if (cached && cached.days[date]) return cached.days[date];
+        throw error;
+    }
+
+    if (!response.ok) {
+        throw new Error(`HTTP error! status: ${response.status}`);
+    }
+
+    const data = await response.json();
+    const times = data.available_times || [];
+    if (cached) {
+        cached.days[date] = times;
+    }
+    if (times.length === 0 && duration === 1) {
+        markDayFullyBooked(date);
+    }
+    return times;
+}
+
 // Format date as YYYY-MM-DD
 function formatDate(date) {
     return date.getFullYear() + '-' + 
@@ -220,6 +300,11 @@ function formatDate(date) {
 
 // Select date
 function selectDate(dateStr, element) {
+    if (element.classList.contains('fully-booked')) return;
+
+    // Kalendar ma'lumoti eskirgan bo'lsa (TTL) yangilanadi - shu orada to'lib qolgan kunlar kulrang bo'ladi
+    markFullyBookedDays();
+
     // Remove previous selection
     document.querySelectorAll('[data-date]').forEach(el => {
         el.classList.remove('selected');
@@ -282,20 +367,11 @@ async function loadAvailableTimes(date, duration = 1) {
     timeSlots.innerHTML = '';
 
     try {
-        const barberId = getBarberIdFromURL();
-        const barberParam = barberId ? `&barber_id=${barberId}` : '';
-        const response = await fetchAPI(`${API_BASE_URL}/available-times/${date}?duration=${duration}${barberParam}`);
-
-        if (!response.ok) {
-            throw new Error(`HTTP error! status: ${response.status}`);
-        }
-
-        const data = await response.json();
-        console.log('API Response:', data);
-        console.log('Available times:', data.available_times);
+        const availableTimes = await getAvailableTimesForDate(date, duration);
+        console.log('Available times:', availableTimes);
 
-        if (data.available_times && data.available_times.length > 0) {
-            data.available_times.forEach((time, index) => {
+        if (availableTimes.length > 0) {
+            availableTimes.forEach((time, index) => {
                 const timeButton = document.createElement('button');
                 timeButton.className = 'time-slot';
                 timeButton.style.animationDelay = `${index * 0.05}s`;